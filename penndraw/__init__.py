@@ -1,25 +1,73 @@
-import inspect
-from . import penndraw as core
+"""
+PennDraw's public names are listed here rather than collected from the
+drawing module when the package is imported. The drawing module (and with it
+pyglet's windowing and OpenGL code) is only imported the first time one of
+them is used, through the module-level __getattr__ below.
+"""
+
+import importlib
+
+__version__ = "0.1.8"
 
-# Import all functions from core
 CONSTANTS = ["BLACK", "WHITE", "RED", "GREEN", "BLUE",
              "YELLOW", "CYAN", "MAGENTA", "ORANGE", "PINK",
              "GRAY", "DARK_GRAY", "LIGHT_GRAY", "HSS_RED",
              "HSS_BLUE", "HSS_YELLOW", "HSS_ORANGE", "TQM_NAVY",
              "TQM_BLUE", "TQM_WHITE"]
 
-for const in CONSTANTS:
-    globals()[const] = getattr(core, const)
+CLASSES = ["FontProperties", "FrameStats", "KeyStateHandler", "Layer",
+           "MouseEvent", "MouseStateHandler", "PictureCacheStats", "ShapeHandle",
+           "UnfilledEllipse", "UnfilledRectangle"]
 
-__all__ = []
-for name, obj in inspect.getmembers(core):
-    if inspect.isfunction(obj) or inspect.isclass(obj):
-        globals()[name] = obj
-        __all__.append(name)
-__all__.extend(CONSTANTS)
+FUNCTIONS = [
+    # Canvas and animation
+    "set_canvas_size", "set_scale", "set_x_scale", "set_y_scale",
+    "scale_inputs", "set_framerate", "enable_animation", "advance", "run",
+    "clear", "on_draw", "keep",
+    # Transforms
+    "push", "pop", "translate", "rotate", "scale",
+    # Layers
+    "layer", "invalidate_layer",
+    # Pen
+    "set_pen_color", "set_pen_radius", "set_curve_tolerance",
+    # Shapes
+    "point", "points", "line", "polyline", "polygon", "filled_polygon",
+    "rectangle", "filled_rectangle", "square", "filled_square",
+    "circle", "filled_circle", "circles", "filled_circles",
+    "ellipse", "filled_ellipse", "ellipses", "filled_ellipses",
+    "arc", "closed_arc", "pie", "filled_pie",
+    # Text and pictures
+    "text", "text_left", "text_right", "set_font", "get_font", "list_fonts",
+    "set_font_size", "set_font_plain", "set_font_bold", "set_font_italic",
+    "set_font_bold_italic", "picture", "set_picture_cache_size",
+    "picture_cache_stats",
+    # Input
+    "mouse_x", "mouse_y", "mouse_pressed", "mouse_events",
+    "has_next_key_typed", "next_key_typed", "is_key_typed",
+    # Saving and recording
+    "save", "flush_saves", "start_recording", "stop_recording",
+    # Performance
+    "get_frame_stats", "show_frame_stats", "set_render_mode",
+]
+
+__all__ = FUNCTIONS + CLASSES + CONSTANTS + ["__version__"]
+
+_EXPORTS = frozenset(__all__)
+
+
+def __getattr__(name):
+    # Only reached for names that aren't set yet, so after the first call
+    # every public name is a plain module attribute.
+    core = importlib.import_module(".penndraw", __name__)
+    if name in _EXPORTS:
+        globals().update((export, getattr(core, export)) for export in __all__
+                         if export != "__version__")
+        return globals()[name]
+    # Private helpers such as _reset are reachable but not copied over.
+    if name.startswith("_") and not name.startswith("__") and hasattr(core, name):
+        return getattr(core, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# If you have any package-level variables or constants, you can define them here
-__version__ = "0.1.8"
 
-# Add the version to __all__
-__all__.append('__version__')
+def __dir__():
+    return sorted(set(globals()) | _EXPORTS)
@@ -0,0 +1,607 @@
+import math
+import struct
+from functools import lru_cache
+
+import numpy as np
+from pyglet import shapes
+from pyglet.gl import GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, GL_TRIANGLES
+from pyglet.graphics import Batch
+
+# Full circles get a multiple of this many segments, and at least this many.
+MIN_CURVE_SEGMENTS = 8
+# Arcs with fewer segments than this are quicker to compute point by point
+# in Python than with NumPy, whose calls cost more than the math they save.
+# See tests/bench_curves.py.
+MIN_ARRAY_ARC_SEGMENTS = 20
+
+
+def write_attribute(vertex_list, name, data):
+    """Copy a NumPy array straight into a vertex list attribute.
+
+    Assigning through `vertex_list.position[:] = ...` walks the data one
+    element at a time in Python; viewing the ctypes region as an array
+    lets NumPy do the copy in C. Reading the attribute marks the region
+    dirty, so pyglet uploads it on the next draw.
+    """
+    np.ctypeslib.as_array(getattr(vertex_list, name))[:] = data.ravel()
+
+
+class TriangleMesh(shapes.ShapeBase):
+    """Any number of independent triangles sharing a single vertex list.
+
+    `positions` is an (n, 2) array of pixel coordinates, three rows per
+    triangle, and `colors` is an (n, 4) array of RGBA bytes, one row per
+    vertex. The bulk drawing functions build these arrays with NumPy so
+    that thousands of points or circles cost one pyglet object.
+    """
+
+    def __init__(self, positions, colors, batch=None, group=None):
+        self._positions = np.ascontiguousarray(positions, dtype=np.float32).reshape(-1, 2)
+        self._colors = np.ascontiguousarray(colors, dtype=np.uint8).reshape(-1, 4)
+        self._num_verts = len(self._positions)
+        self._rgba = tuple(int(c) for c in self._colors[0])
+        self._rotation = 0
+
+        program = shapes.get_default_shader()
+        self._batch = batch or Batch()
+        self._group = self.group_class(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, program, group)
+
+        self._create_vertex_list()
+
+    def _create_vertex_list(self):
+        self._vertex_list = self._group.program.vertex_list(
+            self._num_verts, self._draw_mode, self._batch, self._group,
+            position='f', colors='Bn', translation='f', rotation='f')
+        self._update_vertices()
+        write_attribute(self._vertex_list, 'colors', self._colors)
+        self._update_translation()
+        write_attribute(self._vertex_list, 'rotation', np.zeros(self._num_verts, np.float32))
+
+    def _update_vertices(self):
+        if not self._visible:
+            write_attribute(self._vertex_list, 'position', np.zeros_like(self._positions))
+        else:
+            anchor = np.array((self._anchor_x, self._anchor_y), dtype=np.float32)
+            write_attribute(self._vertex_list, 'position', self._positions - anchor)
+
+    def _update_color(self):
+        # Recycling replaces _colors outright, so `color` is read back here.
+        self._rgba = tuple(int(c) for c in self._colors[0])
+        write_attribute(self._vertex_list, 'colors', self._colors)
+
+    @property
+    def color(self):
+        return self._rgba
+
+    @color.setter
+    def color(self, values):
+        r, g, b, *a = values
+        self._rgba = r, g, b, a[0] if a else self._rgba[3]
+        # A new array, since _colors may be a read-only view of the caller's.
+        self._colors = np.tile(np.array(self._rgba, dtype=np.uint8), (self._num_verts, 1))
+        self._update_color()
+
+    @property
+    def opacity(self):
+        return self._rgba[3]
+
+    @opacity.setter
+    def opacity(self, value):
+        self._rgba = (*self._rgba[:3], value)
+        self._colors = self._colors.copy()
+        self._colors[:, 3] = value
+        self._update_color()
+
+    def _update_translation(self):
+        translation = np.empty((self._num_verts, 2), dtype=np.float32)
+        translation[:] = (self._x, self._y)
+        write_attribute(self._vertex_list, 'translation', translation)
+
+
+class VertexArena:
+    """Immediate mode's triangles, written straight into preallocated
+    arrays of positions and colors rather than into shapes of their own,
+    and drawn from a single vertex list with a single draw call.
+
+    Positions are in pixels, three per triangle. `clear` starts the next
+    frame at the beginning of the arrays again without freeing anything;
+    the arrays and the vertex list only grow (by doubling) when a frame has
+    more vertices than any frame before it. `upload` copies what was added
+    since it was last called into the vertex list, and zeroes any vertices
+    left over from a bigger frame, which draws nothing.
+    """
+
+    def __init__(self, capacity=16384):
+        self._positions = np.zeros((capacity, 2), dtype=np.float32)
+        self._colors = np.zeros((capacity, 4), dtype=np.uint8)
+        self._count = 0
+        # Vertices copied into the vertex list, and the most there have
+        # been since it was last zeroed.
+        self._uploaded = 0
+        self._high_water = 0
+        self._batch = Batch()
+        self._group = shapes.ShapeBase.group_class(
+            GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, shapes.get_default_shader(), None)
+        self._vertex_list = None
+
+    def __len__(self):
+        return self._count
+
+    def _reserve(self, n):
+        """Claim the next n vertices, growing the arrays if they're full,
+        and return the range claimed."""
+        start, end = self._count, self._count + n
+        if end > len(self._positions):
+            capacity = max(end, 2 * len(self._positions))
+            for name in ('_positions', '_colors'):
+                old = getattr(self, name)
+                new = np.zeros((capacity, old.shape[1]), dtype=old.dtype)
+                new[:start] = old[:start]
+                setattr(self, name, new)
+        self._count = end
+        return start, end
+
+    def triangles(self, coordinates, rgba):
+        """Add vertices at x0, y0, x1, y1, ..., all colored rgba."""
+        start, end = self._reserve(len(coordinates) // 2)
+        _packer(len(coordinates)).pack_into(self._positions, start * 8, *coordinates)
+        self._colors[start:end] = rgba
+
+    def mesh(self, positions, colors):
+        """Add the vertices in an (n, 2) array, colored by an (n, 4) array
+        of RGBA bytes or all by a single RGBA tuple."""
+        positions = np.asarray(positions).reshape(-1, 2)
+        self.claim(len(positions), colors)[:] = positions
+
+    def claim(self, n, colors):
+        """Add n vertices colored as for `mesh`, and return the (n, 2) view
+        of the arena to write their positions into."""
+        start, end = self._reserve(n)
+        self._colors[start:end] = colors
+        return self._positions[start:end]
+
+    def upload(self):
+        """Copy the vertices added since the last upload into the vertex
+        list, which is created, or grown, to fit."""
+        count = self._count
+        if count == self._uploaded and count == self._high_water:
+            return
+        if self._vertex_list is None or count > self._vertex_list.count:
+            if self._vertex_list is None:
+                self._vertex_list = self._group.program.vertex_list(
+                    count, GL_TRIANGLES, self._batch, self._group,
+                    position='f', colors='Bn', translation='f', rotation='f')
+            else:
+                self._vertex_list.resize(max(count, 2 * self._vertex_list.count))
+            for name in ('position', 'colors', 'translation', 'rotation'):
+                write_attribute(self._vertex_list, name, np.zeros(1, np.uint8))
+            self._uploaded = self._high_water = 0
+        start = self._uploaded
+        positions = np.ctypeslib.as_array(self._vertex_list.position)
+        positions[2 * start:2 * count] = self._positions[start:count].ravel()
+        if self._high_water > count:
+            positions[2 * count:2 * self._high_water] = 0
+        colors = np.ctypeslib.as_array(self._vertex_list.colors)
+        colors[4 * start:4 * count] = self._colors[start:count].ravel()
+        self._uploaded = self._high_water = count
+
+    def clear(self):
+        """Forget every vertex; the next frame's overwrite them."""
+        self._count = self._uploaded = 0
+
+    def draw(self):
+        self._batch.draw()
+
+    def delete(self):
+        if self._vertex_list is not None:
+            self._vertex_list.delete()
+            self._vertex_list = None
+
+
+@lru_cache(maxsize=64)
+def _packer(floats):
+    return struct.Struct(f"{floats}f")
+
+
+class FilledPolygon(shapes.Polygon):
+    """A `pyglet.shapes.Polygon` that fills concave polygons correctly.
+    pyglet fans triangles out from the first point, which only works for
+    convex polygons, so any other polygon is split up by `triangulate`."""
+
+    def _get_vertices(self):
+        if not self._visible or is_convex(self._coordinates):
+            return super()._get_vertices()
+        coordinates = tuple(self._coordinates)
+        points = np.array(coordinates, dtype=np.float32)
+        # Relative to the anchor, like the vertices of any other shape.
+        points -= (points[0, 0] + self._anchor_x, points[0, 1] + self._anchor_y)
+        return points[triangulate(coordinates)].ravel().tolist()
+
+
+def is_convex(points):
+    """Whether the polygon through the (x, y) pairs in `points` never turns
+    both left and right. Plain Python, since most polygons are small."""
+    if len(points) <= 3:
+        return True
+    left = right = False
+    (x0, y0), (x1, y1) = points[-2], points[-1]
+    for x2, y2 in points:
+        turn = (x1 - x0) * (y2 - y1) - (y1 - y0) * (x2 - x1)
+        left |= turn > 0
+        right |= turn < 0
+        x0, y0, x1, y1 = x1, y1, x2, y2
+    return not (left and right)
+
+
+class Stroke(shapes.MultiLine):
+    """A `pyglet.shapes.MultiLine` built with NumPy. `stroke_vertices`
+    computes the triangles of every segment at once, and the vertex data is
+    copied straight into the vertex list, so long paths cost little more
+    than short ones. The triangles are the same as MultiLine's."""
+
+    def _create_vertex_list(self):
+        self._vertex_list = self._group.program.vertex_list(
+            self._num_verts, self._draw_mode, self._batch, self._group,
+            position='f', colors='Bn', translation='f')
+        self._update_vertices()
+        self._update_color()
+        self._update_translation()
+
+    def _get_vertices(self):
+        if not self._visible:
+            return (0, 0) * self._num_verts
+        return self._stroke().ravel().tolist()
+
+    def _update_vertices(self):
+        if not self._visible:
+            write_attribute(self._vertex_list, 'position', np.zeros(self._num_verts * 2))
+        else:
+            write_attribute(self._vertex_list, 'position', self._stroke())
+
+    def _update_color(self):
+        write_attribute(self._vertex_list, 'colors',
+                        np.tile(np.array(self._rgba, dtype=np.uint8), self._num_verts))
+
+    def _update_translation(self):
+        write_attribute(self._vertex_list, 'translation',
+                        np.tile(np.array((self._x, self._y), dtype=np.float32), self._num_verts))
+
+    def _stroke(self):
+        points = np.array(self._coordinates, dtype=np.float64)
+        # Relative to the anchor, like the vertices of any other shape.
+        points -= (points[0, 0] + self._anchor_x, points[0, 1] + self._anchor_y)
+        return stroke_vertices(points, self._thickness)
+
+
+def stroke_vertices(points, thickness, closed=False):
+    """Triangles for a path `thickness` pixels wide through the (n, 2) array
+    `points`, as an ((n - 1) * 6, 2) array: two triangles per segment.
+
+    This is the construction of `pyglet.shapes.MultiLine`, done for every
+    segment at once. Where two segments meet, both end on the line that
+    bisects the angle between them, pushed out far enough to keep the path
+    `thickness` wide. The two ends of the path are cut square. If `closed`,
+    the path instead runs on from its last point back to its first, and is
+    joined there like anywhere else, for n * 6 vertices.
+
+    `points` can also be an (..., n, 2) array of paths with n points each,
+    whose triangles are returned one path after another.
+    """
+    points = np.asarray(points)
+    # Float32 paths stay float32, which is quicker for big batches.
+    points = points.astype(np.result_type(points, np.float32), copy=False)
+    if closed:
+        points = np.concatenate((points, points[..., :1, :]), axis=-2)
+    segments = points.shape[-2] - 1
+    if segments < 1:
+        # No segments, like a MultiLine through a single point.
+        return np.empty((0, 2))
+    x, y = points[..., 0], points[..., 1]
+    dx, dy = np.diff(x, axis=-1), np.diff(y, axis=-1)
+    length = np.hypot(dx, dy)
+    # MultiLine leaves zero-length segments with a zero direction.
+    length[length == 0] = 1
+    dx /= length
+    dy /= length
+    nx, ny = -dy, dx
+
+    # The joint at the end of each segment but the last, and of the last
+    # too if the path is closed, where it meets the first again: the
+    # normalized sum of the normals on either side, stretched by 1 / sin
+    # of its angle to the segment after it.
+    joints = segments if closed else segments - 1
+    nx_after, ny_after, dx_after, dy_after = (
+        np.roll(a, -1, axis=-1)[..., :joints] for a in (nx, ny, dx, dy))
+    jx, jy = nx[..., :joints] + nx_after, ny[..., :joints] + ny_after
+    joint_length = np.hypot(jx, jy)
+    joint_length[joint_length == 0] = 1
+    jx /= joint_length
+    jy /= joint_length
+    cos = np.clip(dx_after * jx + dy_after * jy, -1, 1)
+    joint_scale = (thickness / 2) / np.maximum(np.sqrt(1 - cos * cos), 1e-6)
+
+    # One miter per point: the joints', and at the two ends either the
+    # segment's own normal or, if closed, the joint where they meet.
+    mx, my, scale = (np.empty(x.shape, dtype=x.dtype) for _ in range(3))
+    mx[..., 1:-1], my[..., 1:-1] = jx[..., :segments - 1], jy[..., :segments - 1]
+    scale[..., 1:-1] = joint_scale[..., :segments - 1]
+    if closed:
+        mx[..., 0] = mx[..., -1] = jx[..., -1]
+        my[..., 0] = my[..., -1] = jy[..., -1]
+        scale[..., 0] = scale[..., -1] = joint_scale[..., -1]
+    else:
+        mx[..., 0], my[..., 0] = nx[..., 0], ny[..., 0]
+        mx[..., -1], my[..., -1] = nx[..., -1], ny[..., -1]
+        scale[..., 0] = scale[..., -1] = thickness / 2
+    mx *= scale
+    my *= scale
+
+    # Each segment runs from its start to its end point on both sides.
+    out = np.empty(dx.shape + (6, 2), dtype=np.float32)
+    for axis, (c, m) in enumerate(((x, mx), (y, my))):
+        outer, inner = c + m, c - m
+        out[..., 0, axis] = outer[..., :-1]
+        out[..., 1, axis] = out[..., 3, axis] = outer[..., 1:]
+        out[..., 2, axis] = out[..., 5, axis] = inner[..., :-1]
+        out[..., 4, axis] = inner[..., 1:]
+    return out.reshape(-1, 2)
+
+
+def _turns(x, y):
+    """The cross product of the edges into and out of each point of a closed
+    polygon: positive where it turns left, negative where it turns right."""
+    dx_in, dy_in = x - np.roll(x, 1), y - np.roll(y, 1)
+    dx_out, dy_out = np.roll(x, -1) - x, np.roll(y, -1) - y
+    return dx_in * dy_out - dy_in * dx_out
+
+
+@lru_cache(maxsize=256)
+def triangulate(points):
+    """Split the polygon traced by `points`, a tuple of (x, y) pairs, into
+    len(points) - 2 triangles. Returns a read-only array of indices into
+    `points`, three per triangle.
+
+    Convex polygons are fanned out from the first point, exactly like
+    `pyglet.shapes.Polygon`. Other polygons are ear clipped: a corner whose
+    triangle contains no other corner is cut off, again and again, until
+    one triangle is left. Only corners that turn the opposite way to the
+    polygon can lie inside such a triangle, so just those are tested, all
+    at once with NumPy. If the polygon crosses itself and no such corner
+    is left, the next corner is cut off anyway, so there are always
+    len(points) - 2 triangles.
+
+    Polygons drawn every frame usually have the same points each time, so
+    results are cached.
+    """
+    n = len(points)
+    if n < 3:
+        return np.zeros(0, dtype=np.intp)
+    xy = np.array(points, dtype=np.float64)
+    x, y = xy[:, 0], xy[:, 1]
+    # Twice the signed area: positive if the points go counter-clockwise.
+    orientation = 1.0 if np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y) >= 0 else -1.0
+    reflex = _turns(x, y) * orientation < 0
+    if not reflex.any():
+        fan = np.arange(1, n - 1)
+        triangles = np.column_stack((np.zeros_like(fan), fan, fan + 1))
+    else:
+        triangles = _clip_ears(x, y, orientation, reflex)
+    triangles = triangles.ravel()
+    triangles.flags.writeable = False
+    return triangles
+
+
+def _clip_ears(x, y, orientation, reflex):
+    n = len(x)
+    prev = list(range(-1, n - 1))
+    prev[0] = n - 1
+    after = list(range(1, n + 1))
+    after[-1] = 0
+
+    def turn(a, b, c):
+        return ((x[b] - x[a]) * (y[c] - y[b]) - (y[b] - y[a]) * (x[c] - x[b])) * orientation
+
+    def is_ear(a, b, c):
+        if turn(a, b, c) < 0:
+            return False
+        others = np.flatnonzero(reflex)
+        others = others[(others != a) & (others != c)]
+        if not len(others):
+            return True
+        px, py = x[others], y[others]
+        inside = np.ones(len(others), dtype=bool)
+        coincide = np.zeros(len(others), dtype=bool)
+        for start, end in ((a, b), (b, c), (c, a)):
+            # On or to the inner side of each of the triangle's edges.
+            inside &= ((x[end] - x[start]) * (py - y[start])
+                       - (y[end] - y[start]) * (px - x[start])) * orientation >= 0
+            # Corners at the same spot as one of the ear's don't block it.
+            coincide |= (px == x[start]) & (py == y[start])
+        return not (inside & ~coincide).any()
+
+    triangles = []
+    remaining = n
+    corner = 0
+    misses = 0
+    while remaining > 3:
+        a, c = prev[corner], after[corner]
+        if misses < remaining and not is_ear(a, corner, c):
+            corner = c
+            misses += 1
+            continue
+        triangles.append((a, corner, c))
+        after[a], prev[c] = c, a
+        reflex[corner] = False
+        remaining -= 1
+        # Cutting off a corner can only straighten out its neighbors.
+        for neighbor in (a, c):
+            if reflex[neighbor]:
+                reflex[neighbor] = turn(prev[neighbor], neighbor, after[neighbor]) < 0
+        corner = c
+        misses = 0
+    triangles.append((prev[corner], corner, after[corner]))
+    return np.array(triangles, dtype=np.intp)
+
+
+def pixel_vertices(x, y):
+    """Two triangles covering the 1x1 pixel square whose lower-left corner
+    is at each (x, y), matching a 1x1 `pyglet.shapes.Rectangle`."""
+    x = np.asarray(x, dtype=np.float32)
+    y = np.asarray(y, dtype=np.float32)
+    # Same corner order as Rectangle._get_vertices.
+    dx = np.array((0, 1, 1, 0, 1, 0), dtype=np.float32)
+    dy = np.array((0, 0, 1, 0, 1, 1), dtype=np.float32)
+    out = np.empty((len(x), 6, 2), dtype=np.float32)
+    out[:, :, 0] = x[:, None] + dx
+    out[:, :, 1] = y[:, None] + dy
+    return out.reshape(-1, 2)
+
+
+def curve_segments(radius, max_error, sweep=2 * math.pi):
+    """The fewest straight segments that trace a circular arc of `radius`
+    pixels through `sweep` radians without straying more than `max_error`
+    pixels from it. For an ellipse, pass its larger semi-axis.
+    """
+    # A chord spanning angle t lies r * (1 - cos(t / 2)) inside the arc at
+    # its middle, so solve that for the widest t within max_error.
+    if radius <= 0:
+        return MIN_CURVE_SEGMENTS
+    step = 2 * math.acos(max(1 - max_error / radius, -1.0))
+    # Rounding up to a multiple of MIN_CURVE_SEGMENTS only lowers the error,
+    # and lets curves of similar size share vertex counts, so recycled
+    # shapes and cached unit-circle tables fit more of them.
+    per_turn = math.ceil(2 * math.pi / step / MIN_CURVE_SEGMENTS) * MIN_CURVE_SEGMENTS
+    return max(1, math.ceil(per_turn * sweep / (2 * math.pi)))
+
+
+def curve_segment_counts(radii, max_error):
+    """`curve_segments` for a full turn of each of an array of radii, for
+    the curves of a bulk call. Curves that need fewer than
+    MIN_CURVE_SEGMENTS get only as many as they need (at least 3): bulk
+    calls draw thousands of dots a few pixels wide, where every triangle
+    saved counts and a rounder one wouldn't look any different.
+    """
+    radii = np.asarray(radii, dtype=np.float64)
+    with np.errstate(divide="ignore"):
+        step = 2 * np.arccos(np.clip(1 - max_error / radii, -1.0, 1.0))
+        needed = np.ceil(2 * np.pi / step)
+    rounded = np.ceil(needed / MIN_CURVE_SEGMENTS) * MIN_CURVE_SEGMENTS
+    counts = np.where(needed < MIN_CURVE_SEGMENTS, np.maximum(needed, 3), rounded)
+    return counts.astype(np.intp)
+
+
+@lru_cache(maxsize=64)
+def unit_circle(segments):
+    """cos and sin of `segments` evenly spaced angles starting at 0, as two
+    read-only float64 arrays. Curves are drawn with only a handful of
+    distinct segment counts, so each table is computed once."""
+    theta = np.arange(segments) * (2 * np.pi / segments)
+    cos, sin = np.cos(theta), np.sin(theta)
+    cos.flags.writeable = sin.flags.writeable = False
+    return cos, sin
+
+
+@lru_cache(maxsize=64)
+def unit_fan(segments):
+    """Triangle-fan vertices for a circle of radius 1 centered at the
+    origin, laid out like `filled_ellipse_vertices`, as a read-only
+    (3 * segments, 2) float64 array. Scaling it gives any ellipse's."""
+    cos, sin = unit_circle(segments)
+    out = np.zeros((segments, 3, 2))
+    out[:, 1, 0], out[:, 1, 1] = np.roll(cos, 1), np.roll(sin, 1)
+    out[:, 2, 0], out[:, 2, 1] = cos, sin
+    out = out.reshape(-1, 2)
+    out.flags.writeable = False
+    return out
+
+
+def ellipse_points(x, y, a, b, rotation, segments):
+    """Points around an ellipse centered at each (x, y) with semi-axes (a, b),
+    rotated counter-clockwise by `rotation` degrees. Returns two
+    (n, segments) arrays of x and y coordinates."""
+    x = np.asarray(x, dtype=np.float32).reshape(-1, 1)
+    y = np.asarray(y, dtype=np.float32).reshape(-1, 1)
+    a = np.asarray(a, dtype=np.float32).reshape(-1, 1)
+    b = np.asarray(b, dtype=np.float32).reshape(-1, 1)
+    rot = np.radians(np.asarray(rotation, dtype=np.float32)).reshape(-1, 1)
+    cos, sin = unit_circle(segments)
+    ax = a * cos.astype(np.float32)
+    by = b * sin.astype(np.float32)
+    cos_r, sin_r = np.cos(rot), np.sin(rot)
+    return x + ax * cos_r - by * sin_r, y + ax * sin_r + by * cos_r
+
+
+def ellipse_outline(x, y, a, b, rotation, segments):
+    """The `segments` points around a single ellipse, as `ellipse_points`
+    but in double precision and as an (segments, 2) array."""
+    cos, sin = unit_circle(segments)
+    rot = math.radians(rotation)
+    cos_r, sin_r = math.cos(rot), math.sin(rot)
+    out = np.empty((segments, 2))
+    out[:, 0] = x + (a * cos_r) * cos - (b * sin_r) * sin
+    out[:, 1] = y + (a * sin_r) * cos + (b * cos_r) * sin
+    return out
+
+
+def closed_line_segments(points):
+    """GL_LINES vertices tracing the closed loop through the (n, 2) array
+    `points`, flattened: segment i runs from point i - 1 to point i."""
+    return np.hstack((np.roll(points, 1, axis=0), points)).ravel()
+
+
+def arc_outline(x, y, rx, ry, start, sweep, segments):
+    """`segments + 1` points along an elliptical arc centered at (x, y),
+    from angle `start` counter-clockwise through `sweep` radians, as a
+    (segments + 1, 2) array."""
+    theta = start + np.arange(segments + 1) * (sweep / segments)
+    out = np.empty((segments + 1, 2))
+    out[:, 0] = x + rx * np.cos(theta)
+    out[:, 1] = y + ry * np.sin(theta)
+    return out
+
+
+def arc_point_list(x, y, rx, ry, start, sweep, segments):
+    """`arc_outline` as a list of points, computed without NumPy for arcs
+    of fewer than MIN_ARRAY_ARC_SEGMENTS segments."""
+    if segments >= MIN_ARRAY_ARC_SEGMENTS:
+        return arc_outline(x, y, rx, ry, start, sweep, segments).tolist()
+    step = sweep / segments
+    return [(x + rx * math.cos(start + i * step), y + ry * math.sin(start + i * step))
+            for i in range(segments + 1)]
+
+
+def sector_vertices(x, y, r, start, sweep, segments):
+    """Triangles for a circular sector centered at (x, y), from angle
+    `start` counter-clockwise through `sweep` radians, with the same layout
+    as `pyglet.shapes.Sector`: `segments` triangles of (center, p[i], p[i+1]).
+    """
+    points = arc_outline(x, y, r, r, start, sweep, segments)
+    out = np.empty((segments, 3, 2), dtype=np.float32)
+    out[:, 0] = (x, y)
+    out[:, 1] = points[:-1]
+    out[:, 2] = points[1:]
+    return out.reshape(-1, 2)
+
+
+def filled_ellipse_vertices(x, y, a, b, segments, rotation=0.0):
+    """Triangle-fan vertices for a filled ellipse centered at each (x, y)
+    with semi-axes (a, b), using the same layout as `pyglet.shapes.Ellipse`:
+    `segments` triangles of (center, p[i-1], p[i]).
+    """
+    px, py = ellipse_points(x, y, a, b, rotation, segments)
+    out = np.empty((len(px), segments, 3, 2), dtype=np.float32)
+    out[:, :, 0, 0] = np.asarray(x, dtype=np.float32).reshape(-1, 1)
+    out[:, :, 0, 1] = np.asarray(y, dtype=np.float32).reshape(-1, 1)
+    out[:, :, 1, 0] = np.roll(px, 1, axis=1)
+    out[:, :, 1, 1] = np.roll(py, 1, axis=1)
+    out[:, :, 2, 0] = px
+    out[:, :, 2, 1] = py
+    return out.reshape(-1, 2)
+
+
+def closed_stroke_vertices(px, py, thickness):
+    """Triangles for a mitered outline `thickness` pixels wide around each
+    closed polygon in the (n, k) coordinate arrays `px` and `py`: the
+    closed `stroke_vertices` of every polygon, one after another.
+    """
+    return stroke_vertices(np.stack((px, py), axis=-1), thickness, closed=True)
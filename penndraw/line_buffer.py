@@ -0,0 +1,205 @@
+import ctypes
+import math
+from array import array
+
+from pyglet import shapes
+from pyglet.gl import GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA
+
+# The rotation of a new line's six vertices.
+_UNROTATED = array('f', bytes(4 * 6))
+
+
+class LineBuffer(shapes.ShapeBase):
+    """Any number of straight lines sharing a single vertex list.
+
+    Each line is the same six vertices a `pyglet.shapes.Line` of its width
+    and color would have, appended to growable float32 and byte arrays
+    (the standard library's, so that drawing lines doesn't need NumPy).
+    `upload` copies whatever was added since it was last called into the
+    vertex list in one go. The vertex list is only allocated by the first
+    upload, at the size needed then, and afterwards grows by doubling; the
+    vertices past the last line are left at zero, which draws nothing.
+    Lines already added can be changed in place through a `BufferedLine`.
+    """
+
+    def __init__(self, batch):
+        self._positions = array('f')
+        self._translations = array('f')
+        self._rotations = array('f')
+        self._colors = array('B')
+        # Vertices copied into the vertex list, and the most ever copied
+        # since the last clear(), which may still need to be zeroed.
+        self._uploaded = 0
+        self._high_water = 0
+        self._rotation = 0
+        self._rgba = (255, 255, 255, 255)
+
+        program = shapes.get_default_shader()
+        self._batch = batch
+        self._group = self.group_class(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA, program, None)
+
+    def __len__(self):
+        return len(self._colors) // 24
+
+    def _create_vertex_list(self):
+        self._vertex_list = self._group.program.vertex_list(
+            self._num_verts, self._draw_mode, self._batch, self._group,
+            position='f', colors='Bn', translation='f', rotation='f')
+        self._zero(0, self._num_verts)
+
+    def _zero(self, start, stop):
+        """Zero every attribute of vertices start to stop."""
+        for name, (_, size) in self._arrays().items():
+            region = getattr(self._vertex_list, name)
+            ctypes.memset(ctypes.addressof(region) + start * size, 0, (stop - start) * size)
+
+    def add(self, x1, y1, x2, y2, width, rgba):
+        """Append a line from (x1, y1) to (x2, y2) in pixels, laid out like
+        `pyglet.shapes.Line`: the line runs along one edge of a rectangle
+        `width` pixels wide, on its left as seen from (x1, y1)."""
+        length = math.hypot(y2 - y1, x2 - x1)
+        r = math.atan2(y2 - y1, x2 - x1)
+        cr = math.cos(r)
+        sr = math.sin(r)
+        bx, by = length * cr, length * sr
+        cx, cy = bx - width * sr, by + width * cr
+        dx, dy = -width * sr, width * cr
+        self._positions.extend((0, 0, bx, by, cx, cy, 0, 0, cx, cy, dx, dy))
+        self._translations.extend((x1, y1) * 6)
+        self._rotations.extend(_UNROTATED)
+        self._colors.extend(rgba * 6)
+
+    def _arrays(self):
+        """The array holding each attribute, and its size in bytes per vertex."""
+        return {'position': (self._positions, 8), 'colors': (self._colors, 4),
+                'translation': (self._translations, 8), 'rotation': (self._rotations, 4)}
+
+    def values(self, index, name):
+        """The values of one attribute of line `index`'s six vertices."""
+        data, size = self._arrays()[name]
+        per_line = 6 * size // data.itemsize
+        return data[index * per_line:(index + 1) * per_line]
+
+    def edit(self, index, name, values):
+        """Overwrite one attribute of line `index`'s six vertices, in the
+        vertex list too if that line has already been uploaded."""
+        data, size = self._arrays()[name]
+        per_line = 6 * size // data.itemsize
+        data[index * per_line:(index + 1) * per_line] = array(data.typecode, values)
+        if index * 6 < self._uploaded:
+            region = getattr(self._vertex_list, name)
+            offset = index * 6 * size
+            ctypes.memmove(ctypes.addressof(region) + offset,
+                           data.buffer_info()[0] + offset, 6 * size)
+
+    def upload(self):
+        """Copy the lines added since the last upload into the vertex list,
+        growing it first if they don't fit."""
+        count = len(self._colors) // 4
+        if count == self._uploaded and count == self._high_water:
+            return
+        if self._vertex_list is None:
+            self._num_verts = count
+            self._create_vertex_list()
+        elif count > self._num_verts:
+            # pyglet 2.0's VertexList.resize() fails whenever the region has
+            # to move, which it does once anything was allocated after it, so
+            # the lines go into a new vertex list instead.
+            old = self._vertex_list
+            self._num_verts = max(count, 2 * self._num_verts)
+            self._create_vertex_list()
+            for name, (_, size) in self._arrays().items():
+                ctypes.memmove(getattr(self._vertex_list, name), getattr(old, name),
+                               self._uploaded * size)
+            old.delete()
+            self._high_water = self._uploaded
+        start = self._uploaded
+        for name, (data, size) in self._arrays().items():
+            region = getattr(self._vertex_list, name)
+            address, length = data.buffer_info()
+            offset = start * size
+            ctypes.memmove(ctypes.addressof(region) + offset, address + offset,
+                           length * data.itemsize - offset)
+        if self._high_water > count:
+            self._zero(count, self._high_water)
+        self._uploaded = self._high_water = count
+
+    def clear(self):
+        """Forget every line. The vertex list keeps its size, and its old
+        lines are zeroed by the next upload."""
+        del self._positions[:]
+        del self._translations[:]
+        del self._rotations[:]
+        del self._colors[:]
+        self._uploaded = 0
+
+    def delete(self):
+        if self._vertex_list is not None:
+            self._vertex_list.delete()
+            self._vertex_list = None
+
+    def _update_vertices(self):
+        pass
+
+    def _update_color(self):
+        pass
+
+    def _update_translation(self):
+        pass
+
+
+class BufferedLine:
+    """One of a LineBuffer's lines, with the properties of a
+    `pyglet.shapes.Line` that move, turn, recolor or hide it."""
+
+    __slots__ = ("_lines", "_index", "_hidden")
+
+    def __init__(self, lines, index):
+        self._lines = lines
+        self._index = index
+        # The line's vertices while it's hidden.
+        self._hidden = None
+
+    @property
+    def position(self):
+        return tuple(self._lines.values(self._index, 'translation')[:2])
+
+    @position.setter
+    def position(self, values):
+        self._lines.edit(self._index, 'translation', tuple(values) * 6)
+
+    @property
+    def rotation(self):
+        return self._lines.values(self._index, 'rotation')[0]
+
+    @rotation.setter
+    def rotation(self, rotation):
+        self._lines.edit(self._index, 'rotation', (rotation,) * 6)
+
+    @property
+    def color(self):
+        return tuple(self._lines.values(self._index, 'colors')[:4])
+
+    @color.setter
+    def color(self, rgba):
+        self._lines.edit(self._index, 'colors', tuple(rgba) * 6)
+
+    @property
+    def visible(self):
+        return self._hidden is None
+
+    @visible.setter
+    def visible(self, visible):
+        if visible == self.visible:
+            return
+        if visible:
+            self._lines.edit(self._index, 'position', self._hidden)
+            self._hidden = None
+        else:
+            self._hidden = self._lines.values(self._index, 'position')
+            self._lines.edit(self._index, 'position', (0,) * 12)
+
+    def delete(self):
+        """Hide the line for good. Its vertices stay in the buffer, which
+        can't close the gap without moving every line after it."""
+        self.visible = False
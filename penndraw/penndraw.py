@@ -1,29 +1,126 @@
+from __future__ import annotations
+
+import os
 import pyglet as pg
-from pyglet.window.key import KeyStateHandler, LSHIFT, RSHIFT
-from pyglet.window.mouse import MouseStateHandler, LEFT
+
+# PENNDRAW_HEADLESS=1 renders into an offscreen EGL surface instead of a
+# window, for servers and CI machines without a display. pyglet picks its
+# platform backend when pyglet.window is first imported, so this has to
+# happen before the imports below. (PYGLET_HEADLESS=1 works too.)
+if os.environ.get("PENNDRAW_HEADLESS", "").lower() in ("1", "true", "yes"):
+    pg.options["headless"] = True
+# pyglet normally opens a hidden "shadow" window as soon as pyglet.window is
+# imported. PennDraw only ever has one window and opens it on first use (see
+# _ensure_window), so if importing penndraw is what imports pyglet.window, it
+# skips that: importing penndraw needs no display at all. pyglet only reads
+# the option during that import, so it's put back for any other code.
+_shadow_window = pg.options["shadow_window"]
+pg.options["shadow_window"] = False
+try:
+    from pyglet.window.key import KeyStateHandler
+    from pyglet.window.mouse import MouseStateHandler, LEFT
+finally:
+    pg.options["shadow_window"] = _shadow_window
+    del _shadow_window
+import atexit
+import importlib.util
 import math
 import sys
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from dataclasses import dataclass
 from typing import Optional
-from .unfilled_shapes import *
 import time
 
+
+def _lazy_import(name: str):
+    """Return the module called name without running it yet. The import
+    happens the first time one of its attributes is used, so sketches that
+    never save, record or draw curves don't pay to import NumPy."""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+futures = _lazy_import("concurrent.futures")
+np = _lazy_import("numpy")
+
+
+def _load_numpy():
+    """Finish importing NumPy on this thread. LazyLoader isn't thread-safe
+    before Python 3.12, so it's loaded here before starting a thread that
+    might otherwise be the first to use it."""
+    np.ndarray
+
+# These are registered before unfilled_shapes imports them, so it gets the
+# lazy modules too.
+bulk_shapes = _lazy_import(f"{__package__}.bulk_shapes")
+recording = _lazy_import(f"{__package__}.recording")
+from .line_buffer import BufferedLine, LineBuffer
+from .unfilled_shapes import *
+
 DEFAULT_SIZE: int = 512
 DEFAULT_MIN_COORD: float = 0.0
 DEFAULT_MAX_COORD: float = 1.0
 height: int = DEFAULT_SIZE
 width: int = DEFAULT_SIZE
-window = pg.window.Window(width, height)
+HEADLESS: bool = pg.options["headless"]
+# Created by _ensure_window() on the first draw, advance() or run().
+window: Optional[pg.window.Window] = None
 BATCH: pg.graphics.Batch = pg.graphics.Batch()
 VERTICES: list = []
+# Shapes from before the last clear(), keyed by (shape class, vertex count),
+# waiting to be reused by this frame's draw calls. See _recycled().
+RECYCLABLE: dict[tuple[type, int], list] = {}
+# Shapes cleared since RECYCLABLE was last filled; sorted into it lazily.
+CLEARED: list = []
+# Where the vertices of the shapes drawn on the canvas since clear() end in
+# each vertex domain, which pyglet draws in the order they're stored. See
+# _drawn().
+DRAWN_UP_TO: dict = {}
+# The LineBuffer that line() is adding to, while nothing else has been
+# drawn since the last line, and whether it was recycled. See line().
+line_run: Optional[LineBuffer] = None
+line_run_recycled: bool = False
+# In immediate mode (see set_render_mode), shapes are written into ARENA
+# instead of being shapes of their own.
+render_mode: str = "retained"
+ARENA: Optional[bulk_shapes.VertexArena] = None
+# Counts clear() calls, so that a ShapeHandle can tell its shape is gone.
+canvas_generation: int = 0
+# Hidden labels left over from cleared frames, least recently used first,
+# keyed by everything that affects their layout (see _label_key).
+LABEL_CACHE: OrderedDict[tuple, list[pg.text.Label]] = OrderedDict()
+MAX_CACHED_LABELS: int = 256
+cached_label_count: int = 0
 BORDER: float = 0.0
 MOUSE_STATE = MouseStateHandler()
 KEY_STATE = KeyStateHandler()
 KEYS_PRESSED: set[int] = set()
-
-window.push_handlers(MOUSE_STATE)
-window.push_handlers(KEY_STATE)
-pg.gl.glClearColor(1.0, 1.0, 1.0, 1.0)
+# Characters typed but not yet read by next_key_typed(), oldest first, each
+# with the time PennDraw received it. Once MAX_TYPED_KEYS are waiting, the
+# oldest are dropped.
+MAX_TYPED_KEYS: int = 256
+TYPED_KEYS: deque[tuple[str, float]] = deque(maxlen=MAX_TYPED_KEYS)
+# Mouse events not yet returned by mouse_events(), oldest first, as
+# (kind, x, y, pressed, time) with x and y in pixels. Once MAX_MOUSE_EVENTS
+# are waiting, the oldest are dropped.
+MAX_MOUSE_EVENTS: int = 1024
+MOUSE_EVENTS: deque[tuple[str, int, int, bool, float]] = deque(maxlen=MAX_MOUSE_EVENTS)
+# A single worker encodes saved images in the order save() was called, so
+# saving the same filename twice always leaves the later frame on disk.
+# Started by the first save().
+SAVE_POOL: Optional[futures.ThreadPoolExecutor] = None
+PENDING_SAVES: list[futures.Future] = []
+RECORDER: Optional[recording.FrameRecorder] = None
 
 
 BLACK: tuple[int, int, int, int] = (0, 0, 0, 255)
@@ -56,15 +153,33 @@ y_min: float = DEFAULT_MIN_COORD
 y_max: float = DEFAULT_MAX_COORD
 x_scale: float = width / (x_max - x_min)
 y_scale: float = height / (y_max - y_min)
+# The transform set by translate(), rotate() and scale(), as (a, b, c, d,
+# e, f) mapping (x, y) to (a x + c y + e, b x + d y + f), or None for none;
+# and the transforms saved by push().
+transform: Optional[tuple[float, ...]] = None
+TRANSFORMS: list = []
+# The same transform acting on pixel coordinates, or None until
+# _pixel_transform() next needs it.
+pixel_transform: Optional[tuple[float, ...]] = None
 
 DEFAULT_PEN_RADIUS: float = 0.002
 DEFAULT_FRAMERATE: int = 60
 DEFAULT_FONT_NAME: str = "SansSerif"
 DEFAULT_FONT_SIZE: float = 12
+DEFAULT_PICTURE_CACHE_BYTES: int = 64 * 1024 * 1024
+# Curves are drawn as straight segments that stray at most this many pixels
+# from the true curve, unless set_curve_tolerance() says otherwise.
+DEFAULT_CURVE_TOLERANCE: float = 0.25
+# Outlines through fewer points than this are quicker to build in plain
+# Python with pyglet's MultiLine than with bulk_shapes.Stroke, whose NumPy
+# calls cost a fixed ~60 microseconds.
+MIN_STROKE_POINTS: int = 16
 
 color: tuple[int, int, int, int] = (0, 0, 0, 255)
+background: tuple[int, int, int, int] = WHITE
 pen_radius: float = DEFAULT_PEN_RADIUS
 framerate: int = DEFAULT_FRAMERATE
+curve_tolerance: float = DEFAULT_CURVE_TOLERANCE
 
 
 @dataclass
@@ -78,13 +193,239 @@ class FontProperties:
 font = FontProperties()
 
 
-@window.event
+@dataclass
+class PictureCacheStats:
+    """How well the picture() texture cache is working."""
+
+    hits: int = 0
+    misses: int = 0
+    bytes_used: int = 0
+    budget: int = DEFAULT_PICTURE_CACHE_BYTES
+
+
+@dataclass
+class FrameStats:
+    """Where the time went in the last frame shown by advance(). Times are
+    in seconds. GPU work is asynchronous, so time the GPU spends rendering
+    usually shows up in flip_time rather than draw_time."""
+
+    frame: int = 0
+    # Shapes drawn this frame, and how many of those reused a cleared shape.
+    shapes: int = 0
+    shapes_recycled: int = 0
+    # The longest any key read by next_key_typed() this frame had waited
+    # since it was typed.
+    key_latency: float = 0.0
+    # Vertices held by everything in the batch, including cleared shapes
+    # that are kept around for reuse.
+    vertices: int = 0
+    user_time: float = 0.0
+    wait_time: float = 0.0
+    draw_time: float = 0.0
+    flip_time: float = 0.0
+    fps: float = 0.0
+    target_fps: float = DEFAULT_FRAMERATE
+    # Whether advance() left the window as it was because nothing had been
+    # drawn or cleared since the frame before, and how many frames so far
+    # it has done that for.
+    skipped: bool = False
+    skipped_frames: int = 0
+
+    @property
+    def shapes_created(self) -> int:
+        return self.shapes - self.shapes_recycled
+
+
+@dataclass
+class MouseEvent:
+    """Something the mouse did: "move", or "press" or "release" of the left
+    button. x and y use the drawing's coordinates; pressed is whether the
+    left button was down afterwards, and time is when PennDraw received the
+    event, in time.perf_counter() seconds."""
+
+    kind: str
+    x: float
+    y: float
+    pressed: bool
+    time: float
+
+
+@dataclass
+class Layer:
+    """A named group of shapes rendered to its own texture by layer()."""
+
+    name: str
+    z: float = 0
+    static: bool = False
+    # Whether the texture holds the layer's current shapes; layers that
+    # don't aren't drawn.
+    rendered: bool = False
+    # What the layer renders to, and the sprite that draws it onto the canvas.
+    texture: Optional[pg.image.Texture] = None
+    sprite: Optional[pg.sprite.Sprite] = None
+
+
+class ShapeHandle:
+    """What a drawing function returns in retained mode (see
+    set_render_mode): a way to change the shape it drew without clearing
+    and redrawing everything. Each method rewrites only that shape's
+    vertices, so moving a few shapes in a big drawing is cheap.
+
+    A handle stops working once clear() erases its shape or delete() is
+    called, and its methods then raise a ValueError. Shapes drawn inside a
+    layer() block have no handle, and their drawing functions return None.
+    Neither do shapes drawn in immediate mode, which are only vertices in
+    one big array; there, only text() and picture() return a handle.
+    """
+
+    __slots__ = ("_parts", "_indices", "_rotations", "_generation", "_canvas")
+
+    def __init__(self, parts: tuple, indices: tuple):
+        self._parts = parts
+        # Where each part is in VERTICES, or None for a line, which is one
+        # of a LineBuffer's.
+        self._indices = indices
+        # How each part was turned when it was drawn, read by the first
+        # set_rotation() so that drawing doesn't have to.
+        self._rotations = None
+        self._generation = canvas_generation
+        # VERTICES is a layer's list inside its block.
+        self._canvas = VERTICES
+
+    def _live_parts(self):
+        if self._generation != canvas_generation:
+            raise ValueError("Invalid shape: it was erased by clear() or deleted.")
+        _mark_dirty()
+        return self._parts
+
+    def move_to(self, x: float, y: float):
+        """Move the shape so that the point it was drawn at is at (x, y):
+        the center of a circle, ellipse, rectangle, arc, pie, text or
+        picture, the first point of a line, polyline or polygon, and the
+        first center or point of a bulk drawing call. (x, y) goes through
+        the current transform, like the coordinates of a drawing call."""
+        position = (_scale_x(x), _scale_y(y))
+        if transform is not None:
+            position = _transformed_point(*position)
+        for part in self._live_parts():
+            part.position = (*position, *part.position[2:])
+
+    def set_color(self, *args):
+        """Recolor the shape, taking the same arguments as set_pen_color().
+        Raises a ValueError if the color is invalid."""
+        rgba = _validate_color(args)
+        for part in self._live_parts():
+            if isinstance(part, pg.sprite.Sprite):
+                part.color, part.opacity = rgba[:3], rgba[3]
+            else:
+                part.color = rgba
+
+    def set_rotation(self, degrees: float):
+        """Turn the shape degrees counter-clockwise from the way it was
+        drawn, around the point it was drawn at (see move_to())."""
+        parts = self._live_parts()
+        if self._rotations is None:
+            self._rotations = [part.rotation for part in parts]
+        for part, drawn in zip(parts, self._rotations):
+            # pyglet turns things clockwise.
+            part.rotation = drawn - degrees
+
+    def hide(self):
+        """Stop drawing the shape until show() is called."""
+        for part in self._live_parts():
+            part.visible = False
+
+    def show(self):
+        """Draw the shape again after hide()."""
+        for part in self._live_parts():
+            part.visible = True
+
+    def delete(self):
+        """Erase the shape for good, freeing its vertices."""
+        for part, index in zip(self._live_parts(), self._indices):
+            if index is not None:
+                # Left as None rather than removed, which would shift every
+                # shape after it; _recycle() skips it.
+                self._canvas[index] = None
+            part.delete()
+        self._generation = None
+
+
+def _handle(*handles: Optional[ShapeHandle]) -> Optional[ShapeHandle]:
+    """One handle for every part of several handles, if they all have one."""
+    if None in handles:
+        return None
+    return ShapeHandle(tuple(part for handle in handles for part in handle._parts),
+                       tuple(index for handle in handles for index in handle._indices))
+
+
+# Layers by name, in the order they were first drawn.
+LAYERS: dict[str, Layer] = {}
+# The layer whose block is running, if any, and whether its shapes are being
+# drawn (False when a static layer is reusing its texture).
+current_layer: Optional[Layer] = None
+building_layer: bool = False
+
+
+# Textures loaded by picture(), least recently used first, keyed by the
+# image's resolved path and modification time so edited files are reloaded.
+PICTURE_CACHE: OrderedDict[tuple[str, int], pg.image.Texture] = OrderedDict()
+picture_cache = PictureCacheStats()
+
+
+def _ensure_window() -> pg.window.Window:
+    """Return the window, opening it at the current canvas size if this is
+    the first time it's needed. Shapes can't be created without the window's
+    GL context, so every drawing function calls this through keep()."""
+    global window
+    if window is None:
+        window = pg.window.Window(width, height)
+        window.push_handlers(MOUSE_STATE, KEY_STATE, on_draw)
+        window.push_handlers(
+            on_expose=_mark_dirty, on_resize=_mark_dirty, on_text=_on_text,
+            on_mouse_motion=_on_mouse_motion, on_mouse_drag=_on_mouse_drag,
+            on_mouse_press=_on_mouse_press, on_mouse_release=_on_mouse_release,
+        )
+    return window
+
+
 def on_draw():
+    _ensure_window()
+    _release_recyclable()
+    # The window starts out white, so a translucent background is blended
+    # over white just like a translucent shape would be.
+    r, g, b, a = background
+    alpha = a / 255
+    pg.gl.glClearColor(
+        *((c * alpha + 255 * (1 - alpha)) / 255 for c in (r, g, b)), 1.0
+    )
     window.clear()
+    if line_run is not None:
+        # Its first upload allocates its vertices, possibly in a gap that
+        # _release_recyclable() just left before shapes drawn after it.
+        _end_line_run()
+    if LAYERS:
+        _draw_layers(above=False)
+    if ARENA is not None:
+        ARENA.upload()
+        ARENA.draw()
     BATCH.draw()
+    if LAYERS:
+        _draw_layers(above=True)
+    if STATS_OVERLAY is not None:
+        _update_overlay()
+        STATS_OVERLAY.draw()
 
 
 def run(animation=None):
+    if HEADLESS:
+        # There's no window to keep open, so draw the final frame and return
+        # instead of waiting forever for it to be closed.
+        _ensure_window().switch_to()
+        on_draw()
+        window.flip()
+        return
+    _ensure_window()
     pg.app.run()
 
 
@@ -100,14 +441,40 @@ def enable_animation(_framerate):
 # for compatibility.
 set_framerate = enable_animation
 
-# fps_display = pg.window.FPSDisplay(window=window)
-
-
 _next_frame_deadline: float = 0.0
-
-
-def advance():
-    global _next_frame_deadline
+# When the last advance() returned to the caller, for timing user code.
+_last_frame_end: Optional[float] = None
+frame_stats = FrameStats()
+# Counted since the last frame by keep(), _recycled() and _cached_label().
+shapes_drawn: int = 0
+shapes_recycled: int = 0
+# The longest wait of a key read by next_key_typed() since the last frame.
+key_latency: float = 0.0
+STATS_OVERLAY: Optional[pg.text.Label] = None
+_overlay_updated: float = 0.0
+# Whether anything was drawn or cleared since advance() last showed a frame.
+frame_dirty: bool = True
+
+
+def _mark_dirty(*args):
+    """Make the next advance() redraw the frame. Also handles window events
+    after which the window's contents need to be redrawn."""
+    global frame_dirty
+    frame_dirty = True
+
+
+def advance(redraw: bool = False):
+    """Show the frame drawn since the last call, waiting first so that
+    frames are shown no faster than the framerate.
+
+    If nothing has been drawn or cleared since the last frame, the window
+    already shows it, so it isn't drawn again; this keeps programs that wait
+    for input from using a whole CPU core. Pass redraw=True to draw the
+    frame anyway.
+    """
+    global _next_frame_deadline, frame_dirty
+    frame_start = time.perf_counter()
+    _ensure_window()
     # platform_event_loop.step(timeout) returns early whenever an OS event
     # arrives (mouse movement floods these), so a single step() call can't
     # be trusted to wait a full frame. Keep stepping until the deadline
@@ -124,8 +491,20 @@ def advance():
         sys.exit(0)
     window.switch_to()
     window.dispatch_events()
-    on_draw()
-    window.flip()
+    draw_start = time.perf_counter()
+    # The stats overlay changes by itself, and recording needs every frame
+    # drawn to read back its pixels.
+    redraw = redraw or frame_dirty or STATS_OVERLAY is not None or RECORDER is not None
+    if redraw:
+        on_draw()
+    draw_end = time.perf_counter()
+    if RECORDER is not None:
+        _record_frame()
+    flip_start = time.perf_counter()
+    if redraw:
+        window.flip()
+        frame_dirty = False
+    _end_frame(frame_start, draw_start, draw_end, flip_start, skipped=not redraw)
     # Schedule the next frame relative to this frame's deadline so drawing
     # time doesn't stretch the interval; if drawing overran the interval,
     # start fresh from now rather than racing to catch up.
@@ -134,6 +513,243 @@ def advance():
     )
 
 
+def _batch_vertices() -> int:
+    """The number of vertices allocated in BATCH."""
+    domains = {
+        id(domain): domain
+        for domain_map in BATCH.group_map.values()
+        for domain in domain_map.values()
+    }
+    return sum(sum(d.allocator.sizes) for d in domains.values())
+
+
+def _end_frame(
+    frame_start: float, draw_start: float, draw_end: float, flip_start: float,
+    skipped: bool = False,
+):
+    """Record frame_stats for the frame advance() just showed."""
+    global frame_stats, shapes_drawn, shapes_recycled, key_latency, _last_frame_end
+    now = time.perf_counter()
+    previous_end = _last_frame_end
+    frame_stats = FrameStats(
+        frame=frame_stats.frame + 1,
+        shapes=shapes_drawn,
+        shapes_recycled=shapes_recycled,
+        key_latency=key_latency,
+        vertices=_batch_vertices() + (len(ARENA) if ARENA is not None else 0),
+        user_time=0.0 if previous_end is None else frame_start - previous_end,
+        wait_time=draw_start - frame_start,
+        draw_time=draw_end - draw_start,
+        flip_time=now - flip_start,
+        fps=0.0 if previous_end is None else 1 / (now - previous_end),
+        target_fps=framerate,
+        skipped=skipped,
+        skipped_frames=frame_stats.skipped_frames + skipped,
+    )
+    shapes_drawn = shapes_recycled = 0
+    key_latency = 0.0
+    _last_frame_end = now
+
+
+def get_frame_stats() -> FrameStats:
+    """Return timing and size numbers for the most recent frame shown by
+    advance(): how many shapes were drawn and how many of those reused
+    shapes from an earlier frame, the longest a key read with
+    next_key_typed() had waited (key_latency), how many vertices are in
+    use, how long was spent in your code between frames (user_time),
+    waiting for the next frame and handling events (wait_time), drawing
+    (draw_time) and showing the frame (flip_time), the framerate achieved
+    (fps) versus the one requested (target_fps), and whether the frame was
+    skipped because nothing had changed (skipped), along with how many
+    frames have been skipped so far (skipped_frames)."""
+    return FrameStats(**vars(frame_stats))
+
+
+def show_frame_stats(show: bool = True):
+    """Show (or hide) get_frame_stats() in the top-left corner of the
+    window, updated a few times a second, while animating with advance()."""
+    global STATS_OVERLAY
+    if show == (STATS_OVERLAY is not None):
+        return
+    # The next frame has to be drawn to add or remove the overlay.
+    _mark_dirty()
+    if not show:
+        STATS_OVERLAY = None
+    else:
+        _ensure_window()
+        STATS_OVERLAY = pg.text.Label(
+            "", font_size=10, color=(0, 0, 0, 255), x=4, y=height - 4,
+            anchor_x="left", anchor_y="top", multiline=True, width=width,
+        )
+        _update_overlay()
+
+
+def _update_overlay():
+    """Refresh the overlay's text, at most four times a second so that it
+    stays readable and laying out the text stays cheap."""
+    global _overlay_updated
+    now = time.perf_counter()
+    if now - _overlay_updated < 0.25:
+        return
+    _overlay_updated = now
+    stats = frame_stats
+    STATS_OVERLAY.y = height - 4
+    STATS_OVERLAY.text = "\n".join((
+        f"{stats.fps:.1f} / {stats.target_fps:g} fps",
+        f"user {stats.user_time * 1000:.1f} ms  wait {stats.wait_time * 1000:.1f} ms",
+        f"draw {stats.draw_time * 1000:.1f} ms  flip {stats.flip_time * 1000:.1f} ms",
+        f"{stats.shapes} shapes ({stats.shapes_created} new)  "
+        f"{stats.vertices} vertices",
+    ))
+
+
+def _read_pixels(rgba: bool = False) -> tuple[bytes, int, int]:
+    """Return the pixels of the frame that was just drawn, bottom row first,
+    along with the framebuffer's width and height. Pixels are RGB unless
+    rgba is True."""
+    w, h = window.get_framebuffer_size()
+    components, gl_format = (4, pg.gl.GL_RGBA) if rgba else (3, pg.gl.GL_RGB)
+    buf = (pg.gl.GLubyte * (components * w * h))()
+    pg.gl.glPixelStorei(pg.gl.GL_PACK_ALIGNMENT, 1)
+    pg.gl.glReadBuffer(pg.gl.GL_BACK)
+    pg.gl.glReadPixels(0, 0, w, h, gl_format, pg.gl.GL_UNSIGNED_BYTE, buf)
+    return bytes(buf), w, h
+
+
+def _write_image(filename: str, pixels: bytes, w: int, h: int):
+    image = pg.image.ImageData(w, h, "RGB", pixels)
+    with open(filename, "wb") as file:
+        image.save(filename, file=file)
+
+
+def save(filename: str):
+    """Save the current drawing to an image file. The format is chosen by
+    the filename's extension; PNG is always supported, and JPEG is supported
+    when Pillow is installed. Raises a ValueError for any other extension.
+
+    The pixels are captured right away, but the file is encoded and written
+    on a background thread so that saving doesn't stall an animation. Call
+    flush_saves() to wait until every saved file has been written.
+    """
+    if not pg.image.codecs.get_encoders(filename):
+        raise ValueError(
+            f"Invalid file name: no image format matches '{filename}'."
+        )
+    global SAVE_POOL
+    _ensure_window().switch_to()
+    on_draw()
+    _load_numpy()
+    if SAVE_POOL is None:
+        SAVE_POOL = futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="penndraw-save"
+        )
+    PENDING_SAVES[:] = [f for f in PENDING_SAVES if not f.done() or f.exception()]
+    PENDING_SAVES.append(SAVE_POOL.submit(_write_image, filename, *_read_pixels()))
+
+
+@atexit.register
+def flush_saves():
+    """Wait until every image passed to save() has been written to disk.
+    If any of them could not be written, raise the first error."""
+    if not PENDING_SAVES:
+        return
+    pending = PENDING_SAVES[:]
+    PENDING_SAVES.clear()
+    futures.wait(pending)
+    for future in pending:
+        future.result()
+
+
+_record_clock: float = 0.0
+
+
+def start_recording(path: str, fps: Optional[float] = None):
+    """Start saving every frame shown by advance() to path. The format is
+    chosen by path: a name ending in .gif records an animated GIF (this needs
+    Pillow), a name ending in .rgba records the raw RGBA bytes of each frame,
+    top row first, and any other name is a folder to fill with numbered PNG
+    files. fps is how many frames per second of animation to keep; it
+    defaults to the animation's framerate.
+
+    Frames are written on a background thread. If the disk can't keep up,
+    advance() waits up to one frame for it and then drops the frame, so
+    recording never uses more than a fixed amount of memory.
+    Raises a ValueError if a recording is already running, if fps is not a
+    positive number, or if path can't be recorded to.
+    """
+    global RECORDER, _record_clock
+    if RECORDER is not None:
+        raise ValueError(
+            f"Invalid recording: already recording to '{RECORDER.path}'."
+        )
+    if fps is None:
+        fps = framerate
+    if not isinstance(fps, (int, float)) or fps <= 0:
+        raise ValueError("Invalid fps: must be a positive number.")
+    _load_numpy()
+    RECORDER = recording.FrameRecorder(path, fps, max_wait=1 / framerate)
+    # Starting the clock full records the very next frame.
+    _record_clock = 1.0
+
+
+def _record_frame():
+    """Hand the frame that was just drawn to the recorder, skipping frames
+    as needed so that frames are kept at the recording's fps."""
+    global _record_clock
+    if _record_clock >= 1:
+        _record_clock %= 1
+        RECORDER.add_frame(*_read_pixels(rgba=True))
+    _record_clock += RECORDER.fps / framerate
+
+
+@atexit.register
+def stop_recording() -> Optional[recording.RecordingStats]:
+    """Stop recording, wait for every frame to be written, and return a
+    RecordingStats with how many frames were written, delayed and dropped.
+    Does nothing and returns None if nothing is being recorded.
+    Recording also stops by itself when the program exits.
+    """
+    global RECORDER
+    if RECORDER is None:
+        return None
+    recorder, RECORDER = RECORDER, None
+    stats = recorder.close()
+    if stats.dropped:
+        print(
+            f"PennDraw: dropped {stats.dropped} of "
+            f"{stats.written + stats.dropped} frames recorded to "
+            f"'{stats.path}' because the disk couldn't keep up.",
+            file=sys.stderr,
+        )
+    return stats
+
+
+def _resize_window(w: int, h: int):
+    """Resize the window to w by h pixels.
+
+    pyglet's headless window ignores set_size because an EGL pbuffer has a
+    fixed size, so in headless mode we swap in a new pbuffer instead. The GL
+    context is kept, so everything already in the batch stays valid.
+    A window that isn't open yet will simply open at the new size.
+    """
+    if window is None:
+        return
+    # pyglet has no public way to give a window a new pbuffer, so this uses
+    # the private attributes of pyglet 2.0's HeadlessWindow (setup.py pins
+    # the version); without them, set_size() is the best there is.
+    if not HEADLESS or not hasattr(window, "_egl_surface"):
+        window.set_size(w, h)
+        return
+    if (w, h) == window.get_size():
+        return
+    from pyglet.libs.egl import egl
+    old_surface = window._egl_surface
+    window._width, window._height = w, h
+    window._egl_surface = None
+    window._create()
+    egl.eglDestroySurface(window._egl_display_connection, old_surface)
+
+
 def set_canvas_size(w: int, h: int):
     """Set the size of the canvas to the specified width and height in pixels.
     Raises a ValueError if the width or height is less than 1.
@@ -146,8 +762,121 @@ def set_canvas_size(w: int, h: int):
         )
     width = w
     height = h
-    window.set_size(w, h)
-    set_scale(x_min, x_max)
+    _resize_window(w, h)
+    # Keep both axes' coordinates, which set_x_scale() and set_y_scale()
+    # may have set differently.
+    _set_transform()
+    # Layers were rendered at the old size.
+    invalidate_layer()
+
+
+def set_curve_tolerance(pixels: float):
+    """Set how far, in pixels, the straight segments that circles, ellipses,
+    arcs and pies are drawn with may stray from the true curve. Smaller values
+    draw smoother curves; larger values draw faster, since every curve gets
+    fewer vertices. The default is 0.25.
+    Raises a ValueError if pixels is not a positive number.
+    """
+    global curve_tolerance
+    if not isinstance(pixels, (int, float)) or pixels <= 0:
+        raise ValueError("Invalid curve tolerance: must be a positive number.")
+    curve_tolerance = pixels
+
+
+def _curve_segments(radius: float, sweep: float = 2 * math.pi) -> int:
+    """How many segments to draw a curve of radius pixels with, through
+    sweep radians, at the current curve tolerance."""
+    return bulk_shapes.curve_segments(radius * _curve_stretch(), curve_tolerance, sweep)
+
+
+def _curve_segment_counts(radii: np.ndarray) -> np.ndarray:
+    """How many segments to draw each of a bulk call's curves of radii
+    pixels with, at the current curve tolerance."""
+    return bulk_shapes.curve_segment_counts(radii * _curve_stretch(), curve_tolerance)
+
+
+def _curve_stretch() -> float:
+    """How much the current transform stretches curves at most, so that
+    they get as many segments as they need once it has."""
+    if transform is None:
+        return 1.0
+    a, b, c, d, *_ = _pixel_transform()
+    return max(math.hypot(a, b), math.hypot(c, d))
+
+
+def _by_segments(segments: np.ndarray, build):
+    """The vertices of a bulk call's curves, each drawn with its own number
+    of segments rather than all with as many as the largest needs.
+
+    build(indices, k) returns the vertices of the curves at indices with k
+    segments each, one curve after another. The curves are built a group of
+    equal k at a time, and put back in the order they were given, so that
+    later ones are still drawn over earlier ones. Returns the (n, 2)
+    vertices and the number of vertices of each curve.
+    """
+    kinds = np.unique(segments)
+    if len(kinds) == 1:
+        vertices = build(slice(None), int(kinds[0]))
+        return vertices, np.full(len(segments), len(vertices) // len(segments))
+    groups = [(np.flatnonzero(segments == k), int(k)) for k in kinds]
+    parts = [(indices, build(indices, k)) for indices, k in groups]
+    counts = np.empty(len(segments), dtype=np.intp)
+    for indices, vertices in parts:
+        counts[indices] = len(vertices) // len(indices)
+    starts = np.cumsum(counts) - counts
+    out = np.empty((counts.sum(), 2), dtype=np.float32)
+    for indices, vertices in parts:
+        per_curve = len(vertices) // len(indices)
+        out[(starts[indices, None] + np.arange(per_curve)).ravel()] = vertices
+    return out, counts
+
+
+def set_render_mode(mode: str):
+    """Choose how shapes are drawn. In "retained" mode, the default, every
+    shape is an object of its own, which later frames reuse when they draw
+    the same kinds of shapes again. In "immediate" mode, shapes are written
+    straight into one big array instead, which is sent to the screen and
+    drawn all at once; this is faster for animations that clear() and
+    redraw every shape each frame.
+
+    Text and pictures, and shapes drawn inside a layer() block, are drawn
+    the same way in either mode. Text and pictures are drawn over
+    immediate-mode shapes, whichever was drawn first.
+    Raises a ValueError if mode is not "retained" or "immediate".
+    """
+    global render_mode
+    if mode not in ("retained", "immediate"):
+        raise ValueError("Invalid render mode: must be 'retained' or 'immediate'.")
+    render_mode = mode
+
+
+def _immediate() -> bool:
+    """Whether shapes drawn now go into ARENA instead of shapes of their own."""
+    return render_mode == "immediate" and current_layer is None
+
+
+def _as_triangles() -> bool:
+    """Whether shapes drawn now are built from triangles computed here, to
+    go through the current transform or into ARENA (see _triangles())."""
+    return transform is not None or _immediate()
+
+
+def _arena() -> bulk_shapes.VertexArena:
+    global ARENA
+    if ARENA is None:
+        _ensure_window()
+        ARENA = bulk_shapes.VertexArena()
+    return ARENA
+
+
+def _placed(positions: np.ndarray, x: float, y: float, rotation: float) -> np.ndarray:
+    """Where the shape shader puts the vertices of a shape at (x, y) that
+    is rotated by rotation degrees, which pyglet turns clockwise."""
+    if rotation:
+        r = math.radians(rotation)
+        c, s = math.cos(r), math.sin(r)
+        positions = positions @ np.array(((c, -s), (s, c)))
+    return positions + (x, y)
 
 
 def set_pen_radius(r: float):
@@ -272,19 +1001,37 @@ def set_scale(min_c: float = DEFAULT_MIN_COORD, max_c: float = DEFAULT_MAX_COORD
     Calling set_scale() with no arguments resets to the default (0, 1).
     """
 
-    global x_min, x_max, y_min, y_max
+    set_x_scale(min_c, max_c)
+    set_y_scale(min_c, max_c)
+
+
+def set_x_scale(min_c: float = DEFAULT_MIN_COORD, max_c: float = DEFAULT_MAX_COORD):
+    """Set the x coordinates of the canvas's left and right edges, leaving
+    the y coordinates as they are. With no arguments, resets to (0, 1).
+    """
+    global x_min, x_max
     size = max_c - min_c
     x_min = min_c - BORDER * size
     x_max = max_c + BORDER * size
+    _set_transform()
+
+
+def set_y_scale(min_c: float = DEFAULT_MIN_COORD, max_c: float = DEFAULT_MAX_COORD):
+    """Set the y coordinates of the canvas's bottom and top edges, leaving
+    the x coordinates as they are. With no arguments, resets to (0, 1).
+    """
+    global y_min, y_max
+    size = max_c - min_c
     y_min = min_c - BORDER * size
     y_max = max_c + BORDER * size
     _set_transform()
 
 
 def _set_transform():
-    global x_scale, y_scale
+    global x_scale, y_scale, pixel_transform
     x_scale = width / (x_max - x_min)
     y_scale = height / (y_max - y_min)
+    pixel_transform = None
 
 
 def _scale_x(x: float) -> float:
@@ -315,9 +1062,122 @@ def _scaled_pen_radius() -> float:
     return pen_radius * width
 
 
+def push():
+    """Save the current transform, for the matching pop() to restore.
+    Drawing each part of a recursive drawing, like the branches of a tree or
+    the moons of a planet, between push() and pop() lets it translate(),
+    rotate() and scale() relative to its parent without undoing that after.
+    """
+    TRANSFORMS.append(transform)
+
+
+def pop():
+    """Restore the transform saved by the most recent push().
+    Raises a ValueError if there is no push() left to undo.
+    """
+    global transform, pixel_transform
+    if not TRANSFORMS:
+        raise ValueError("Invalid pop: every push() has already been popped.")
+    transform = TRANSFORMS.pop()
+    pixel_transform = None
+
+
+def _transform_by(a: float, b: float, c: float, d: float, e: float, f: float):
+    """Apply (a, b, c, d, e, f) to whatever is drawn from now on, before
+    the current transform."""
+    global transform, pixel_transform
+    if transform is None:
+        transform = (a, b, c, d, e, f)
+    else:
+        a1, b1, c1, d1, e1, f1 = transform
+        transform = (
+            a1 * a + c1 * b, b1 * a + d1 * b, a1 * c + c1 * d, b1 * c + d1 * d,
+            a1 * e + c1 * f + e1, b1 * e + d1 * f + f1,
+        )
+    pixel_transform = None
+
+
+def translate(x: float, y: float):
+    """Move the origin of everything drawn from now on to (x, y)."""
+    _transform_by(1, 0, 0, 1, x, y)
+
+
+def rotate(degrees: float):
+    """Turn everything drawn from now on degrees counter-clockwise around
+    the origin."""
+    r = math.radians(degrees)
+    c, s = math.cos(r), math.sin(r)
+    _transform_by(c, s, -s, c, 0, 0)
+
+
+def scale(sx: float, sy: Optional[float] = None):
+    """Stretch everything drawn from now on sx times wider and sy times
+    taller (sx times both, without sy), away from the origin. Pen radius
+    and line thickness are stretched too.
+    Raises a ValueError if sx or sy is 0.
+    """
+    if sy is None:
+        sy = sx
+    if sx == 0 or sy == 0:
+        raise ValueError("Invalid scale: must not be 0.")
+    _transform_by(sx, 0, 0, sy, 0, 0)
+
+
+def _pixel_transform() -> tuple[float, ...]:
+    """The current transform, as it maps pixel coordinates to pixel
+    coordinates: scaling back to drawing coordinates, transforming, and
+    scaling again."""
+    global pixel_transform
+    if pixel_transform is None:
+        a, b, c, d, e, f = transform
+        e = (a * x_min + c * y_min + e - x_min) * x_scale
+        f = (b * x_min + d * y_min + f - y_min) * y_scale
+        pixel_transform = a, b * y_scale / x_scale, c * x_scale / y_scale, d, e, f
+    return pixel_transform
+
+
+def _transformed(positions) -> np.ndarray:
+    """Pixel positions, as an (n, 2) array or flat x0, y0, x1, y1, ...,
+    moved by the current transform."""
+    a, b, c, d, e, f = _pixel_transform()
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    return positions @ np.array(((a, b), (c, d))) + (e, f)
+
+
+def _transformed_point(x: float, y: float) -> tuple[float, float]:
+    a, b, c, d, e, f = _pixel_transform()
+    return a * x + c * y + e, b * x + d * y + f
+
+
+def _transformed_angle() -> float:
+    """How many degrees counter-clockwise the current transform turns the
+    x axis."""
+    a, b, *_ = _pixel_transform()
+    return math.degrees(math.atan2(b, a))
+
+
 def keep(f):
     def wrapper(*args, **kwargs):
-        VERTICES.append(f(*args, **kwargs))
+        global shapes_drawn, frame_dirty
+        if current_layer is not None and not building_layer:
+            # A static layer is reusing its texture instead.
+            return
+        if window is None:
+            _ensure_window()
+        if line_run is not None:
+            _end_line_run()
+        shape = f(*args, **kwargs)
+        shapes_drawn += 1
+        frame_dirty = True
+        # Shapes drawn in immediate mode are only in ARENA.
+        if shape is None:
+            return None
+        VERTICES.append(shape)
+        # A layer's shapes are freed once it's rendered.
+        if current_layer is not None:
+            return None
+        _drawn(shape)
+        return ShapeHandle((shape,), (len(VERTICES) - 1,))
 
     return wrapper
 
@@ -329,62 +1189,615 @@ def scale_inputs(f):
     return wrapper
 
 
+def _recycle():
+    """Sort the shapes in CLEARED into the recycling pool.
+
+    Animations clear() and then redraw nearly the same shapes every frame,
+    so rather than deleting a shape's vertex list only to allocate an
+    identical one a moment later, cleared shapes stay in BATCH until the
+    next frame is drawn. Draw calls take matching shapes back out with
+    _recycled(), and whatever is left over is deleted by
+    _release_recyclable() before drawing.
+
+    clear() itself only moves its shapes to CLEARED, so that its cost
+    doesn't depend on how much was drawn; they are sorted here, on the
+    first draw call that could reuse one.
+    """
+    global CLEARED
+    for shape in CLEARED:
+        if shape is None:
+            # Deleted through its ShapeHandle.
+            continue
+        if isinstance(shape, LineBuffer):
+            # Any buffer can hold any number of lines, so they're kept
+            # together.
+            shape.clear()
+            RECYCLABLE.setdefault((LineBuffer, 0), []).append(shape)
+        elif isinstance(shape, pg.shapes.ShapeBase):
+            # Possibly hidden through a ShapeHandle; _apply() rewrites it.
+            shape._visible = True
+            RECYCLABLE.setdefault((type(shape), shape._num_verts), []).append(shape)
+        elif isinstance(shape, pg.text.Label):
+            _cache_label(shape)
+        else:
+            shape.delete()
+    CLEARED = []
+    # Shapes are taken from the end, so the first one reused is the one
+    # stored first, and an animation that draws the same shapes in the same
+    # order every frame never has to move them. See _drawn().
+    for shapes in RECYCLABLE.values():
+        shapes.sort(key=_vertex_start, reverse=True)
+
+
+def _vertex_start(shape) -> int:
+    """Where a shape's vertices start in its vertex domain, or -1 if it
+    hasn't been given any yet."""
+    vertex_list = shape._vertex_list
+    return -1 if vertex_list is None else vertex_list.start
+
+
+def _drawn(shape):
+    """Make sure a shape just drawn on the canvas is drawn over the shapes
+    drawn before it since clear().
+
+    A recycled shape keeps its old place in its vertex domain, and pyglet
+    gives a new one the first gap it fits in, so either can end up before
+    a shape drawn earlier in the frame. Its vertices are then moved after
+    all the others.
+    """
+    if not isinstance(shape, pg.shapes.ShapeBase) or shape._vertex_list is None:
+        return
+    vertex_list = shape._vertex_list
+    if vertex_list.start < DRAWN_UP_TO.get(vertex_list.domain, 0):
+        _move_to_end(vertex_list)
+    DRAWN_UP_TO[vertex_list.domain] = vertex_list.start + vertex_list.count
+
+
+def _move_to_end(vertex_list):
+    """Move a vertex list after every other one in its domain, growing
+    the domain's buffers like VertexDomain.safe_alloc() if it has to.
+
+    pyglet's only public way to move a vertex list, migrate(), puts it in
+    the first gap it fits in, like any new one. So this works on the
+    domain's allocator directly, as pyglet 2.0 lays it out (setup.py pins
+    the version), and falls back to migrate() if it's laid out differently.
+    """
+    domain = vertex_list.domain
+    allocator = getattr(domain, "allocator", None)
+    if not (hasattr(allocator, "starts") and hasattr(allocator, "sizes")
+            and hasattr(pg.graphics.vertexdomain, "_nearest_pow2")):
+        vertex_list.migrate(domain)
+        return
+    start = allocator.starts[-1] + allocator.sizes[-1]
+    count = vertex_list.count
+    if start + count > allocator.capacity:
+        capacity = pg.graphics.vertexdomain._nearest_pow2(start + count)
+        for buffer, _ in domain.buffer_attributes:
+            buffer.resize(capacity * buffer.attribute_stride)
+        allocator.set_capacity(capacity)
+    # The same as Allocator.alloc() does when there's no gap to fill.
+    allocator.sizes[-1] += count
+    for attribute in domain.attribute_names.values():
+        buffer = attribute.buffer
+        buffer.set_region(start, count, buffer.get_region(vertex_list.start, count))
+    allocator.dealloc(vertex_list.start, count)
+    vertex_list.start = start
+
+
+def _label_key(s: str, font_name: str, font_size: float, anchor_x: str) -> tuple:
+    return s, font_name, font_size, anchor_x
+
+
+def _cache_label(label: pg.text.Label):
+    """Hide a cleared label and keep it for text() to reuse. Laying out
+    text is slow, but moving, rotating and recoloring a layout is cheap.
+    Once more than MAX_CACHED_LABELS are hidden, the least recently used
+    ones are deleted."""
+    global cached_label_count
+    label.visible = False
+    key = _label_key(label.text, label.font_name, label.font_size, label.anchor_x)
+    LABEL_CACHE.setdefault(key, []).append(label)
+    LABEL_CACHE.move_to_end(key)
+    cached_label_count += 1
+    while cached_label_count > MAX_CACHED_LABELS:
+        oldest_key, oldest = next(iter(LABEL_CACHE.items()))
+        oldest.pop().delete()
+        if not oldest:
+            del LABEL_CACHE[oldest_key]
+        cached_label_count -= 1
+
+
+def _cached_label(key: tuple) -> Optional[pg.text.Label]:
+    """Take a hidden label with the given _label_key out of the cache."""
+    global cached_label_count, shapes_recycled
+    if current_layer is not None:
+        # Cached labels belong to the canvas's batch, not the layer's.
+        return None
+    if CLEARED:
+        _recycle()
+    labels = LABEL_CACHE.get(key)
+    if not labels:
+        return None
+    label = labels.pop()
+    if not labels:
+        del LABEL_CACHE[key]
+    cached_label_count -= 1
+    shapes_recycled += 1
+    return label
+
+
+def _recycled(kind: type, num_verts: int, **state):
+    """Return a recycled shape of the given class and vertex count with its
+    private attributes (e.g. x=... sets _x) overwritten by state, or None.
+
+    Only the vertex data is rewritten; the vertex list itself is reused.
+    """
+    global shapes_recycled
+    if current_layer is not None:
+        # Recycled shapes belong to the canvas's batch, not the layer's.
+        return None
+    if CLEARED:
+        _recycle()
+    shapes = RECYCLABLE.get((kind, num_verts))
+    if not shapes:
+        return None
+    shapes_recycled += 1
+    return _apply(shapes.pop(), **state)
+
+
+def _apply(shape, **state):
+    """Overwrite a shape's private attributes and rewrite its vertex data
+    once, rather than once per property setter."""
+    old_rotation = shape._rotation
+    for name, value in state.items():
+        setattr(shape, "_" + name, value)
+    shape._update_vertices()
+    shape._update_translation()
+    shape._update_color()
+    if shape._rotation != old_rotation:
+        shape.rotation = shape._rotation
+    return shape
+
+
+def _clear_label_cache():
+    """Forget every cached label, e.g. when the batch they're in is dropped."""
+    global cached_label_count
+    LABEL_CACHE.clear()
+    cached_label_count = 0
+
+
+def _release_recyclable():
+    """Delete recycled shapes that no draw call reused this frame."""
+    global BATCH, CLEARED
+    if not VERTICES and (CLEARED or RECYCLABLE):
+        # Nothing has been drawn since clear(), so every shape in BATCH is
+        # garbage: drop the batch and its vertex domains in one go instead
+        # of deleting each vertex list from them.
+        BATCH = pg.graphics.Batch()
+        CLEARED = []
+        RECYCLABLE.clear()
+        _clear_label_cache()
+        return
+    if CLEARED:
+        _recycle()
+    for shapes in RECYCLABLE.values():
+        for shape in shapes:
+            shape.delete()
+    RECYCLABLE.clear()
+
+
 def _reset():
     """Reset all drawing state to defaults. Intended for use between tests."""
     global width, height, BATCH, VERTICES, color, pen_radius, framerate, font
-    global _next_frame_deadline
+    global background, CLEARED, _next_frame_deadline, picture_cache
+    global curve_tolerance, frame_stats, shapes_drawn, shapes_recycled
+    global _last_frame_end, STATS_OVERLAY, current_layer, building_layer
+    global frame_dirty, key_latency, line_run, render_mode, ARENA, canvas_generation
+    global transform
 
     _next_frame_deadline = 0.0
-
-    for shape in VERTICES:
-        shape.delete()
-    VERTICES.clear()
+    frame_dirty = True
+    canvas_generation += 1
+
+    VERTICES = []
+    line_run = None
+    render_mode = "retained"
+    transform = None
+    TRANSFORMS.clear()
+    if ARENA is not None:
+        ARENA.delete()
+        ARENA = None
+    CLEARED = []
+    RECYCLABLE.clear()
+    DRAWN_UP_TO.clear()
+    _clear_label_cache()
     BATCH = pg.graphics.Batch()
+    LAYERS.clear()
+    current_layer = None
+    building_layer = False
 
     width = DEFAULT_SIZE
     height = DEFAULT_SIZE
-    window.set_size(width, height)
+    _resize_window(width, height)
 
     color = BLACK
+    background = WHITE
     pen_radius = DEFAULT_PEN_RADIUS
     framerate = DEFAULT_FRAMERATE
+    curve_tolerance = DEFAULT_CURVE_TOLERANCE
+    frame_stats = FrameStats()
+    shapes_drawn = shapes_recycled = 0
+    key_latency = 0.0
+    _last_frame_end = None
+    TYPED_KEYS.clear()
+    MOUSE_EVENTS.clear()
+    STATS_OVERLAY = None
     font = FontProperties()
+    PICTURE_CACHE.clear()
+    picture_cache = PictureCacheStats()
 
     set_scale(DEFAULT_MIN_COORD, DEFAULT_MAX_COORD)
-    pg.gl.glClearColor(1.0, 1.0, 1.0, 1.0)
 
 
 def clear(*args):
-    """Clear the canvas to a given color."""
-    global color
-    old_color = color
-    color = WHITE if not args else _validate_color(args)
-    for shape in VERTICES:
-        shape.delete()
-    VERTICES.clear()
-    filled_rectangle(
-        (x_min + x_max) / 2,
-        abs(y_min + y_max) / 2,
-        (x_max - x_min) / 2,
-        abs(y_max - y_min) / 2,
-    )
-    color = old_color
+    """Clear the canvas to a given color (white by default).
+
+    The background is painted by on_draw() with glClearColor, and the
+    cleared shapes are handed to the recycling pool, so clearing takes
+    the same time no matter how much had been drawn.
+    """
+    global background, VERTICES, CLEARED, frame_dirty, line_run, canvas_generation
+    background = WHITE if not args else _validate_color(args)
+    frame_dirty = True
+    canvas_generation += 1
+    line_run = None
+    DRAWN_UP_TO.clear()
+    if ARENA is not None:
+        ARENA.clear()
+    if CLEARED:
+        CLEARED += VERTICES
+    else:
+        CLEARED = VERTICES
+    VERTICES = []
+    for existing in LAYERS.values():
+        if not existing.static:
+            existing.rendered = False
+
+
+@contextmanager
+def layer(name: str, static: bool = False, z: float = 0):
+    """Draw the shapes drawn inside a `with layer(name):` block onto their
+    own layer, which is rendered to a texture and drawn onto the canvas as a
+    single image. Layers with z at most 0 are drawn beneath everything drawn
+    outside of a layer, and layers with a larger z above it; layers are
+    drawn in order of z, and layers with equal z in the order they were
+    first drawn.
+
+    A static layer keeps its texture from one frame to the next, even
+    through clear(): after the first time, its block's drawing calls do
+    nothing, so a complicated background costs the same as one picture.
+    Use invalidate_layer() to draw it again. Any other layer is redrawn
+    every time its block runs, and cleared by clear().
+
+    The block's `as` value is True when its shapes are being drawn, so
+    `with layer("grid", static=True) as drawing: if drawing: ...` can skip
+    work that only the drawing needs.
+
+    Raises a ValueError if called inside another layer's block.
+    """
+    global BATCH, VERTICES, current_layer, building_layer, line_run
+    if current_layer is not None:
+        raise ValueError(
+            f"Invalid layer: '{name}' can't be drawn inside layer '{current_layer.name}'."
+        )
+    the_layer = LAYERS.get(name)
+    if the_layer is None:
+        the_layer = LAYERS[name] = Layer(name)
+    the_layer.z = z
+    the_layer.static = static
+    building = not (static and the_layer.rendered)
+    if line_run is not None:
+        _end_line_run()
+    canvas = BATCH, VERTICES
+    current_layer, building_layer = the_layer, building
+    if building:
+        BATCH, VERTICES = pg.graphics.Batch(), []
+    try:
+        yield building
+        if building:
+            if line_run is not None:
+                _end_line_run()
+            _render_layer(the_layer, BATCH)
+    finally:
+        # The layer's shapes are freed along with its batch.
+        BATCH, VERTICES = canvas
+        current_layer, building_layer = None, False
+        line_run = None
+
+
+def invalidate_layer(name: Optional[str] = None):
+    """Make a layer draw its shapes again the next time its block runs,
+    and stop showing it until then. With no name, every layer is
+    invalidated. Raises a ValueError if there is no layer with that name.
+    """
+    if name is None:
+        layers = list(LAYERS.values())
+    elif name in LAYERS:
+        layers = [LAYERS[name]]
+    else:
+        raise ValueError(f"Invalid layer: no layer named '{name}'.")
+    for the_layer in layers:
+        the_layer.rendered = False
+    _mark_dirty()
+
+
+def _render_layer(the_layer: Layer, batch: pg.graphics.Batch):
+    """Render batch into the layer's texture, starting from transparent."""
+    _ensure_window().switch_to()
+    w, h = window.get_framebuffer_size()
+    texture = the_layer.texture
+    if texture is None or (texture.width, texture.height) != (w, h):
+        texture = the_layer.texture = pg.image.Texture.create(w, h)
+        # Rendering onto transparent pixels leaves colors premultiplied by
+        # alpha (see _draw_premultiplied), so the texture is blended that
+        # way too.
+        the_layer.sprite = pg.sprite.Sprite(
+            texture, blend_src=pg.gl.GL_ONE, blend_dest=pg.gl.GL_ONE_MINUS_SRC_ALPHA
+        )
+        the_layer.sprite.scale_x = width / w
+        the_layer.sprite.scale_y = height / h
+    framebuffer = pg.image.Framebuffer()
+    framebuffer.attach_texture(texture)
+    framebuffer.bind()
+    pg.gl.glViewport(0, 0, w, h)
+    pg.gl.glClearColor(0, 0, 0, 0)
+    pg.gl.glClear(pg.gl.GL_COLOR_BUFFER_BIT)
+    _draw_premultiplied(batch)
+    framebuffer.unbind()
+    framebuffer.delete()
+    the_layer.rendered = True
+    _mark_dirty()
+
+
+def _draw_premultiplied(batch: pg.graphics.Batch):
+    """Draw batch like Batch.draw(), but blend the alpha channel so that
+    the result can be drawn over the canvas with premultiplied alpha and
+    look the same as drawing the batch directly.
+
+    Every group sets glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA) for
+    all four channels when it's drawn, which would leave a translucent
+    shape drawn onto transparent pixels with its alpha squared. So after
+    each group's set_state the alpha channel is switched to "over":
+    GL_ONE, GL_ONE_MINUS_SRC_ALPHA.
+
+    Batch has no public way to run code between its groups, so this walks
+    its private draw list, as pyglet 2.0 builds it (setup.py pins the
+    version). Without one, the batch is drawn as usual, and translucent
+    shapes come out of the layer a little more transparent.
+    """
+    if not hasattr(batch, "_draw_list"):
+        batch.draw()
+        return
+    if batch._draw_list_dirty:
+        batch._update_draw_list()
+    for func in batch._draw_list:
+        func()
+        if getattr(func, "__name__", None) == "set_state":
+            group = func.__self__
+            pg.gl.glBlendFuncSeparate(
+                getattr(group, "blend_src", pg.gl.GL_SRC_ALPHA),
+                getattr(group, "blend_dest", pg.gl.GL_ONE_MINUS_SRC_ALPHA),
+                pg.gl.GL_ONE, pg.gl.GL_ONE_MINUS_SRC_ALPHA,
+            )
+
+
+def _draw_layers(above: bool):
+    """Draw the rendered layers beneath the canvas's own shapes (z <= 0),
+    or above them, in z order."""
+    for the_layer in sorted(LAYERS.values(), key=lambda l: l.z):
+        if the_layer.rendered and (the_layer.z > 0) == above:
+            the_layer.sprite.draw()
 
 
 @keep
 def _pixel(x: float, y: float):
     x_scaled = _scale_x(x)
     y_scaled = _scale_y(y)
-    return pg.shapes.Rectangle(
+    if _as_triangles():
+        x1, y1 = x_scaled + 1, y_scaled + 1
+        return _triangles(
+            (x_scaled, y_scaled, x1, y_scaled, x1, y1, x_scaled, y_scaled, x1, y1, x_scaled, y1),
+            x_scaled, y_scaled,
+        )
+    return _recycled(
+        pg.shapes.Rectangle, 6, x=x_scaled, y=y_scaled, width=1, height=1,
+        anchor_x=0, anchor_y=0, rotation=0, rgba=color,
+    ) or pg.shapes.Rectangle(
         x_scaled, y_scaled, 1, 1, color=color, batch=BATCH
     )
 
 
 def point(x: float, y: float):
     if _scaled_pen_radius() <= 1:
-        _pixel(x, y)
-    else:
-        filled_circle(x, y, pen_radius)
+        return _pixel(x, y)
+    return filled_circle(x, y, pen_radius)
+
+
+def _validate_colors(colors, n: int) -> np.ndarray:
+    """Return an (n, 4) array of RGBA bytes for a bulk drawing call.
+
+    colors may be None (use the pen color), a single color tuple, or one
+    color per item as a sequence of tuples or an (n, 3)/(n, 4) array.
+    """
+    if colors is None:
+        return np.tile(np.array(color, dtype=np.uint8), (n, 1))
+    if isinstance(colors, tuple) and len(colors) in (3, 4) and all(
+        isinstance(c, int) for c in colors
+    ):
+        return np.tile(np.array(_validate_color((colors,)), dtype=np.uint8), (n, 1))
+    try:
+        arr = np.asarray(colors)
+    except ValueError:
+        # A list mixing RGB and RGBA tuples can't become one array directly.
+        arr = np.array([_validate_color((c,)) for c in colors])
+    if (
+        arr.ndim != 2
+        or arr.shape != (n, arr.shape[1])
+        or arr.shape[1] not in (3, 4)
+        or not np.issubdtype(arr.dtype, np.integer)
+        or (n > 0 and (arr.min() < 0 or arr.max() > 255))
+    ):
+        raise ValueError(
+            "Invalid colors: must provide one color per item, each with 3 or 4 integer components between 0-255."
+        )
+    if arr.shape[1] == 3:
+        arr = np.column_stack((arr, np.full(n, 255)))
+    return arr.astype(np.uint8)
+
+
+def _validate_lengths(name: str, n: int, value) -> np.ndarray:
+    """Broadcast a scalar or per-item sequence to a float array of length n."""
+    arr = np.asarray(value, dtype=np.float64)
+    if arr.ndim == 0:
+        return np.full(n, float(arr))
+    arr = arr.ravel()
+    if len(arr) != n:
+        raise ValueError(
+            f"Invalid {name}: must provide a single value or one value per item."
+        )
+    return arr
+
+
+@keep
+def _mesh(positions: np.ndarray, colors: np.ndarray, x: float, y: float):
+    """Draw triangles with the given vertices and colors, in pixels. They
+    move and turn around (x, y), the first thing the bulk call drew."""
+    return _triangles(positions, x, y, colors)
+
+
+def _triangles(vertices, x: float, y: float, colors=None):
+    """Draw triangles with vertices in pixels, given as an (n, 2) array or
+    a flat tuple of coordinates, through the current transform, in the pen
+    color or one color per vertex. Outside of immediate mode, they become
+    a TriangleMesh that moves and turns around (x, y)."""
+    rgba = color if colors is None else colors
+    if transform is not None:
+        vertices = _transformed(vertices)
+        x, y = _transformed_point(x, y)
+    if _immediate():
+        if isinstance(vertices, tuple):
+            _arena().triangles(vertices, rgba)
+        else:
+            _arena().mesh(vertices, rgba)
+        return None
+    positions = np.reshape(vertices, (-1, 2))
+    colors = np.broadcast_to(np.array(rgba, dtype=np.uint8), (len(positions), 4))
+    return _triangle_mesh(positions, colors, x, y)
+
+
+def _triangle_mesh(positions: np.ndarray, colors: np.ndarray, x: float, y: float):
+    positions = np.ascontiguousarray(positions, dtype=np.float32)
+    colors = np.ascontiguousarray(colors, dtype=np.uint8)
+    placement = dict(x=x, y=y, anchor_x=x, anchor_y=y, rotation=0)
+    return _recycled(
+        bulk_shapes.TriangleMesh, len(positions), positions=positions,
+        colors=colors, **placement,
+    ) or _apply(bulk_shapes.TriangleMesh(positions, colors, batch=BATCH), **placement)
+
+
+def _centered(points: list, x: float, y: float) -> dict:
+    """The _multiline() state of a path through points that moves and
+    turns around (x, y) instead of its first point."""
+    return dict(x=x, y=y, anchor_x=x - points[0][0], anchor_y=y - points[0][1])
+
+
+def _multiline(coordinates: list, closed: bool, **state):
+    """Build (or recycle) a MultiLine through coordinates with the current
+    pen radius and color. state overrides any other private attributes.
+    Long paths use bulk_shapes.Stroke, which builds the same triangles with
+    NumPy."""
+    path = coordinates + coordinates[:1] if closed else coordinates
+    if _as_triangles():
+        if len(path) < 2:
+            # No segments to draw, like a MultiLine through a single point.
+            return None
+        placement = dict(x=path[0][0], y=path[0][1], anchor_x=0, anchor_y=0, rotation=0)
+        placement.update(state)
+        points = np.array(path, dtype=np.float64)
+        points -= (points[0, 0] + placement["anchor_x"], points[0, 1] + placement["anchor_y"])
+        return _triangles(_placed(
+            bulk_shapes.stroke_vertices(points, _scaled_pen_radius()),
+            placement["x"], placement["y"], placement["rotation"],
+        ), placement["x"], placement["y"])
+    kind = pg.shapes.MultiLine
+    if len(path) >= MIN_STROKE_POINTS:
+        kind = bulk_shapes.Stroke
+    defaults = dict(x=path[0][0], y=path[0][1], anchor_x=0, anchor_y=0, rotation=0)
+    recycled = _recycled(
+        kind, (len(path) - 1) * 6, coordinates=path,
+        closed=closed, thickness=_scaled_pen_radius(), rgba=color,
+        **{**defaults, **state},
+    )
+    if recycled:
+        return recycled
+    ml = kind(
+        *coordinates,
+        thickness=_scaled_pen_radius(),
+        closed=closed,
+        color=color,
+        batch=BATCH,
+    )
+    return _apply(ml, **state) if state else ml
+
+
+def points(xs, ys, colors=None, radius=None):
+    """Draw many points at once. Much faster than calling point() in a loop.
+
+    xs and ys are equal-length sequences (or NumPy arrays) of coordinates.
+    colors is None to use the pen color, a single color, or one color per point.
+    radius is None to use the pen radius, a single radius, or one radius per point.
+    Just like point(), points whose radius is at most one pixel are drawn as a
+    single pixel and larger points are drawn as filled circles.
+
+    Raises a ValueError if xs, ys, colors, and radius don't have matching lengths,
+    if any radius is not positive, or if a color is invalid.
+    """
+    xs = np.asarray(xs, dtype=np.float64).ravel()
+    ys = np.asarray(ys, dtype=np.float64).ravel()
+    if xs.shape != ys.shape:
+        raise ValueError("Invalid points: xs and ys must have the same length.")
+    n = len(xs)
+    radii = _validate_lengths("pen radius", n, pen_radius if radius is None else radius)
+    rgba = _validate_colors(colors, n)
+    if n == 0:
+        return None
+    if np.any(radii <= 0):
+        raise ValueError("Invalid pen radius: must be positive.")
+
+    x_scaled = _scale_x(xs)
+    y_scaled = _scale_y(ys)
+    # Same threshold as point(): the pen radius is a fraction of the width.
+    is_pixel = radii * width <= 1
+    positions, vertex_colors = [], []
+    if is_pixel.any():
+        positions.append(
+            bulk_shapes.pixel_vertices(x_scaled[is_pixel], y_scaled[is_pixel])
+        )
+        vertex_colors.append(np.repeat(rgba[is_pixel], 6, axis=0))
+    if not is_pixel.all():
+        is_dot = ~is_pixel
+        x, y = x_scaled[is_dot], y_scaled[is_dot]
+        a = _factor_x(radii[is_dot])
+        b = _factor_y(radii[is_dot])
+        dots, counts = _by_segments(
+            _curve_segment_counts(np.maximum(a, b)),
+            lambda i, k: bulk_shapes.filled_ellipse_vertices(x[i], y[i], a[i], b[i], k),
+        )
+        positions.append(dots)
+        vertex_colors.append(np.repeat(rgba[is_dot], counts, axis=0))
+    return _mesh(
+        np.concatenate(positions), np.concatenate(vertex_colors), x_scaled[0], y_scaled[0]
+    )
 
 
 @keep
@@ -395,7 +1808,7 @@ def __ellipse(
     y_scaled = _scale_y(y)
     a_scaled = _factor_x(a)
     b_scaled = _factor_y(b)
-    segments = max(50, int(max(a_scaled, b_scaled) / 1.25))
+    segments = _curve_segments(max(a_scaled, b_scaled))
 
     if a_scaled < 1 or b_scaled < 1:
         raise ValueError(
@@ -403,24 +1816,22 @@ def __ellipse(
         )
 
     if not filled:
-        rot_rad = math.radians(rotation)
-        cos_r, sin_r = math.cos(rot_rad), math.sin(rot_rad)
-        points = [
-            (x_scaled + (a_scaled * math.cos(i * 2 * math.pi / segments)) * cos_r
-                      - (b_scaled * math.sin(i * 2 * math.pi / segments)) * sin_r,
-             y_scaled + (a_scaled * math.cos(i * 2 * math.pi / segments)) * sin_r
-                      + (b_scaled * math.sin(i * 2 * math.pi / segments)) * cos_r)
-            for i in range(segments)
-        ]
-        return pg.shapes.MultiLine(
-            *points,
-            thickness=_scaled_pen_radius(),
-            closed=True,
-            color=color,
-            batch=BATCH,
-        )
+        points = bulk_shapes.ellipse_outline(
+            x_scaled, y_scaled, a_scaled, b_scaled, rotation, segments
+        ).tolist()
+        return _multiline(points, closed=True, **_centered(points, x_scaled, y_scaled))
+
+    elif _as_triangles():
+        fan = bulk_shapes.unit_fan(segments) * (a_scaled, b_scaled)
+        return _triangles(_placed(fan, x_scaled, y_scaled, rotation), x_scaled, y_scaled)
 
     else:
+        recycled = _recycled(
+            pg.shapes.Ellipse, segments * 3, x=x_scaled, y=y_scaled, a=a_scaled,
+            b=b_scaled, anchor_x=0, anchor_y=0, rotation=rotation, rgba=color,
+        )
+        if recycled:
+            return recycled
         ellipse = pg.shapes.Ellipse(
             x_scaled,
             y_scaled,
@@ -428,26 +1839,94 @@ def __ellipse(
             b_scaled,
             color=color,
             batch=BATCH,
-            segments=50,
+            segments=segments,
         )
         ellipse.rotation = rotation
         return ellipse
 
 
 def ellipse(x: float, y: float, a: float, b: float, angle: float = 0.0):
-    __ellipse(x, y, a, b, False, angle)
+    return __ellipse(x, y, a, b, False, angle)
 
 
 def filled_ellipse(x: float, y: float, a: float, b: float, angle: float = 0.0):
-    __ellipse(x, y, a, b, True, angle)
+    return __ellipse(x, y, a, b, True, angle)
 
 
 def circle(x: float, y: float, radius: float):
-    __ellipse(x, y, radius, radius, False, 0)
+    return __ellipse(x, y, radius, radius, False, 0)
 
 
 def filled_circle(x: float, y: float, radius: float):
-    __ellipse(x, y, radius, radius, True, 0)
+    return __ellipse(x, y, radius, radius, True, 0)
+
+
+def _ellipses(xs, ys, a, b, filled: bool, angles, colors):
+    xs = np.asarray(xs, dtype=np.float64).ravel()
+    ys = np.asarray(ys, dtype=np.float64).ravel()
+    if xs.shape != ys.shape:
+        raise ValueError("Invalid centers: xs and ys must have the same length.")
+    n = len(xs)
+    a_scaled = _factor_x(_validate_lengths("ellipse size", n, a))
+    b_scaled = _factor_y(_validate_lengths("ellipse size", n, b))
+    rotations = _validate_lengths("angle", n, angles)
+    rgba = _validate_colors(colors, n)
+    if n == 0:
+        return None
+    if np.any(a_scaled < 1) or np.any(b_scaled < 1):
+        raise ValueError(
+            "Invalid ellipse size: width and height must be positive."
+        )
+
+    x_scaled = _scale_x(xs)
+    y_scaled = _scale_y(ys)
+    thickness = _scaled_pen_radius()
+
+    def build(i, segments):
+        if filled:
+            # filled_ellipse() rotates through pyglet, which turns shapes
+            # clockwise; the outlines below turn counter-clockwise like ellipse().
+            return bulk_shapes.filled_ellipse_vertices(
+                x_scaled[i], y_scaled[i], a_scaled[i], b_scaled[i], segments,
+                rotation=-rotations[i],
+            )
+        px, py = bulk_shapes.ellipse_points(
+            x_scaled[i], y_scaled[i], a_scaled[i], b_scaled[i], rotations[i], segments
+        )
+        return bulk_shapes.closed_stroke_vertices(px, py, thickness)
+
+    positions, counts = _by_segments(
+        _curve_segment_counts(np.maximum(a_scaled, b_scaled)), build
+    )
+    return _mesh(positions, np.repeat(rgba, counts, axis=0), x_scaled[0], y_scaled[0])
+
+
+def ellipses(xs, ys, a, b, angles=0.0, colors=None):
+    """Draw many ellipse outlines at once with the current pen radius.
+
+    xs and ys are equal-length sequences (or NumPy arrays) of centers.
+    a, b and angles are each a single value or one value per ellipse.
+    colors is None to use the pen color, a single color, or one color per ellipse.
+
+    Raises a ValueError if the lengths don't match, an ellipse is smaller than
+    a pixel, or a color is invalid.
+    """
+    return _ellipses(xs, ys, a, b, False, angles, colors)
+
+
+def filled_ellipses(xs, ys, a, b, angles=0.0, colors=None):
+    """Draw many filled ellipses at once. See ellipses() for the arguments."""
+    return _ellipses(xs, ys, a, b, True, angles, colors)
+
+
+def circles(xs, ys, radii, colors=None):
+    """Draw many circle outlines at once. See ellipses() for the arguments."""
+    return _ellipses(xs, ys, radii, radii, False, 0.0, colors)
+
+
+def filled_circles(xs, ys, radii, colors=None):
+    """Draw many filled circles at once. See ellipses() for the arguments."""
+    return _ellipses(xs, ys, radii, radii, True, 0.0, colors)
 
 
 @keep
@@ -467,31 +1946,21 @@ def __arc(
     if angle_diff < 0:
         angle_diff %= 2 * math.pi
 
-    n = max(20, int(max(rx, ry) / 1.25 * angle_diff / (2 * math.pi)))
-    points = [
-        (x_scaled + rx * math.cos(a1 + i * angle_diff / n),
-         y_scaled + ry * math.sin(a1 + i * angle_diff / n))
-        for i in range(n + 1)
-    ]
+    n = _curve_segments(max(rx, ry), angle_diff)
+    points = bulk_shapes.arc_point_list(x_scaled, y_scaled, rx, ry, a1, angle_diff, n)
 
     if closed:
         points = [(x_scaled, y_scaled)] + points + [(x_scaled, y_scaled)]
 
-    return pg.shapes.MultiLine(
-        *points,
-        closed=False,
-        color=color,
-        thickness=_scaled_pen_radius(),
-        batch=BATCH,
-    )
+    return _multiline(points, closed=False, **_centered(points, x_scaled, y_scaled))
 
 
 def arc(x: float, y: float, r: float, angle1: float, angle2: float):
-    __arc(x, y, r, angle1, angle2)
+    return __arc(x, y, r, angle1, angle2)
 
 
 def closed_arc(x: float, y: float, r: float, angle1: float, angle2: float):
-    __arc(x, y, r, angle1, angle2, closed=True)
+    return __arc(x, y, r, angle1, angle2, closed=True)
 
 
 @keep
@@ -509,10 +1978,20 @@ def __sector(x: float, y: float, r: float, angle1: float, angle2: float):
     if angle_diff < 0:
         angle_diff %= 2 * 3.14159
 
-    return pg.shapes.Sector(
+    segments = _curve_segments(r_scaled, angle_diff)
+    if _as_triangles():
+        return _triangles(bulk_shapes.sector_vertices(
+            x_scaled, y_scaled, r_scaled, angle1, angle_diff, segments
+        ), x_scaled, y_scaled)
+    return _recycled(
+        pg.shapes.Sector, segments * 3, x=x_scaled, y=y_scaled,
+        radius=r_scaled, segments=segments, start_angle=angle1,
+        angle=angle_diff, anchor_x=0, anchor_y=0, rotation=0, rgba=color,
+    ) or pg.shapes.Sector(
         x_scaled,
         y_scaled,
         r_scaled,
+        segments=segments,
         start_angle=angle1,
         angle=angle_diff,
         color=color,
@@ -521,22 +2000,24 @@ def __sector(x: float, y: float, r: float, angle1: float, angle2: float):
 
 
 def filled_pie(x: float, y: float, r: float, angle1: float, angle2: float):
-    __sector(x, y, r, angle1, angle2)
+    return __sector(x, y, r, angle1, angle2)
 
 
 def pie(x: float, y: float, r: float, angle1: float, angle2: float):
-    arc(x, y, r, angle1, angle2)
-    line(
-        x,
-        y,
-        x + r * math.cos(math.radians(angle1)),
-        y + r * math.sin(math.radians(angle1)),
-    )
-    line(
-        x,
-        y,
-        x + r * math.cos(math.radians(angle2)),
-        y + r * math.sin(math.radians(angle2)),
+    return _handle(
+        arc(x, y, r, angle1, angle2),
+        line(
+            x,
+            y,
+            x + r * math.cos(math.radians(angle1)),
+            y + r * math.sin(math.radians(angle1)),
+        ),
+        line(
+            x,
+            y,
+            x + r * math.cos(math.radians(angle2)),
+            y + r * math.sin(math.radians(angle2)),
+        ),
     )
 
 
@@ -560,44 +2041,48 @@ def __rectangle(
         )
 
     if not filled:
-        _r = UnfilledRectangle(
-            x_scaled,
-            y_scaled,
-            2 * w_scaled,
-            2 * h_scaled,
-            color=color,
-            batch=BATCH,
-        )
+        x2, y2 = x_scaled + 2 * w_scaled, y_scaled + 2 * h_scaled
+        # Both ends of each side, in UnfilledRectangle's order.
         paired = [
-            [a + x_scaled, b + y_scaled]
-            for a, b in zip(_r._get_vertices()[::2], _r._get_vertices()[1::2])
+            [x_scaled, y_scaled], [x2, y_scaled], [x2, y_scaled], [x2, y2],
+            [x2, y2], [x_scaled, y2], [x_scaled, y2], [x_scaled, y_scaled],
         ]
         # add a repeat of the second vertex to avoid the weird line cap issue
         paired.append(paired[1])
-        ml = pg.shapes.MultiLine(
-            *paired,
-            thickness=_scaled_pen_radius(),
-            closed=True,
-            color=color,
-            batch=BATCH,
+        return _multiline(
+            paired, closed=True, anchor_x=w_scaled, anchor_y=h_scaled,
+            x=x_scaled + w_scaled, y=y_scaled + h_scaled, rotation=rotation,
         )
-        ml.anchor_position = (w_scaled, h_scaled)
-        ml.position = (x_scaled + w_scaled, y_scaled + h_scaled)
-        ml.rotation = rotation
-        return ml
+    elif _as_triangles():
+        corners = ((-w_scaled, -h_scaled), (w_scaled, -h_scaled),
+                   (w_scaled, h_scaled), (-w_scaled, h_scaled))
+        x, y = x_scaled + w_scaled, y_scaled + h_scaled
+        r = math.radians(rotation)
+        c, s = math.cos(r), math.sin(r)
+        # Turned clockwise, like the retained Rectangle.
+        (ax, ay), (bx, by), (cx, cy), (dx, dy) = (
+            (x + u * c + v * s, y - u * s + v * c) for u, v in corners
+        )
+        return _triangles((ax, ay, bx, by, cx, cy, ax, ay, cx, cy, dx, dy), x, y)
     else:
-        rect = pg.shapes.Rectangle(
-            x_scaled,
-            y_scaled,
-            2 * w_scaled,
-            2 * h_scaled,
-            color=color,
-            batch=BATCH,
+        placement = dict(
+            anchor_x=w_scaled, anchor_y=h_scaled, x=x_scaled + w_scaled,
+            y=y_scaled + h_scaled, rotation=rotation,
+        )
+        return _recycled(
+            pg.shapes.Rectangle, 6, width=2 * w_scaled, height=2 * h_scaled,
+            rgba=color, **placement,
+        ) or _apply(
+            pg.shapes.Rectangle(
+                x_scaled,
+                y_scaled,
+                2 * w_scaled,
+                2 * h_scaled,
+                color=color,
+                batch=BATCH,
+            ),
+            **placement,
         )
-        rect.anchor_position = (w_scaled, h_scaled)
-        rect.position = (x_scaled + w_scaled, y_scaled + h_scaled)
-        rect.rotation = rotation
-        return rect
 
 
 def rectangle(
@@ -607,7 +2092,7 @@ def rectangle(
     half_height: float,
     angle: float = 0.0,
 ):
-    __rectangle(x, y, half_width, half_height, False, angle)
+    return __rectangle(x, y, half_width, half_height, False, angle)
 
 
 def filled_rectangle(
@@ -617,39 +2102,95 @@ def filled_rectangle(
     half_height: float,
     angle: float = 0.0,
 ):
-    __rectangle(x, y, half_width, half_height, True, angle)
+    return __rectangle(x, y, half_width, half_height, True, angle)
 
 
 def square(x: float, y: float, half_side_length: float, angle: float = 0.0):
-    __rectangle(x, y, half_side_length, half_side_length, False, angle)
+    return __rectangle(x, y, half_side_length, half_side_length, False, angle)
 
 
 def filled_square(
     x: float, y: float, half_side_length: float, angle: float = 0.0
 ):
-    __rectangle(x, y, half_side_length, half_side_length, True, angle)
-
-
-@keep
-def __line(x1: float, y1: float, x2: float, y2: float):
-    x1_scaled = _scale_x(x1)
-    y1_scaled = _scale_y(y1)
-    x2_scaled = _scale_x(x2)
-    y2_scaled = _scale_y(y2)
-
-    return pg.shapes.Line(
-        x1_scaled,
-        y1_scaled,
-        x2_scaled,
-        y2_scaled,
-        width=_scaled_pen_radius(),
-        color=color,
-        batch=BATCH,
-    )
+    return __rectangle(x, y, half_side_length, half_side_length, True, angle)
+
+
+def _start_line_run():
+    """Start a LineBuffer for line() to add to, reusing a cleared one if
+    there is one."""
+    global line_run, line_run_recycled
+    _ensure_window()
+    line_run = None
+    # Recycled buffers belong to the canvas's batch, not a layer's.
+    if current_layer is None:
+        if CLEARED:
+            _recycle()
+        buffers = RECYCLABLE.get((LineBuffer, 0))
+        if buffers:
+            line_run = buffers.pop()
+    line_run_recycled = line_run is not None
+    if line_run is None:
+        line_run = LineBuffer(BATCH)
+    VERTICES.append(line_run)
+
+
+def _end_line_run():
+    """Upload the lines in line_run; later lines go in a new buffer so
+    that they are drawn over whatever was drawn in between."""
+    global line_run
+    line_run.upload()
+    if current_layer is None:
+        _drawn(line_run)
+    line_run = None
 
 
 def line(x1: float, y1: float, x2: float, y2: float):
-    __line(x1, y1, x2, y2)
+    """Draw a line from (x1, y1) to (x2, y2).
+
+    Lines drawn one after another are added to a single LineBuffer, which is
+    uploaded to the GPU once, when the frame is drawn or something other
+    than a line is drawn, instead of each line being a shape of its own.
+    """
+    global shapes_drawn, shapes_recycled, frame_dirty
+    if current_layer is not None and not building_layer:
+        # A static layer is reusing its texture instead.
+        return None
+    shapes_drawn += 1
+    frame_dirty = True
+    x1, y1, x2, y2 = _scale_x(x1), _scale_y(y1), _scale_x(x2), _scale_y(y2)
+    thickness = _scaled_pen_radius()
+    if transform is not None:
+        a, b, c, d, e, f = _pixel_transform()
+        x1, y1, x2, y2 = (
+            a * x1 + c * y1 + e, b * x1 + d * y1 + f,
+            a * x2 + c * y2 + e, b * x2 + d * y2 + f,
+        )
+        # Only the ends go through the transform, so that the line can
+        # still share the buffer; its thickness grows with the transform's
+        # average scale.
+        thickness *= math.sqrt(abs(a * d - b * c))
+    if _immediate():
+        _immediate_line(x1, y1, x2, y2, thickness)
+        return None
+    if line_run is None:
+        _start_line_run()
+    line_run.add(x1, y1, x2, y2, thickness, color)
+    shapes_recycled += line_run_recycled
+    if current_layer is not None:
+        return None
+    return ShapeHandle((BufferedLine(line_run, len(line_run) - 1),), (None,))
+
+
+def _immediate_line(x1: float, y1: float, x2: float, y2: float, width: float):
+    """Write a line into ARENA, as the same triangles as LineBuffer.add()."""
+    length = math.hypot(y2 - y1, x2 - x1)
+    r = math.atan2(y2 - y1, x2 - x1)
+    cr = math.cos(r)
+    sr = math.sin(r)
+    bx, by = x1 + length * cr, y1 + length * sr
+    cx, cy = bx - width * sr, by + width * cr
+    dx, dy = x1 - width * sr, y1 + width * cr
+    _arena().triangles((x1, y1, bx, by, cx, cy, x1, y1, cx, cy, dx, dy), color)
 
 
 def _scale_points(*points):
@@ -666,8 +2207,17 @@ def filled_polygon(*points):
         raise ValueError(
             "Invalid polygon: must provide an even number of points."
         )
-    zipped_points = zip(points[::2], points[1::2])
-    return pg.shapes.Polygon(*zipped_points, color=color, batch=BATCH)
+    zipped_points = list(zip(points[::2], points[1::2]))
+    if _as_triangles():
+        corners = np.array(zipped_points, dtype=np.float64)
+        return _triangles(
+            corners[bulk_shapes.triangulate(tuple(zipped_points))], *zipped_points[0]
+        )
+    return _recycled(
+        bulk_shapes.FilledPolygon, (len(zipped_points) - 2) * 3,
+        coordinates=zipped_points, x=zipped_points[0][0],
+        y=zipped_points[0][1], anchor_x=0, anchor_y=0, rotation=0, rgba=color,
+    ) or bulk_shapes.FilledPolygon(*zipped_points, color=color, batch=BATCH)
 
 
 @keep
@@ -677,14 +2227,8 @@ def polygon(*points):
         raise ValueError(
             "Invalid polygon: must provide an even number of points."
         )
-    zipped_points = zip(points[::2], points[1::2])
-    return pg.shapes.MultiLine(
-        *zipped_points,
-        color=color,
-        thickness=_scaled_pen_radius(),
-        batch=BATCH,
-        closed=True,
-    )
+    zipped_points = list(zip(points[::2], points[1::2]))
+    return _multiline(zipped_points, closed=True)
 
 
 @keep
@@ -694,22 +2238,28 @@ def polyline(*points):
         raise ValueError(
             "Invalid polyline: must provide an even number of points."
         )
-    zipped_points = zip(points[::2], points[1::2])
-    return pg.shapes.MultiLine(
-        *zipped_points,
-        color=color,
-        thickness=_scaled_pen_radius(),
-        batch=BATCH,
-        closed=False,
-    )
+    zipped_points = list(zip(points[::2], points[1::2]))
+    return _multiline(zipped_points, closed=False)
 
 
 @keep
 def text(
     x: float, y: float, s: str, angle: float = 0.0, orientation: str = "center"
-) -> pg.text.Label:
+):
     x_scaled = _scale_x(x)
     y_scaled = _scale_y(y)
+    if transform is not None:
+        # Text is moved and turned by the transform, but keeps its size.
+        x_scaled, y_scaled = _transformed_point(x_scaled, y_scaled)
+        angle -= _transformed_angle()
+    label = _cached_label(_label_key(s, font.name, font.size, orientation))
+    if label is not None:
+        label.position = (x_scaled, y_scaled, 0)
+        label.rotation = angle
+        if label.color != color:
+            label.color = color
+        label.visible = True
+        return label
     return pg.text.Label(
         s,
         font_name=font.name,
@@ -725,11 +2275,69 @@ def text(
 
 
 def text_left(x: float, y: float, s: str, angle: float = 0.0):
-    text(x, y, s, orientation="left")
+    return text(x, y, s, orientation="left")
 
 
 def text_right(x: float, y: float, s: str, angle: float = 0.0):
-    text(x, y, s, orientation="right")
+    return text(x, y, s, orientation="right")
+
+
+def _texture_bytes(texture: pg.image.Texture) -> int:
+    return texture.width * texture.height * 4
+
+
+def _load_picture(filename: str) -> pg.image.Texture:
+    """Return the texture for an image file, loading it only if it isn't
+    already cached or has been modified since it was cached."""
+    path = os.path.realpath(filename)
+    key = (path, os.stat(path).st_mtime_ns)
+    texture = PICTURE_CACHE.get(key)
+    if texture is not None:
+        picture_cache.hits += 1
+        PICTURE_CACHE.move_to_end(key)
+        return texture
+
+    picture_cache.misses += 1
+    texture = pg.image.load(path).get_texture()
+    # PennDraw.java uses the center of the image as the anchor point,
+    # so we mimic that here
+    texture.anchor_x = texture.width // 2
+    texture.anchor_y = texture.height // 2
+
+    for stale in [k for k in PICTURE_CACHE if k[0] == path]:
+        picture_cache.bytes_used -= _texture_bytes(PICTURE_CACHE.pop(stale))
+    PICTURE_CACHE[key] = texture
+    picture_cache.bytes_used += _texture_bytes(texture)
+    _evict_pictures()
+    return texture
+
+
+def _evict_pictures():
+    """Drop least recently used textures until the cache fits its budget.
+    Pictures already on screen keep their own reference to the texture."""
+    while picture_cache.bytes_used > picture_cache.budget:
+        _, texture = PICTURE_CACHE.popitem(last=False)
+        picture_cache.bytes_used -= _texture_bytes(texture)
+
+
+def set_picture_cache_size(max_bytes: int):
+    """Set how many bytes of image data picture() may keep loaded so that
+    drawing the same image again doesn't reload it from disk. The least
+    recently drawn images are forgotten first. 0 turns the cache off.
+    Raises a ValueError if max_bytes is negative."""
+    if not isinstance(max_bytes, int) or max_bytes < 0:
+        raise ValueError(
+            "Invalid picture cache size: must be a non-negative integer."
+        )
+    picture_cache.budget = max_bytes
+    _evict_pictures()
+
+
+def picture_cache_stats() -> PictureCacheStats:
+    """Return how many picture() calls found their image already loaded
+    (hits) or had to load it (misses), and how many bytes of images are
+    loaded out of the cache's budget."""
+    return PictureCacheStats(**vars(picture_cache))
 
 
 @keep
@@ -743,12 +2351,7 @@ def picture(
 ):
     x_scaled = _scale_x(x)
     y_scaled = _scale_y(y)
-    img = pg.image.load(filename)
-
-    # PennDraw.java uses the center of the image as the anchor point,
-    # so we mimic that here
-    img.anchor_x = img.width // 2
-    img.anchor_y = img.height // 2
+    img = _load_picture(filename)
 
     # TODO: Apparently throwing all Sprites in the same batch is bad for performance.
     #       Need to keep an eye on this.
@@ -758,6 +2361,14 @@ def picture(
         the_sprite.scale_x = width / img.width
     if height is not None:
         the_sprite.scale_y = height / img.height
+    if transform is not None:
+        a, b, c, d, *_ = _pixel_transform()
+        the_sprite.position = (*_transformed_point(x_scaled, y_scaled), 0)
+        the_sprite.update(
+            scale_x=the_sprite.scale_x * math.hypot(a, b),
+            scale_y=the_sprite.scale_y * math.hypot(c, d),
+        )
+        degrees -= _transformed_angle()
     the_sprite.rotation = degrees
     return the_sprite
 
@@ -774,10 +2385,52 @@ def mouse_pressed():
     return MOUSE_STATE[LEFT]
 
 
+def _on_mouse_motion(x: int, y: int, dx: int, dy: int):
+    MOUSE_EVENTS.append(("move", x, y, False, time.perf_counter()))
+
+
+def _on_mouse_drag(x: int, y: int, dx: int, dy: int, buttons: int, modifiers: int):
+    MOUSE_EVENTS.append(("move", x, y, bool(buttons & LEFT), time.perf_counter()))
+
+
+def _on_mouse_press(x: int, y: int, button: int, modifiers: int):
+    if button == LEFT:
+        MOUSE_EVENTS.append(("press", x, y, True, time.perf_counter()))
+
+
+def _on_mouse_release(x: int, y: int, button: int, modifiers: int):
+    if button == LEFT:
+        MOUSE_EVENTS.append(("release", x, y, False, time.perf_counter()))
+
+
+def mouse_events(coalesce: bool = True) -> list[MouseEvent]:
+    """Return every mouse movement, press and release of the left button
+    since the last call, oldest first, as MouseEvent objects. mouse_x() and
+    mouse_y() only give where the mouse is now, so a fast stroke jumps
+    between frames; following these events traces every point in between.
+
+    With coalesce, consecutive movements that stay on the same pixel count
+    as one, the last of them. Only the most recent MAX_MOUSE_EVENTS events
+    are kept between calls.
+    """
+    events = []
+    last_move = None
+    while MOUSE_EVENTS:
+        kind, x, y, pressed, when = MOUSE_EVENTS.popleft()
+        if coalesce and kind == "move":
+            if last_move == (x, y, pressed):
+                events.pop()
+            last_move = (x, y, pressed)
+        else:
+            last_move = None
+        events.append(MouseEvent(kind, _user_x(x), _user_y(y), pressed, when))
+    return events
+
+
 def has_next_key_typed():
-    """Return True if a key is currently being typed, False otherwise."""
-    KEYS_PRESSED = {k for k, v in KEY_STATE.data.items() if v and _printable(k)}
-    return len(KEYS_PRESSED) > 0
+    """Return True if a key has been typed that next_key_typed() hasn't
+    returned yet, False otherwise."""
+    return bool(TYPED_KEYS)
 
 
 def is_key_typed(key: str):
@@ -787,21 +2440,31 @@ def is_key_typed(key: str):
     return KEY_STATE[ord(key)]
 
 
-def _printable(char_code: int) -> bool:
-    return 32 <= char_code <= 127
+def _on_text(text: str):
+    """Queue every printable character the window receives for
+    next_key_typed(), along with when it arrived."""
+    global TYPED_KEYS
+    if TYPED_KEYS.maxlen != MAX_TYPED_KEYS:
+        # MAX_TYPED_KEYS was changed since the queue was made.
+        TYPED_KEYS = deque(TYPED_KEYS, maxlen=MAX_TYPED_KEYS)
+    now = time.perf_counter()
+    TYPED_KEYS.extend((char, now) for char in text if char.isprintable())
 
 
 def next_key_typed():
-    """Return the next key being typed as a string.
-    If multiple keys are being typed, return one of them arbitrarily.
-    Capable of returning any ASCII character between 32 and 127.
-    (Anything printable on a standard US keyboard.)
-    Caps Lock will not have an effect on the output, but Shift will.
-    """
-    char_code = {
-        k for k, v in KEY_STATE.data.items() if v and _printable(k)
-    }.pop()
-    if KEY_STATE[LSHIFT] or KEY_STATE[RSHIFT]:
-        return chr(char_code).upper()
-    else:
-        return chr(char_code)
+    """Return the oldest key typed that hasn't been returned yet, as a
+    string. Keys are remembered even if they were let go before this is
+    called, so none are missed between frames; if more than MAX_TYPED_KEYS
+    pile up unread, the oldest are forgotten. Shift and Caps Lock affect the
+    character just as they do when typing anywhere else.
+    Raises a ValueError if no key is waiting; check has_next_key_typed()
+    first.
+    """
+    global key_latency
+    if not TYPED_KEYS:
+        raise ValueError(
+            "Invalid call: no key has been typed. Check has_next_key_typed() first."
+        )
+    char, typed_at = TYPED_KEYS.popleft()
+    key_latency = max(key_latency, time.perf_counter() - typed_at)
+    return char
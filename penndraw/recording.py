@@ -0,0 +1,196 @@
+import io
+import os
+import queue
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pyglet as pg
+
+
+@dataclass
+class RecordingStats:
+    """How a recording went. `delayed` frames made advance() wait for the
+    writer to catch up; `dropped` frames were skipped because it didn't."""
+
+    path: str
+    written: int = 0
+    delayed: int = 0
+    dropped: int = 0
+
+
+class FrameRecorder:
+    """Writes frames to disk on a background thread.
+
+    Frames go through a bounded queue, so a slow disk costs frames rather
+    than memory: when the queue is full, `add_frame` waits up to
+    `max_wait` seconds for the writer and then gives up on the frame.
+
+    The output format is chosen by `path`:
+      - `*.gif` is an animated GIF (requires Pillow), appended to a frame
+        at a time like the others,
+      - `*.rgba` is every frame's raw RGBA bytes, top row first, one frame
+        after another,
+      - anything else is a directory that gets numbered PNG files.
+    """
+
+    def __init__(self, path: str, fps: float, max_queued: int = 16, max_wait: float = 0.0):
+        self.path = path
+        self.fps = fps
+        self.max_wait = max_wait
+        self.stats = RecordingStats(path)
+        self._frames = queue.Queue(maxsize=max_queued)
+        self._error = None
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".gif":
+            try:
+                from PIL import Image
+            except ImportError:
+                raise ValueError(
+                    "Invalid recording path: recording a GIF requires Pillow."
+                ) from None
+            self._image_module = Image
+            self._gif = _GifFile(path, delay=round(100 / fps))
+            self._write, self._finish = self._write_gif, self._gif.close
+        elif extension == ".rgba":
+            self._file = open(path, "wb")
+            self._write, self._finish = self._write_raw, self._file.close
+        else:
+            os.makedirs(path, exist_ok=True)
+            self._write, self._finish = self._write_png, lambda: None
+
+        self._thread = threading.Thread(
+            target=self._drain, name="penndraw-recorder", daemon=True
+        )
+        self._thread.start()
+
+    def add_frame(self, pixels: bytes, width: int, height: int):
+        """Queue one frame of RGBA pixels, bottom row first, as read from
+        OpenGL."""
+        frame = (pixels, width, height)
+        try:
+            self._frames.put_nowait(frame)
+            return
+        except queue.Full:
+            pass
+        if self.max_wait > 0:
+            try:
+                self._frames.put(frame, timeout=self.max_wait)
+                self.stats.delayed += 1
+                return
+            except queue.Full:
+                pass
+        self.stats.dropped += 1
+
+    def close(self) -> RecordingStats:
+        """Write out every queued frame, finish the file and return the
+        recording's statistics. Raises any error the writer ran into."""
+        self._frames.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+        return self.stats
+
+    def _drain(self):
+        while (frame := self._frames.get()) is not None:
+            if self._error is not None:
+                continue
+            pixels, width, height = frame
+            try:
+                # OpenGL's rows start at the bottom; image files start at the top.
+                rows = np.frombuffer(pixels, dtype=np.uint8).reshape(height, width, 4)
+                self._write(rows[::-1], self.stats.written)
+                self.stats.written += 1
+            except Exception as error:
+                self._error = error
+        try:
+            self._finish()
+        except Exception as error:
+            self._error = self._error or error
+
+    def _write_png(self, rows: np.ndarray, index: int):
+        height, width, _ = rows.shape
+        image = pg.image.ImageData(
+            width, height, "RGBA", rows.tobytes(), pitch=-width * 4
+        )
+        filename = os.path.join(self.path, f"frame_{index:05d}.png")
+        with open(filename, "wb") as file:
+            image.save(filename, file=file)
+
+    def _write_raw(self, rows: np.ndarray, index: int):
+        self._file.write(rows.tobytes())
+
+    def _write_gif(self, rows: np.ndarray, index: int):
+        image = self._image_module.fromarray(np.ascontiguousarray(rows[:, :, :3]))
+        encoded = io.BytesIO()
+        image.quantize().save(encoded, format="GIF")
+        self._gif.add(encoded.getvalue())
+
+
+def _skip_sub_blocks(data: bytes, pos: int) -> int:
+    """Where the GIF data sub-blocks starting at pos end."""
+    while data[pos]:
+        pos += data[pos] + 1
+    return pos + 1
+
+
+def _color_table_size(packed: int) -> int:
+    """The size in bytes of the color table a GIF descriptor's packed
+    field describes, or 0 if it has none."""
+    return 3 << ((packed & 7) + 1) if packed & 0x80 else 0
+
+
+class _GifFile:
+    """An animated GIF written one frame at a time, so that recording one
+    takes the same memory however long it runs.
+
+    Pillow can only save a whole animation at once, so each frame comes
+    in as a GIF of its own, with its own palette. That palette becomes the
+    frame's local color table, and the frame is appended to the file.
+    `delay` is the time each frame is shown, in hundredths of a second.
+    """
+
+    def __init__(self, path: str, delay: int):
+        self.path = path
+        self.delay = delay
+        # Opened by the first frame, so that a recording without any leaves
+        # no file behind.
+        self._file = None
+
+    def add(self, encoded: bytes):
+        """Append the first image of the GIF file `encoded`."""
+        screen = encoded[6:13]
+        pos = 13 + _color_table_size(screen[4])
+        palette = encoded[13:pos]
+        while encoded[pos] == 0x21:
+            # Extensions: skip the label, then the sub-blocks.
+            pos = _skip_sub_blocks(encoded, pos + 2)
+        if encoded[pos] != 0x2C:
+            raise ValueError("Invalid GIF frame: no image found.")
+        descriptor = bytearray(encoded[pos:pos + 10])
+        pos += 10
+        image_start = pos
+        pos += _color_table_size(descriptor[9])
+        # The image data's LZW code size, then its sub-blocks.
+        pos = _skip_sub_blocks(encoded, pos + 1)
+        image = encoded[image_start:pos]
+        if not descriptor[9] & 0x80:
+            descriptor[9] = (descriptor[9] & 0x78) | 0x80 | (screen[4] & 7)
+            image = palette + image
+        if self._file is None:
+            self._file = open(self.path, "wb")
+            # The first frame's size and no global color table, then an
+            # application extension that loops the animation forever.
+            self._file.write(b"GIF89a" + screen[:4] + bytes((screen[4] & 0x70, 0, 0)))
+            self._file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+        # A graphic control extension with the frame's delay, which leaves
+        # the frame in place under the next.
+        self._file.write(b"\x21\xf9\x04\x04" + self.delay.to_bytes(2, "little") + b"\x00\x00")
+        self._file.write(descriptor + image)
+
+    def close(self):
+        """Finish the file, if any frame was added."""
+        if self._file is not None:
+            self._file.write(b"\x3b")
+            self._file.close()
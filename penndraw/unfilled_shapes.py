@@ -1,5 +1,5 @@
 from pyglet import shapes, gl
-import math
+from . import bulk_shapes
 
 
 class UnfilledRectangle(shapes.Rectangle):
@@ -30,8 +30,13 @@ class UnfilledRectangle(shapes.Rectangle):
 
 
 class UnfilledEllipse(shapes.Ellipse):
-    def __init__(self, x, y, a, b, segments, color, batch=None):
+    def __init__(self, x, y, a, b, segments, color, batch=None, tolerance=None):
         self._draw_mode = gl.GL_LINES
+        if segments is None:
+            if tolerance is None:
+                # Read when called: penndraw imports this module.
+                from .penndraw import curve_tolerance as tolerance
+            segments = bulk_shapes.curve_segments(max(a, b), tolerance)
         super().__init__(x, y, a, b, color=color, batch=batch,
                          segments=segments)
         self._num_verts = self._segments * 2
@@ -51,16 +56,6 @@ class UnfilledEllipse(shapes.Ellipse):
         if not self._visible:
             return (0, 0) * self._segments * 2
         else:
-            x = -self._anchor_x
-            y = -self._anchor_y
-            tau_segs = math.pi * 2 / self._segments
-
-            points = [(x + self._a * math.cos(i * tau_segs),
-                       y + self._b * math.sin(i * tau_segs)) for i in range(self._segments)]
-
-            vertices = []
-            for i, point in enumerate(points):
-                seg = *points[i - 1], *point
-                vertices.extend(seg)
-
-            return vertices
+            points = bulk_shapes.ellipse_outline(
+                -self._anchor_x, -self._anchor_y, self._a, self._b, 0, self._segments)
+            return bulk_shapes.closed_line_segments(points).tolist()
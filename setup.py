@@ -23,6 +23,9 @@ setup(
         'multipledispatch==1.0.0',
         'mypy==1.9.0',
         'mypy-extensions==1.0.0',
+        'numpy>=1.24',
+        # penndraw reaches into pyglet's vertex domains, batches and headless
+        # windows where it has no public API, so test before changing this.
         'pyglet==2.0.14',
         'tomli==2.0.1',
         'typing-extensions==4.10.0',
@@ -0,0 +1,44 @@
+"""
+Compare a loop of circle()/filled_circle() calls against one circles()/
+filled_circles() call for many_circles.py scaled up, reporting time and the
+number of Python memory blocks each circle keeps alive.
+"""
+
+import time
+import tracemalloc
+import numpy as np
+import penndraw as pd
+import penndraw.penndraw as core
+
+
+def measure(draw):
+    pd._reset()
+    tracemalloc.start()
+    start = time.perf_counter()
+    draw()
+    core.on_draw()
+    elapsed = time.perf_counter() - start
+    blocks = sum(stat.count for stat in
+                 tracemalloc.take_snapshot().statistics("filename"))
+    tracemalloc.stop()
+    return elapsed, blocks
+
+
+n = 2_000
+rng = np.random.default_rng(110)
+xs, ys = rng.random(n), rng.random(n)
+radii = rng.uniform(0.01, 0.05, n)
+
+for name, single, bulk in (
+    ("circle", pd.circle, pd.circles),
+    ("filled_circle", pd.filled_circle, pd.filled_circles),
+):
+    loop_time, loop_blocks = measure(
+        lambda: [single(x, y, r) for x, y, r in
+                 zip(xs.tolist(), ys.tolist(), radii.tolist())])
+    bulk_time, bulk_blocks = measure(lambda: bulk(xs, ys, radii))
+    print(f"{name:>13} x {n}: loop {loop_time * 1000:8.1f} ms, "
+          f"{loop_blocks / n:6.1f} blocks/circle | "
+          f"bulk {bulk_time * 1000:6.1f} ms, {bulk_blocks / n:6.2f} blocks/circle")
+
+pd.run()
@@ -0,0 +1,42 @@
+"""
+Helpers shared by the benchmark scripts that write their results as JSON
+and compare them against an earlier run. Only the standard library is
+imported here, so bench_import can use it without loading penndraw.
+"""
+
+import json
+import platform
+import time
+
+
+def environment(**extra):
+    """Where and when the benchmark ran, plus any script-specific details."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **extra,
+    }
+
+
+def compare(new, old):
+    """How a number changed since the earlier run, if there was one."""
+    if old is None:
+        return ""
+    return f" ({new / old:.2f}x before)"
+
+
+def read_results(path):
+    """Results of an earlier run, or an empty dict if there is none."""
+    if not path:
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def write_results(path, results):
+    if not path:
+        return
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+    print("Wrote", path)
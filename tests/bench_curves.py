@@ -0,0 +1,56 @@
+"""
+Time ellipse and arc point generation: the per-segment math.cos/math.sin
+comprehensions that ellipse() and arc() used to run against the cached
+unit-circle tables and array math in bulk_shapes, across a range of radii.
+Arcs short enough that the arrays would be slower (see
+bulk_shapes.MIN_ARRAY_ARC_SEGMENTS) are still computed point by point.
+"""
+
+import math
+import timeit
+from penndraw import bulk_shapes
+from penndraw.penndraw import DEFAULT_CURVE_TOLERANCE
+
+
+def ellipse_comprehension(x, y, a, b, rotation, segments):
+    rot_rad = math.radians(rotation)
+    cos_r, sin_r = math.cos(rot_rad), math.sin(rot_rad)
+    return [
+        (x + (a * math.cos(i * 2 * math.pi / segments)) * cos_r
+           - (b * math.sin(i * 2 * math.pi / segments)) * sin_r,
+         y + (a * math.cos(i * 2 * math.pi / segments)) * sin_r
+           + (b * math.sin(i * 2 * math.pi / segments)) * cos_r)
+        for i in range(segments)
+    ]
+
+
+def arc_comprehension(x, y, rx, ry, start, sweep, n):
+    return [
+        (x + rx * math.cos(start + i * sweep / n),
+         y + ry * math.sin(start + i * sweep / n))
+        for i in range(n + 1)
+    ]
+
+
+def best_of(f, number):
+    return min(timeit.repeat(f, number=number, repeat=5)) / number
+
+
+for radius in (2, 10, 30, 100, 1_000, 10_000):
+    # Same segment counts as __ellipse and __arc in penndraw.py.
+    segments = bulk_shapes.curve_segments(radius, DEFAULT_CURVE_TOLERANCE)
+    arc_segments = bulk_shapes.curve_segments(radius, DEFAULT_CURVE_TOLERANCE, math.pi / 2)
+    number = max(10, 20_000 // segments)
+    cases = (
+        ("ellipse", segments,
+         lambda: ellipse_comprehension(256, 256, radius, radius / 2, 30, segments),
+         lambda: bulk_shapes.ellipse_outline(256, 256, radius, radius / 2, 30, segments).tolist()),
+        ("arc", arc_segments,
+         lambda: arc_comprehension(256, 256, radius, radius, 0.3, math.pi / 2, arc_segments),
+         lambda: bulk_shapes.arc_point_list(256, 256, radius, radius, 0.3, math.pi / 2, arc_segments)),
+    )
+    for name, n, old, new in cases:
+        old_time, new_time = best_of(old, number), best_of(new, number)
+        print(f"{name:>7} radius {radius:>6} px ({n:>5} segments): "
+              f"comprehension {old_time * 1e6:8.1f} us, "
+              f"arrays {new_time * 1e6:7.1f} us ({old_time / new_time:.1f}x)")
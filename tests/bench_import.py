@@ -0,0 +1,78 @@
+"""
+Measure how long `import penndraw` takes in a fresh interpreter, and how long
+the first calls after it take while the modules they need are loaded.
+Results are printed and written as JSON; pass an earlier results file with
+--compare to see how each number has changed.
+
+    python -m tests.bench_import --output import.json
+    python -m tests.bench_import --compare import.json
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+from tests.bench_common import compare, environment, read_results, write_results
+
+# Each step's code runs after the ones before it, in the same interpreter.
+STEPS = {
+    "import penndraw": "import penndraw as pd",
+    "first function call": "pd.set_pen_color(pd.RED)",
+    "first line": "pd.line(0, 0, 1, 1)",
+    "first circle": "pd.filled_circle(0.5, 0.5, 0.25)",
+}
+
+TIMER = """
+import time
+_times = []
+_start = time.perf_counter()
+{body}
+print(*_times)
+"""
+
+
+def script():
+    body = []
+    for code in STEPS.values():
+        body.append(code)
+        body.append("_times.append(time.perf_counter() - _start)")
+    return TIMER.format(body="\n".join(body))
+
+
+def run_once(source):
+    env = {**os.environ, "PENNDRAW_HEADLESS": "1"}
+    result = subprocess.run(
+        [sys.executable, "-c", source], env=env,
+        capture_output=True, text=True, check=True,
+    )
+    times = [float(t) for t in result.stdout.split()]
+    # Time of each step on its own rather than since the start.
+    return [b - a for a, b in zip([0.0] + times, times)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results from an earlier run")
+    parser.add_argument("--runs", type=int, default=15,
+                        help="fresh interpreters to time; the median counts (default 15)")
+    args = parser.parse_args(argv)
+
+    before = read_results(args.compare)
+
+    source = script()
+    runs = [run_once(source) for _ in range(args.runs)]
+    results = {"environment": environment(), "import_ms": {}}
+    for name, times in zip(STEPS, zip(*runs)):
+        ms = statistics.median(times) * 1000
+        results["import_ms"][name] = ms
+        old = before.get("import_ms", {}).get(name)
+        print(f"{name:>20}: {ms:8.1f} ms{compare(ms, old)}")
+
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+"""
+Time the spiral from many_points.py drawn with one point() call per point
+against a single points() call, at a few sizes, then show the last frame.
+"""
+
+import time
+import numpy as np
+import penndraw as pd
+import penndraw.penndraw as core
+
+
+def spiral(n):
+    i = np.arange(1, n + 1)
+    t = i * (6.28 / n)
+    return 0.5 + 0.5 * np.cos(t), 0.5 + 0.5 * np.sin(t), i / (n * 100)
+
+
+def time_point_loop(xs, ys, radii):
+    start = time.perf_counter()
+    for x, y, r in zip(xs.tolist(), ys.tolist(), radii.tolist()):
+        pd.set_pen_radius(r)
+        pd.point(x, y)
+    core.on_draw()
+    return time.perf_counter() - start
+
+
+def time_points(xs, ys, radii):
+    start = time.perf_counter()
+    pd.points(xs, ys, radius=radii)
+    core.on_draw()
+    return time.perf_counter() - start
+
+
+for n in (627, 10_000, 100_000):
+    xs, ys, radii = spiral(n)
+    pd._reset()
+    loop = time_point_loop(xs, ys, radii)
+    pd._reset()
+    bulk = time_points(xs, ys, radii)
+    print(f"{n:>7} points: point() loop {loop * 1000:9.1f} ms, "
+          f"points() {bulk * 1000:7.1f} ms ({loop / bulk:.0f}x)")
+
+pd.run()
@@ -0,0 +1,191 @@
+"""
+Measure drawing throughput for every primitive, the frame time of an
+animation that clears and redraws N shapes (in either render mode), and
+of one that keeps its background in a static layer, without opening a window.
+Results are printed and written as JSON; pass an earlier results file with
+--compare to see how each number has changed.
+
+    python -m tests.bench_suite --output results.json
+    python -m tests.bench_suite --compare results.json
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("PENNDRAW_HEADLESS", "1")
+
+import numpy as np
+import pyglet as pg
+import penndraw as pd
+import penndraw.penndraw as core
+from tests import bench_common
+from tests.bench_common import compare, read_results, write_results
+
+
+# 100 points zig-zagging across a 0.1-wide strip, as x0, y0, x1, y1, ...
+WIGGLE = np.column_stack((
+    np.linspace(0, 0.1, 100), np.tile((0.0, 0.02), 50)
+)).ravel()
+
+
+def make_picture(directory):
+    path = os.path.join(directory, "sprite.png")
+    pixels = bytes([255, 0, 0, 255]) * (32 * 32)
+    pg.image.ImageData(32, 32, "RGBA", pixels).save(path)
+    return path
+
+
+def primitives(picture_path):
+    """name -> function drawing shape i of a benchmark run."""
+    return {
+        "point": lambda x, y, i: pd.point(x, y),
+        "line": lambda x, y, i: pd.line(x, y, 1 - x, 1 - y),
+        "circle": lambda x, y, i: pd.circle(x, y, 0.05),
+        "filled_circle": lambda x, y, i: pd.filled_circle(x, y, 0.05),
+        "filled_ellipse": lambda x, y, i: pd.filled_ellipse(x, y, 0.06, 0.03, i % 360),
+        "arc": lambda x, y, i: pd.arc(x, y, 0.05, i % 360, (i + 120) % 360),
+        "rectangle": lambda x, y, i: pd.rectangle(x, y, 0.05, 0.03),
+        "rectangle_rotated": lambda x, y, i: pd.rectangle(x, y, 0.05, 0.03, i % 360),
+        "filled_rectangle": lambda x, y, i: pd.filled_rectangle(x, y, 0.05, 0.03),
+        "filled_rectangle_rotated": lambda x, y, i: pd.filled_rectangle(x, y, 0.05, 0.03, i % 360),
+        "polygon": lambda x, y, i: pd.polygon(x, y, x + 0.05, y, x + 0.03, y + 0.04, x, y + 0.05),
+        "filled_polygon": lambda x, y, i: pd.filled_polygon(x, y, x + 0.05, y, x + 0.03, y + 0.04),
+        "polyline_100": lambda x, y, i: pd.polyline(*(x + WIGGLE).tolist()),
+        "text": lambda x, y, i: pd.text(x, y, f"label {i % 100}"),
+        "picture": lambda x, y, i: pd.picture(x, y, picture_path),
+    }
+
+
+def finish_frame():
+    core.window.switch_to()
+    core.on_draw()
+    pg.gl.glFinish()
+
+
+def shapes_per_second(draw, n, repeats):
+    """Best of `repeats` runs of drawing n shapes and rendering them once."""
+    rng = np.random.default_rng(110)
+    xs, ys = rng.random(n).tolist(), rng.random(n).tolist()
+    best = float("inf")
+    for _ in range(repeats):
+        pd._reset()
+        start = time.perf_counter()
+        for i in range(n):
+            draw(xs[i], ys[i], i)
+        finish_frame()
+        best = min(best, time.perf_counter() - start)
+    return n / best
+
+
+def frame_time(n, frames, mode="retained"):
+    """Mean time of clear() + n filled circles + advance() in the given
+    render mode, and the mean get_frame_stats() breakdown, after a few
+    warm-up frames."""
+    pd._reset()
+    pd.set_framerate(1_000_000)
+    pd.set_render_mode(mode)
+    rng = np.random.default_rng(110)
+    xs, ys = rng.random(n).tolist(), rng.random(n).tolist()
+    totals = dict.fromkeys(("user_time", "draw_time", "flip_time", "wait_time"), 0.0)
+    for frame in range(frames + 3):
+        if frame == 3:
+            start = time.perf_counter()
+        pd.clear()
+        for x, y in zip(xs, ys):
+            pd.filled_circle(x, y, 0.02)
+        pd.advance()
+        if frame >= 3:
+            stats = pd.get_frame_stats()
+            for key in totals:
+                totals[key] += getattr(stats, key)
+    elapsed = time.perf_counter() - start
+    result = {"frame_ms": elapsed / frames * 1000}
+    result.update({key[:-5] + "_ms": total / frames * 1000 for key, total in totals.items()})
+    return result
+
+
+def background_frame_time(n, frames, static):
+    """Mean time of a frame that clears, draws a background of n lines
+    (directly, or in a static layer) and a single circle on top."""
+    pd._reset()
+    pd.set_framerate(1_000_000)
+    rng = np.random.default_rng(110)
+    xs, ys = rng.random(n).tolist(), rng.random(n).tolist()
+    for frame in range(frames + 3):
+        if frame == 3:
+            start = time.perf_counter()
+        pd.clear()
+        if static:
+            with pd.layer("background", static=True):
+                for x, y in zip(xs, ys):
+                    pd.line(x, y, 1 - x, 1 - y)
+        else:
+            for x, y in zip(xs, ys):
+                pd.line(x, y, 1 - x, 1 - y)
+        pd.filled_circle(frame / (frames + 3), 0.5, 0.05)
+        pd.advance()
+    return (time.perf_counter() - start) / frames * 1000
+
+
+def environment():
+    # The window, and with it the GL context that knows the renderer, is
+    # only opened by the first frame.
+    pd.set_canvas_size(core.DEFAULT_SIZE, core.DEFAULT_SIZE)
+    pd.advance()
+    return bench_common.environment(
+        penndraw=pd.__version__,
+        pyglet=pg.version,
+        numpy=np.__version__,
+        renderer=pg.gl.gl_info.get_renderer(),
+        headless=core.HEADLESS,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="JSON results from an earlier run")
+    parser.add_argument("--shapes", type=int, default=2000,
+                        help="shapes drawn per throughput run (default 2000)")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="throughput runs per primitive; the best counts (default 3)")
+    parser.add_argument("--frames", type=int, default=30,
+                        help="frames timed per frame-loop size (default 30)")
+    args = parser.parse_args(argv)
+
+    before = read_results(args.compare)
+
+    results = {"environment": environment(), "shapes_per_second": {}, "frame_loop": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, draw in primitives(make_picture(directory)).items():
+            rate = shapes_per_second(draw, args.shapes, args.repeats)
+            results["shapes_per_second"][name] = rate
+            old = before.get("shapes_per_second", {}).get(name)
+            print(f"{name:>25}: {rate:11,.0f} shapes/s{compare(rate, old)}")
+
+    results["immediate_frame_loop"] = {}
+    for key, mode in (("frame_loop", "retained"), ("immediate_frame_loop", "immediate")):
+        for n in (100, 1000, 5000):
+            loop = frame_time(n, args.frames, mode)
+            results[key][str(n)] = loop
+            old = before.get(key, {}).get(str(n), {}).get("frame_ms")
+            print(f"{mode:>9}: clear + {n:>5} circles + advance: {loop['frame_ms']:8.2f} ms/frame "
+                  f"(user {loop['user_ms']:.2f}, draw {loop['draw_ms']:.2f}, "
+                  f"flip {loop['flip_ms']:.2f}){compare(loop['frame_ms'], old)}")
+
+    results["background"] = {}
+    for static in (False, True):
+        name = "static_layer" if static else "redrawn"
+        ms = background_frame_time(2000, args.frames, static)
+        results["background"][name] = ms
+        old = before.get("background", {}).get(name)
+        print(f"2000-line background, {name:>12}: {ms:8.2f} ms/frame{compare(ms, old)}")
+
+    write_results(args.output, results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
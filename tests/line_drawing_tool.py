@@ -4,12 +4,22 @@ old_x, old_y = 0.5, 0.5
 pd.set_pen_radius(0.012)
 
 while True:
-    if pd.mouse_pressed():
-        x, y = pd.mouse_x(), pd.mouse_y()
-        if y > 0.5:
+    # Every point the mouse passed through since the last frame, so fast
+    # strokes stay smooth.
+    for event in pd.mouse_events():
+        # A press only starts a stroke; drags, and a release somewhere the
+        # last drag didn't reach, extend it.
+        if event.kind == "press":
+            old_x, old_y = event.x, event.y
+            continue
+        if event.kind == "move" and not event.pressed:
+            continue
+        if (event.x, event.y) == (old_x, old_y):
+            continue
+        if event.y > 0.5:
             pd.set_pen_color(pd.RED)
         else:
             pd.set_pen_color(pd.BLACK)
-        pd.line(old_x, old_y, x, y)
-        old_x, old_y = x, y
+        pd.line(old_x, old_y, event.x, event.y)
+        old_x, old_y = event.x, event.y
     pd.advance()
@@ -4,7 +4,8 @@ import ast
 
 excluded_files = {'run_all_tests.py', 'unittests.py'}
 for filename in os.listdir('tests'):
-    if filename.endswith('.py') and filename not in excluded_files:
+    if (filename.endswith('.py') and filename not in excluded_files
+            and not filename.startswith('bench_')):
         print('Running', filename)
         with open(os.path.join('tests', filename)) as f:
             code = ast.parse(f.read())
@@ -1,7 +1,17 @@
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+from unittest import mock
+import numpy as np
 import pyglet as pg
 import penndraw as pd
 import penndraw.penndraw as core
+from penndraw import bulk_shapes, recording
 
 
 class SetPenColorErrors(unittest.TestCase):
@@ -227,7 +237,7 @@ class VerticesInspectionTests(unittest.TestCase):
 
     def test_line_type(self):
         pd.line(0, 0, 1, 1)
-        self.assertIsInstance(core.VERTICES[0], pg.shapes.Line)
+        self.assertIsInstance(core.VERTICES[0], core.LineBuffer)
 
     def test_filled_square_adds_one_vertex(self):
         pd.filled_square(0.5, 0.5, 0.1)
@@ -287,13 +297,20 @@ class VerticesInspectionTests(unittest.TestCase):
         pd.circle(0.5, 0.5, 0.1)
         self.assertEqual(len(core.VERTICES), 3)
 
-    def test_multiple_same_type_accumulate(self):
+    def test_consecutive_lines_share_one_buffer(self):
         pd.line(0, 0, 1, 1)
         pd.line(0, 1, 1, 0)
         pd.line(0.5, 0, 0.5, 1)
+        self.assertEqual(len(core.VERTICES), 1)
+        self.assertEqual(len(core.VERTICES[0]), 3)
+
+    def test_multiple_same_type_accumulate(self):
+        pd.filled_square(0.2, 0.2, 0.1)
+        pd.filled_square(0.5, 0.5, 0.1)
+        pd.filled_square(0.8, 0.8, 0.1)
         self.assertEqual(len(core.VERTICES), 3)
         for shape in core.VERTICES:
-            self.assertIsInstance(shape, pg.shapes.Line)
+            self.assertIsInstance(shape, pg.shapes.Rectangle)
 
     def test_multiple_mixed_types_correct_order(self):
         pd.line(0, 0, 1, 1)
@@ -302,7 +319,7 @@ class VerticesInspectionTests(unittest.TestCase):
         pd.filled_polygon(0.2, 0.2, 0.8, 0.2, 0.5, 0.8)
         pd.arc(0.5, 0.5, 0.1, 0, 90)
         self.assertEqual(len(core.VERTICES), 5)
-        self.assertIsInstance(core.VERTICES[0], pg.shapes.Line)
+        self.assertIsInstance(core.VERTICES[0], core.LineBuffer)
         self.assertIsInstance(core.VERTICES[1], pg.shapes.Rectangle)
         self.assertIsInstance(core.VERTICES[2], pg.shapes.MultiLine)
         self.assertIsInstance(core.VERTICES[3], pg.shapes.Polygon)
@@ -314,18 +331,16 @@ class VerticesInspectionTests(unittest.TestCase):
         pd.clear()
         pd.circle(0.5, 0.5, 0.1)
         pd.text(0.5, 0.5, "hello")
-        # clear() leaves a background Rectangle, then we add 2 more shapes
-        self.assertEqual(len(core.VERTICES), 3)
-        self.assertIsInstance(core.VERTICES[0], pg.shapes.Rectangle)
-        self.assertIsInstance(core.VERTICES[1], pg.shapes.MultiLine)
-        self.assertIsInstance(core.VERTICES[2], pg.text.Label)
+        # clear() paints the background with glClearColor, not a shape
+        self.assertEqual(len(core.VERTICES), 2)
+        self.assertIsInstance(core.VERTICES[0], pg.shapes.MultiLine)
+        self.assertIsInstance(core.VERTICES[1], pg.text.Label)
 
-    def test_clear_leaves_one_background_rect(self):
+    def test_clear_leaves_no_vertices(self):
         pd.line(0, 0, 1, 1)
         pd.filled_square(0.5, 0.5, 0.1)
         pd.clear()
-        self.assertEqual(len(core.VERTICES), 1)
-        self.assertIsInstance(core.VERTICES[0], pg.shapes.Rectangle)
+        self.assertEqual(len(core.VERTICES), 0)
 
 
 # ---------------------------------------------------------------------------
@@ -482,5 +497,1871 @@ class ResetTests(unittest.TestCase):
         self.assertAlmostEqual(core.pen_radius, core.DEFAULT_PEN_RADIUS)
 
 
+# ---------------------------------------------------------------------------
+# Bulk points() tests
+# ---------------------------------------------------------------------------
+
+class BulkPointsTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_points_adds_one_vertex(self):
+        pd.points([0.1, 0.2, 0.3], [0.1, 0.2, 0.3])
+        self.assertEqual(len(core.VERTICES), 1)
+
+    def test_points_type(self):
+        pd.points([0.1, 0.2], [0.1, 0.2])
+        self.assertIsInstance(core.VERTICES[0], core.bulk_shapes.TriangleMesh)
+
+    def test_points_accepts_numpy_arrays(self):
+        pd.points(np.linspace(0, 1, 100), np.linspace(0, 1, 100))
+        self.assertEqual(len(core.VERTICES), 1)
+
+    def test_thin_points_are_pixels(self):
+        # a pen radius under one pixel makes each point a 1x1 quad
+        pd.set_pen_radius(0.001)
+        pd.points([0.5, 0.25], [0.5, 0.75])
+        mesh = core.VERTICES[0]
+        self.assertEqual(mesh._num_verts, 2 * 6)
+        self.assertEqual(mesh._positions[:, 0].min(), pd._scale_x(0.25))
+        self.assertEqual(mesh._positions[:, 0].max(), pd._scale_x(0.5) + 1)
+
+    def test_thick_points_are_circles_with_pen_radius(self):
+        pd.set_pen_radius(0.05)
+        pd.points([0.5], [0.5])
+        mesh = core.VERTICES[0]
+        self.assertGreater(mesh._num_verts, 6)
+        self.assertAlmostEqual(mesh._positions[:, 0].max(),
+                               pd._scale_x(0.5) + pd._factor_x(0.05), delta=0.01)
+
+    def test_radius_argument_overrides_pen_radius(self):
+        pd.points([0.5, 0.5], [0.5, 0.5], radius=[0.001, 0.05])
+        mesh = core.VERTICES[0]
+        self.assertGreater(mesh._num_verts, 6)
+        self.assertAlmostEqual(mesh._positions[:, 1].min(),
+                               pd._scale_y(0.45), delta=0.5)
+
+    def test_default_color_is_pen_color(self):
+        pd.set_pen_color(pd.RED)
+        pd.points([0.5], [0.5])
+        self.assertTrue((core.VERTICES[0]._colors == pd.RED).all())
+
+    def test_per_point_colors(self):
+        pd.points([0.2, 0.8], [0.5, 0.5], colors=[(255, 0, 0), (0, 0, 255, 128)])
+        colors = core.VERTICES[0]._colors
+        self.assertEqual(tuple(colors[0]), (255, 0, 0, 255))
+        self.assertEqual(tuple(colors[-1]), (0, 0, 255, 128))
+
+    def test_single_color_tuple(self):
+        pd.points([0.2, 0.8], [0.5, 0.5], colors=pd.HSS_BLUE)
+        self.assertTrue((core.VERTICES[0]._colors == pd.HSS_BLUE + (255,)).all())
+
+    def test_empty_points_draws_nothing(self):
+        pd.points([], [])
+        self.assertEqual(len(core.VERTICES), 0)
+
+    def test_mismatched_lengths_raise(self):
+        with self.assertRaises(ValueError):
+            pd.points([0.1, 0.2], [0.1])
+
+    def test_wrong_number_of_colors_raises(self):
+        with self.assertRaises(ValueError):
+            pd.points([0.1, 0.2], [0.1, 0.2], colors=[(255, 0, 0)])
+
+    def test_out_of_range_color_raises(self):
+        with self.assertRaises(ValueError):
+            pd.points([0.1], [0.1], colors=[(300, 0, 0)])
+
+    def test_nonpositive_radius_raises(self):
+        with self.assertRaises(ValueError):
+            pd.points([0.1], [0.1], radius=0)
+
+
+# ---------------------------------------------------------------------------
+# Bulk circle / ellipse tests
+# ---------------------------------------------------------------------------
+
+def _mesh_bounds(mesh):
+    """Bounding box (x_min, x_max, y_min, y_max) of a TriangleMesh."""
+    xs, ys = mesh._positions[:, 0], mesh._positions[:, 1]
+    return xs.min(), xs.max(), ys.min(), ys.max()
+
+
+class BulkEllipseTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_filled_circles_add_one_vertex(self):
+        pd.filled_circles([0.2, 0.5, 0.8], [0.5, 0.5, 0.5], 0.05)
+        self.assertEqual(len(core.VERTICES), 1)
+        self.assertIsInstance(core.VERTICES[0], core.bulk_shapes.TriangleMesh)
+
+    def test_filled_circles_match_filled_circle_bounds(self):
+        pd.filled_circles([0.3], [0.6], [0.1])
+        pd.filled_circle(0.3, 0.6, 0.1)
+        x_lo, x_hi, y_lo, y_hi = _mesh_bounds(core.VERTICES[0])
+        self.assertAlmostEqual(x_lo, pd._scale_x(0.2), delta=0.01)
+        self.assertAlmostEqual(x_hi, pd._scale_x(0.4), delta=0.01)
+        self.assertAlmostEqual(y_hi, pd._scale_y(0.7), delta=1.0)
+        self.assertEqual(core.VERTICES[0]._num_verts, core.VERTICES[1]._num_verts)
+
+    def test_circles_match_circle_bounds(self):
+        pd.set_pen_radius(0.01)
+        pd.circles([0.5], [0.5], 0.3)
+        pd.circle(0.5, 0.5, 0.3)
+        mesh_bounds = _mesh_bounds(core.VERTICES[0])
+        circle_bounds = _multiline_bounds(core.VERTICES[1])
+        half_pen = pd._scaled_pen_radius() / 2
+        for sign, m, c in zip((-1, 1, -1, 1), mesh_bounds, circle_bounds):
+            self.assertAlmostEqual(m, c + sign * half_pen, delta=1.0)
+
+    def test_per_item_radii(self):
+        pd.filled_circles([0.25, 0.75], [0.5, 0.5], [0.05, 0.2])
+        x_lo, x_hi, _, _ = _mesh_bounds(core.VERTICES[0])
+        self.assertAlmostEqual(x_lo, pd._scale_x(0.2), delta=0.01)
+        self.assertAlmostEqual(x_hi, pd._scale_x(0.95), delta=0.01)
+
+    def test_filled_ellipses_rotate_like_filled_ellipse(self):
+        pd.filled_ellipses([0.5], [0.5], 0.2, 0.1, angles=90)
+        x_lo, x_hi, y_lo, y_hi = _mesh_bounds(core.VERTICES[0])
+        self.assertAlmostEqual(x_hi - x_lo, 2 * pd._factor_x(0.1), delta=1.0)
+        self.assertAlmostEqual(y_hi - y_lo, 2 * pd._factor_y(0.2), delta=1.0)
+
+    def test_per_item_colors(self):
+        pd.filled_circles([0.25, 0.75], [0.5, 0.5], 0.1,
+                          colors=[pd.RED, pd.BLUE])
+        colors = core.VERTICES[0]._colors
+        self.assertEqual(tuple(colors[0]), pd.RED)
+        self.assertEqual(tuple(colors[-1]), pd.BLUE)
+
+    def test_empty_draws_nothing(self):
+        pd.circles([], [], 0.1)
+        self.assertEqual(len(core.VERTICES), 0)
+
+    def test_mismatched_radii_raise(self):
+        with self.assertRaises(ValueError):
+            pd.filled_circles([0.2, 0.5], [0.5, 0.5], [0.1, 0.1, 0.1])
+
+    def test_too_small_raises(self):
+        with self.assertRaises(ValueError):
+            pd.circles([0.5], [0.5], 0.0001)
+
+
+# ---------------------------------------------------------------------------
+# Shape recycling tests
+# ---------------------------------------------------------------------------
+
+def _vertex_data(shape):
+    if isinstance(shape, core.LineBuffer):
+        # Lines are copied into the vertex list when the frame is drawn.
+        shape.upload()
+    vertex_list = shape._vertex_list
+    return [list(getattr(vertex_list, name))
+            for name in ("position", "translation", "colors", "rotation")]
+
+
+class ShapeRecyclingTests(unittest.TestCase):
+    """clear() hands the cleared shapes to a pool, and the next frame's draw
+    calls reuse them (and their vertex lists) instead of allocating new
+    ones. A recycled shape must end up with exactly the vertex data a
+    freshly built shape would have."""
+
+    def setUp(self):
+        pd._reset()
+
+    def assert_recycles_like_fresh(self, first, second):
+        second()
+        fresh = _vertex_data(core.VERTICES[-1])
+
+        pd._reset()
+        first()
+        old = core.VERTICES[-1]
+        old_vertex_list = old._vertex_list
+        pd.clear()
+        pd.set_pen_color(pd.BLUE)
+        second()
+        self.assertTrue(any(shape is old for shape in core.VERTICES))
+        self.assertIs(old._vertex_list, old_vertex_list)
+        pd._reset()
+
+        first()
+        pd.clear()
+        pd.set_pen_color(pd.BLUE)
+        second()
+        recycled = _vertex_data(core.VERTICES[-1])
+        pd._reset()
+        pd.set_pen_color(pd.BLUE)
+        second()
+        self.assertEqual(recycled, _vertex_data(core.VERTICES[-1]))
+        self.assertNotEqual(recycled, fresh)  # color changed
+
+    def test_line(self):
+        self.assert_recycles_like_fresh(lambda: pd.line(0, 0, 1, 1),
+                                        lambda: pd.line(0.2, 0.9, 0.4, 0.1))
+
+    def test_point(self):
+        pd.set_pen_radius(0.001)
+        self.assert_recycles_like_fresh(lambda: pd.point(0.1, 0.1),
+                                        lambda: pd.point(0.7, 0.3))
+
+    def test_filled_square(self):
+        self.assert_recycles_like_fresh(lambda: pd.filled_square(0.5, 0.5, 0.1),
+                                        lambda: pd.filled_square(0.3, 0.6, 0.2, 30))
+
+    def test_square(self):
+        self.assert_recycles_like_fresh(lambda: pd.square(0.5, 0.5, 0.1),
+                                        lambda: pd.square(0.3, 0.6, 0.2, 30))
+
+    def test_filled_ellipse(self):
+        # Curves of the same size have the same number of segments.
+        self.assert_recycles_like_fresh(lambda: pd.filled_circle(0.5, 0.5, 0.2),
+                                        lambda: pd.filled_ellipse(0.3, 0.6, 0.2, 0.1, 45))
+
+    def test_circle(self):
+        self.assert_recycles_like_fresh(lambda: pd.circle(0.5, 0.5, 0.1),
+                                        lambda: pd.circle(0.3, 0.6, 0.1))
+
+    def test_arc(self):
+        self.assert_recycles_like_fresh(lambda: pd.arc(0.5, 0.5, 0.1, 0, 90),
+                                        lambda: pd.arc(0.3, 0.6, 0.1, 45, 135))
+
+    def test_filled_pie(self):
+        self.assert_recycles_like_fresh(lambda: pd.filled_pie(0.5, 0.5, 0.1, 0, 90),
+                                        lambda: pd.filled_pie(0.3, 0.6, 0.1, 45, 135))
+
+    def test_filled_polygon(self):
+        self.assert_recycles_like_fresh(
+            lambda: pd.filled_polygon(0.1, 0.1, 0.9, 0.1, 0.5, 0.9),
+            lambda: pd.filled_polygon(0.2, 0.2, 0.7, 0.3, 0.4, 0.8))
+
+    def test_polyline(self):
+        self.assert_recycles_like_fresh(
+            lambda: pd.polyline(0.1, 0.1, 0.9, 0.1, 0.5, 0.9),
+            lambda: pd.polyline(0.2, 0.2, 0.7, 0.3, 0.4, 0.8))
+
+    def test_bulk_points(self):
+        self.assert_recycles_like_fresh(
+            lambda: pd.filled_circles([0.1, 0.2], [0.1, 0.2], 0.05),
+            lambda: pd.filled_circles([0.6, 0.3], [0.4, 0.7], [0.05, 0.045]))
+
+    def test_unused_shapes_are_deleted_when_drawn(self):
+        pd.line(0, 0, 1, 1)
+        pd.circle(0.5, 0.5, 0.1)
+        circle = core.VERTICES[-1]
+        pd.clear()
+        pd.line(0, 1, 1, 0)
+        core.on_draw()
+        self.assertIsNone(circle._vertex_list)
+        self.assertEqual(core.RECYCLABLE, {})
+
+    def test_reset_empties_pool(self):
+        pd.line(0, 0, 1, 1)
+        pd.clear()
+        pd._reset()
+        self.assertEqual(core.RECYCLABLE, {})
+
+    def test_steady_state_animation_allocates_nothing(self):
+        def frame(x):
+            pd.clear()
+            pd.filled_square(x, 0.5, 0.1)
+            pd.circle(x, 0.5, 0.05)
+            pd.line(0, 0, x, 1)
+            core.on_draw()
+
+        frame(0.1)
+        vertex_lists = {id(shape._vertex_list) for shape in core.VERTICES}
+        for i in range(5):
+            frame(0.2 + i / 10)
+        self.assertEqual(vertex_lists,
+                         {id(shape._vertex_list) for shape in core.VERTICES})
+
+
+# ---------------------------------------------------------------------------
+# clear() tests
+# ---------------------------------------------------------------------------
+
+class ClearTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_clear_sets_background(self):
+        pd.clear(pd.RED)
+        self.assertEqual(core.background, pd.RED)
+
+    def test_clear_defaults_to_white(self):
+        pd.clear(pd.RED)
+        pd.clear()
+        self.assertEqual(core.background, pd.WHITE)
+
+    def test_clear_with_three_ints_gives_four_tuple(self):
+        pd.clear(10, 20, 30)
+        self.assertEqual(core.background, (10, 20, 30, 255))
+
+    def test_clear_rejects_invalid_color(self):
+        with self.assertRaises(ValueError):
+            pd.clear(300, 0, 0)
+
+    def test_clear_does_not_touch_shapes(self):
+        # clear() only sets shapes aside; it must not delete them itself
+        for i in range(100):
+            pd.filled_square(i / 100, 0.5, 0.01)
+        shapes = list(core.VERTICES)
+        pd.clear()
+        self.assertTrue(all(shape._vertex_list is not None for shape in shapes))
+
+    def test_drawing_nothing_after_clear_drops_the_batch(self):
+        pd.line(0, 0, 1, 1)
+        old_batch = core.BATCH
+        pd.clear()
+        core.on_draw()
+        self.assertIsNot(core.BATCH, old_batch)
+        self.assertEqual(core.CLEARED, [])
+
+    def test_drawing_after_clear_keeps_the_batch(self):
+        pd.line(0, 0, 1, 1)
+        old_batch = core.BATCH
+        pd.clear()
+        pd.circle(0.5, 0.5, 0.1)
+        core.on_draw()
+        self.assertIs(core.BATCH, old_batch)
+
+    def test_repeated_clears_recycle_everything(self):
+        pd.line(0, 0, 1, 1)
+        line = core.VERTICES[0]
+        pd.clear()
+        pd.clear()
+        pd.line(0, 1, 1, 0)
+        self.assertIs(core.VERTICES[0], line)
+
+
+# ---------------------------------------------------------------------------
+# Frame recorder tests
+# ---------------------------------------------------------------------------
+
+class FrameRecorderTests(unittest.TestCase):
+    """The recorder's queue, without any OpenGL: frames are fake 2x2 images."""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.frame = (bytes(range(16)), 2, 2)
+
+    def _blocked_recorder(self, **kwargs):
+        """A recorder whose writer waits for self.gate before each frame."""
+        recorder = recording.FrameRecorder(self.dir.name, fps=30, max_queued=1, **kwargs)
+        self.gate = threading.Event()
+        write = recorder._write
+        recorder._write = lambda rows, index: self.gate.wait() and write(rows, index)
+        return recorder
+
+    def test_png_sequence_is_numbered(self):
+        recorder = recording.FrameRecorder(self.dir.name, fps=30)
+        for _ in range(3):
+            recorder.add_frame(*self.frame)
+        stats = recorder.close()
+        self.assertEqual(stats.written, 3)
+        self.assertEqual(sorted(os.listdir(self.dir.name)),
+                         ["frame_00000.png", "frame_00001.png", "frame_00002.png"])
+
+    def test_raw_file_flips_rows_top_first(self):
+        path = os.path.join(self.dir.name, "movie.rgba")
+        recorder = recording.FrameRecorder(path, fps=30)
+        recorder.add_frame(*self.frame)
+        recorder.add_frame(*self.frame)
+        recorder.close()
+        with open(path, "rb") as file:
+            data = file.read()
+        flipped = bytes(range(8, 16)) + bytes(range(8))
+        self.assertEqual(data, flipped * 2)
+
+    def test_full_queue_drops_frames_instead_of_growing(self):
+        recorder = self._blocked_recorder()
+        for _ in range(5):
+            recorder.add_frame(*self.frame)
+        # The writer holds at most one frame and the queue one more.
+        self.assertGreaterEqual(recorder.stats.dropped, 3)
+        self.gate.set()
+        stats = recorder.close()
+        self.assertEqual(stats.written + stats.dropped, 5)
+        self.assertEqual(stats.delayed, 0)
+
+    def test_full_queue_waits_for_writer_when_allowed(self):
+        recorder = self._blocked_recorder(max_wait=5.0)
+        threading.Timer(0.05, self.gate.set).start()
+        for _ in range(4):
+            recorder.add_frame(*self.frame)
+        stats = recorder.close()
+        self.assertEqual(stats.written, 4)
+        self.assertEqual(stats.dropped, 0)
+        self.assertGreaterEqual(stats.delayed, 1)
+
+    def test_writer_errors_are_raised_on_close(self):
+        recorder = recording.FrameRecorder(self.dir.name, fps=30)
+        recorder.add_frame(b"too short", 2, 2)
+        with self.assertRaises(ValueError):
+            recorder.close()
+
+    def test_gif_frames_are_written_as_they_arrive(self):
+        # A one-pixel GIF of its own for each frame, as Pillow saves one:
+        # a two-color global palette, then the second with an extension.
+        screen = b"\x01\x00\x01\x00\x80\x00\x00"
+        image = b"\x00\x00\x00\x00\x01\x00\x01\x00"
+        pixels = b"\x02\x02\x44\x01\x00"
+        red, blue = b"\xff\x00\x00\x00\x00\x00", b"\x00\x00\xff\x00\x00\x00"
+        comment = b"\x21\xfe\x02hi\x00"
+        path = os.path.join(self.dir.name, "movie.gif")
+        gif = recording._GifFile(path, delay=4)
+        gif.add(b"GIF89a" + screen + red + b"\x2c" + image + b"\x00" + pixels + b"\x3b")
+        # Already handed to the file, not held until close().
+        written = gif._file.tell()
+        gif.add(b"GIF89a" + screen + blue + comment + b"\x2c" + image + b"\x00" + pixels + b"\x3b")
+        gif.close()
+        with open(path, "rb") as file:
+            data = file.read()
+        # No global palette; each frame has its own, and is shown 4/100 s.
+        header = b"GIF89a\x01\x00\x01\x00\x00\x00\x00" + b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00"
+        frame = b"\x21\xf9\x04\x04\x04\x00\x00\x00\x2c" + image + b"\x80"
+        self.assertEqual(data, header + frame + red + pixels + frame + blue + pixels + b"\x3b")
+        self.assertEqual(written, len(header + frame + red + pixels))
+
+    def test_gif_without_frames_leaves_no_file(self):
+        path = os.path.join(self.dir.name, "movie.gif")
+        recording._GifFile(path, delay=4).close()
+        self.assertFalse(os.path.exists(path))
+
+
+class RecordingTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.addCleanup(pd.stop_recording)
+        pd.set_framerate(1000)
+
+    def test_records_each_advanced_frame(self):
+        pd.start_recording(self.dir.name)
+        for _ in range(4):
+            pd.advance()
+        stats = pd.stop_recording()
+        self.assertEqual(stats.written + stats.dropped, 4)
+        self.assertEqual(len(os.listdir(self.dir.name)), stats.written)
+
+    def test_lower_fps_skips_frames(self):
+        path = os.path.join(self.dir.name, "movie.rgba")
+        pd.start_recording(path, fps=250)
+        for _ in range(8):
+            pd.advance()
+        stats = pd.stop_recording()
+        self.assertEqual(stats.written + stats.dropped, 2)
+        w, h = core.window.get_framebuffer_size()
+        self.assertEqual(os.path.getsize(path), stats.written * w * h * 4)
+
+    def test_stop_without_recording_returns_none(self):
+        self.assertIsNone(pd.stop_recording())
+
+    def test_start_twice_raises(self):
+        pd.start_recording(self.dir.name)
+        with self.assertRaises(ValueError):
+            pd.start_recording(self.dir.name)
+
+    def test_invalid_fps_raises(self):
+        with self.assertRaises(ValueError):
+            pd.start_recording(self.dir.name, fps=0)
+
+
+# ---------------------------------------------------------------------------
+# picture() cache tests
+# ---------------------------------------------------------------------------
+
+class PictureCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _image(self, name, size=8):
+        """Write a size x size PNG and return its path."""
+        path = os.path.join(self.dir.name, name)
+        pixels = bytes([255, 0, 0, 255]) * (size * size)
+        pg.image.ImageData(size, size, "RGBA", pixels).save(path)
+        return path
+
+    def test_same_file_is_loaded_once(self):
+        path = self._image("a.png")
+        pd.picture(0.5, 0.5, path)
+        pd.picture(0.2, 0.2, path)
+        first, second = core.VERTICES
+        stats = pd.picture_cache_stats()
+        self.assertEqual((stats.hits, stats.misses), (1, 1))
+        self.assertEqual(stats.bytes_used, 8 * 8 * 4)
+        self.assertIs(first.image, second.image)
+
+    def test_picture_is_centered(self):
+        pd.picture(0.5, 0.5, self._image("a.png", size=10))
+        [sprite] = core.VERTICES
+        self.assertEqual((sprite.image.anchor_x, sprite.image.anchor_y), (5, 5))
+
+    def test_modified_file_is_reloaded(self):
+        path = self._image("a.png")
+        pd.picture(0.5, 0.5, path)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        pd.picture(0.5, 0.5, path)
+        stats = pd.picture_cache_stats()
+        self.assertEqual(stats.misses, 2)
+        # The outdated texture is dropped rather than kept alongside.
+        self.assertEqual(len(core.PICTURE_CACHE), 1)
+        self.assertEqual(stats.bytes_used, 8 * 8 * 4)
+
+    def test_least_recently_used_picture_is_evicted(self):
+        a, b, c = (self._image(name) for name in ("a.png", "b.png", "c.png"))
+        pd.set_picture_cache_size(2 * 8 * 8 * 4)
+        pd.picture(0.5, 0.5, a)
+        pd.picture(0.5, 0.5, b)
+        pd.picture(0.5, 0.5, a)
+        pd.picture(0.5, 0.5, c)
+        cached = {path for path, _ in core.PICTURE_CACHE}
+        self.assertEqual(cached, {os.path.realpath(a), os.path.realpath(c)})
+        self.assertEqual(pd.picture_cache_stats().bytes_used, 2 * 8 * 8 * 4)
+
+    def test_zero_size_disables_cache(self):
+        path = self._image("a.png")
+        pd.set_picture_cache_size(0)
+        pd.picture(0.5, 0.5, path)
+        pd.picture(0.5, 0.5, path)
+        stats = pd.picture_cache_stats()
+        self.assertEqual((stats.hits, stats.misses, stats.bytes_used), (0, 2, 0))
+
+    def test_negative_cache_size_raises(self):
+        with self.assertRaises(ValueError):
+            pd.set_picture_cache_size(-1)
+
+    def test_missing_file_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            pd.picture(0.5, 0.5, os.path.join(self.dir.name, "missing.png"))
+
+
+# ---------------------------------------------------------------------------
+# text() label cache tests
+# ---------------------------------------------------------------------------
+
+class LabelCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_redrawn_text_reuses_label(self):
+        pd.text(0.5, 0.5, "score")
+        [label] = core.VERTICES
+        pd.clear()
+        pd.set_pen_color(pd.RED)
+        pd.text(0.25, 0.75, "score", 30)
+        self.assertEqual(core.VERTICES, [label])
+        self.assertTrue(label.visible)
+        self.assertEqual(label.position, (core._scale_x(0.25), core._scale_y(0.75), 0))
+        self.assertEqual(label.rotation, 30)
+        self.assertEqual(label.color, pd.RED)
+
+    def test_reused_label_matches_fresh_label(self):
+        pd.text(0.5, 0.5, "score")
+        pd.clear()
+        pd.text(0.25, 0.75, "score")
+        [recycled] = core.VERTICES
+        fresh = pg.text.Label(
+            "score", font_name=core.font.name, font_size=core.font.size,
+            x=core._scale_x(0.25), y=core._scale_y(0.75), color=core.color,
+            anchor_x="center", anchor_y="center",
+        )
+        self.assertEqual(list(recycled._vertex_lists[0].position[:]),
+                         list(fresh._vertex_lists[0].position[:]))
+        self.assertEqual(list(recycled._vertex_lists[0].translation[:]),
+                         list(fresh._vertex_lists[0].translation[:]))
+
+    def test_different_layout_is_not_reused(self):
+        pd.text(0.5, 0.5, "score")
+        [old] = core.VERTICES
+        pd.clear()
+        pd.set_font_size(20)
+        pd.text(0.5, 0.5, "score")
+        pd.text_left(0.5, 0.5, "score")
+        pd.text(0.5, 0.5, "level")
+        self.assertNotIn(old, core.VERTICES)
+        self.assertFalse(old.visible)
+
+    def test_cache_is_bounded(self):
+        with mock.patch.object(core, "MAX_CACHED_LABELS", 2):
+            for s in "abcde":
+                pd.text(0.5, 0.5, s)
+            pd.clear()
+            pd.point(0.5, 0.5)
+            core.on_draw()
+        self.assertEqual(core.cached_label_count, 2)
+        self.assertEqual([key[0] for key in core.LABEL_CACHE], ["d", "e"])
+
+    def test_dropped_batch_empties_cache(self):
+        pd.text(0.5, 0.5, "score")
+        pd.clear()
+        core.on_draw()
+        self.assertEqual(len(core.LABEL_CACHE), 0)
+        self.assertEqual(core.cached_label_count, 0)
+
+
+# ---------------------------------------------------------------------------
+# Curve vertex generation tests
+# ---------------------------------------------------------------------------
+
+class CurveVertexTests(unittest.TestCase):
+    """ellipse() and arc() build their points from cached unit-circle tables;
+    the points must match the direct per-segment trigonometry."""
+
+    def setUp(self):
+        pd._reset()
+
+    def assert_points_close(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for (ax, ay), (ex, ey) in zip(actual, expected):
+            self.assertAlmostEqual(ax, ex, places=3)
+            self.assertAlmostEqual(ay, ey, places=3)
+
+    def test_rotated_ellipse_points(self):
+        pd.ellipse(0.4, 0.6, 0.3, 0.1, 25)
+        [shape] = core.VERTICES
+        x, y = core._scale_x(0.4), core._scale_y(0.6)
+        a, b = core._factor_x(0.3), core._factor_y(0.1)
+        segments = core._curve_segments(max(a, b))
+        r = math.radians(25)
+        expected = []
+        for i in range(segments):
+            t = i * 2 * math.pi / segments
+            expected.append((x + a * math.cos(t) * math.cos(r) - b * math.sin(t) * math.sin(r),
+                             y + a * math.cos(t) * math.sin(r) + b * math.sin(t) * math.cos(r)))
+        # The closed MultiLine repeats its first point at the end.
+        self.assert_points_close(shape._coordinates, expected + expected[:1])
+
+    def test_arc_points(self):
+        pd.arc(0.5, 0.5, 0.25, 300, 45)
+        [shape] = core.VERTICES
+        x, y = core._scale_x(0.5), core._scale_y(0.5)
+        r = core._factor_x(0.25)
+        start, sweep = math.radians(300), math.radians(105)
+        n = core._curve_segments(r, sweep)
+        expected = [(x + r * math.cos(start + i * sweep / n),
+                     y + r * math.sin(start + i * sweep / n)) for i in range(n + 1)]
+        self.assert_points_close(shape._coordinates, expected)
+
+    def test_short_and_long_arcs_match_the_arrays(self):
+        limit = bulk_shapes.MIN_ARRAY_ARC_SEGMENTS
+        for n in (1, limit - 1, limit, 3 * limit):
+            points = bulk_shapes.arc_point_list(100, 50, 40, 30, 0.3, 2.5, n)
+            self.assert_points_close(points, bulk_shapes.arc_outline(100, 50, 40, 30, 0.3, 2.5, n))
+
+    def test_unit_circle_tables_are_shared_and_read_only(self):
+        cos, sin = bulk_shapes.unit_circle(50)
+        self.assertIs(bulk_shapes.unit_circle(50)[0], cos)
+        with self.assertRaises(ValueError):
+            cos[0] = 2
+        self.assertAlmostEqual(cos[0], 1)
+        self.assertAlmostEqual(sin[25], 0)
+
+
+# ---------------------------------------------------------------------------
+# Curve tessellation tests
+# ---------------------------------------------------------------------------
+
+def _max_chord_error(radius, segments, sweep=2 * math.pi):
+    """How far the middle of each chord lies inside a circular arc."""
+    return radius * (1 - math.cos(sweep / segments / 2))
+
+
+class CurveTessellationTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_segments_stay_within_tolerance(self):
+        for radius in (1, 3, 10, 50, 256, 1000, 10_000):
+            for tolerance in (0.05, 0.25, 2):
+                n = bulk_shapes.curve_segments(radius, tolerance)
+                self.assertLessEqual(_max_chord_error(radius, n), tolerance)
+                self.assertEqual(n % bulk_shapes.MIN_CURVE_SEGMENTS, 0)
+
+    def test_bulk_segment_counts_stay_within_tolerance(self):
+        radii = np.array([1, 1.5, 3, 10, 50, 256, 1000, 10_000])
+        for tolerance in (0.05, 0.25, 2):
+            counts = bulk_shapes.curve_segment_counts(radii, tolerance)
+            for radius, n in zip(radii, counts):
+                self.assertLessEqual(_max_chord_error(radius, n), tolerance)
+                self.assertGreaterEqual(n, 3)
+                if n >= bulk_shapes.MIN_CURVE_SEGMENTS:
+                    self.assertEqual(n, bulk_shapes.curve_segments(radius, tolerance))
+
+    def test_bulk_curves_each_get_their_own_segments(self):
+        colors = [pd.RED, pd.GREEN, pd.BLUE]
+        pd.filled_circles([0.2, 0.5, 0.8], [0.5, 0.5, 0.5], [0.3, 0.003, 0.3], colors=colors)
+        mesh = core.VERTICES[0]
+        large = core._curve_segments(core._factor_x(0.3))
+        small = bulk_shapes.curve_segment_counts(core._factor_x(0.003), core.curve_tolerance)
+        self.assertLess(small, bulk_shapes.MIN_CURVE_SEGMENTS)
+        self.assertEqual(mesh._num_verts, 3 * (2 * large + small))
+        # Still in the order they were given, each in its own color.
+        centers = mesh._positions[::3]
+        self.assertTrue(np.allclose(centers[:large, 0], core._scale_x(0.2)))
+        self.assertTrue(np.allclose(centers[large:large + small, 0], core._scale_x(0.5)))
+        self.assertTrue(np.allclose(centers[large + small:, 0], core._scale_x(0.8)))
+        self.assertTrue((mesh._colors[3 * large:3 * (large + small)] == pd.GREEN).all())
+        self.assertTrue((mesh._colors[3 * (large + small):] == pd.BLUE).all())
+
+    def test_arc_segments_scale_with_sweep(self):
+        full = bulk_shapes.curve_segments(100, 0.25)
+        self.assertEqual(bulk_shapes.curve_segments(100, 0.25, math.pi / 2), full // 4)
+        self.assertEqual(bulk_shapes.curve_segments(100, 0.25, 0), 1)
+
+    def test_small_circles_use_fewer_vertices(self):
+        pd.filled_circle(0.5, 0.5, 0.01)
+        pd.filled_circle(0.5, 0.5, 0.4)
+        small, large = core.VERTICES
+        # A 5 px dot needs a fraction of the 50 segments it used to get.
+        self.assertLessEqual(small._segments, 16)
+        self.assertGreater(large._segments, small._segments)
+
+    def test_tolerance_trades_segments(self):
+        pd.circle(0.5, 0.5, 0.4)
+        pd.set_curve_tolerance(2)
+        pd.circle(0.5, 0.5, 0.4)
+        fine, coarse = core.VERTICES
+        self.assertLess(len(coarse._coordinates), len(fine._coordinates))
+
+    def test_pie_and_arc_follow_tolerance(self):
+        pd.filled_pie(0.5, 0.5, 0.4, 0, 90)
+        pd.arc(0.5, 0.5, 0.4, 0, 90)
+        pie, arc = core.VERTICES
+        expected = core._curve_segments(core._factor_x(0.4), math.pi / 2)
+        self.assertEqual(pie._segments, expected)
+        self.assertEqual(len(arc._coordinates), expected + 1)
+
+    def test_unfilled_ellipse_follows_tolerance(self):
+        core._ensure_window()
+        fine = pd.UnfilledEllipse(100, 100, 80, 40, None, pd.BLACK)
+        pd.set_curve_tolerance(2)
+        coarse = pd.UnfilledEllipse(100, 100, 80, 40, None, pd.BLACK)
+        self.assertEqual(coarse._segments, bulk_shapes.curve_segments(80, 2))
+        self.assertLess(coarse._segments, fine._segments)
+        exact = pd.UnfilledEllipse(100, 100, 80, 40, None, pd.BLACK, tolerance=0.1)
+        self.assertEqual(exact._segments, bulk_shapes.curve_segments(80, 0.1))
+
+    def test_invalid_tolerance_raises(self):
+        for value in (0, -1, "1"):
+            with self.assertRaises(ValueError):
+                pd.set_curve_tolerance(value)
+
+    def test_reset_restores_tolerance(self):
+        pd.set_curve_tolerance(3)
+        pd._reset()
+        self.assertEqual(core.curve_tolerance, core.DEFAULT_CURVE_TOLERANCE)
+
+
+# ---------------------------------------------------------------------------
+# Frame statistics tests
+# ---------------------------------------------------------------------------
+
+class FrameStatsTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        pd.set_framerate(1000)
+
+    def test_no_frames_yet(self):
+        stats = pd.get_frame_stats()
+        self.assertEqual(stats.frame, 0)
+        self.assertEqual(stats.shapes, 0)
+
+    def test_counts_frames_and_framerate(self):
+        for _ in range(3):
+            pd.advance()
+        stats = pd.get_frame_stats()
+        self.assertEqual(stats.frame, 3)
+        self.assertEqual(stats.target_fps, 1000)
+        self.assertGreater(stats.fps, 0)
+        for seconds in (stats.user_time, stats.wait_time, stats.draw_time, stats.flip_time):
+            self.assertGreaterEqual(seconds, 0)
+
+    def test_counts_created_and_recycled_shapes(self):
+        for _ in range(3):
+            pd.filled_circle(0.5, 0.5, 0.1)
+        pd.advance()
+        stats = pd.get_frame_stats()
+        self.assertEqual((stats.shapes, stats.shapes_created), (3, 3))
+        pd.clear()
+        for _ in range(3):
+            pd.filled_circle(0.2, 0.2, 0.1)
+        pd.text(0.5, 0.5, "hi")
+        pd.advance()
+        stats = pd.get_frame_stats()
+        self.assertEqual((stats.shapes, stats.shapes_recycled, stats.shapes_created), (4, 3, 1))
+
+    def test_counts_batch_vertices(self):
+        pd.filled_square(0.5, 0.5, 0.1)
+        pd.line(0, 0, 1, 1)
+        pd.advance()
+        self.assertEqual(pd.get_frame_stats().vertices, 12)
+
+    def test_user_time_covers_code_between_frames(self):
+        pd.advance()
+        time.sleep(0.02)
+        pd.advance()
+        self.assertGreaterEqual(pd.get_frame_stats().user_time, 0.02)
+
+    def test_returns_a_copy(self):
+        pd.advance()
+        pd.get_frame_stats().frame = 100
+        self.assertEqual(pd.get_frame_stats().frame, 1)
+
+    def test_overlay_shows_stats(self):
+        pd.show_frame_stats()
+        pd.advance()
+        self.assertIn("fps", core.STATS_OVERLAY.text)
+        self.assertEqual(core.VERTICES, [])
+        pd.show_frame_stats(False)
+        self.assertIsNone(core.STATS_OVERLAY)
+
+
+# ---------------------------------------------------------------------------
+# Idle frame tests
+# ---------------------------------------------------------------------------
+
+class IdleFrameTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        pd.set_framerate(1000)
+        pd.filled_circle(0.5, 0.5, 0.1)
+        pd.advance()
+
+    def _advance(self, **kwargs):
+        """advance() and return whether it drew and flipped the frame."""
+        with mock.patch.object(core, "on_draw") as on_draw, \
+                mock.patch.object(core.window, "flip") as flip:
+            pd.advance(**kwargs)
+        self.assertEqual(on_draw.called, flip.called)
+        return flip.called
+
+    def test_unchanged_frames_are_skipped(self):
+        self.assertFalse(self._advance())
+        self.assertFalse(self._advance())
+        stats = pd.get_frame_stats()
+        self.assertTrue(stats.skipped)
+        self.assertEqual(stats.skipped_frames, 2)
+        self.assertLess(stats.draw_time, 0.001)
+
+    def test_drawing_redraws(self):
+        pd.line(0, 0, 1, 1)
+        self.assertTrue(self._advance())
+        self.assertFalse(pd.get_frame_stats().skipped)
+        self.assertFalse(self._advance())
+
+    def test_clear_redraws(self):
+        pd.clear(pd.BLUE)
+        self.assertTrue(self._advance())
+
+    def test_redraw_forces_frame(self):
+        self.assertTrue(self._advance(redraw=True))
+
+    def test_state_changes_do_not_redraw(self):
+        pd.set_pen_color(pd.RED)
+        pd.set_pen_radius(0.01)
+        self.assertFalse(self._advance())
+
+    def test_window_expose_redraws(self):
+        core.window.dispatch_event("on_expose")
+        self.assertTrue(self._advance())
+
+    def test_overlay_redraws_every_frame(self):
+        pd.show_frame_stats()
+        self.assertTrue(self._advance())
+        self.assertTrue(self._advance())
+
+    def test_hiding_overlay_redraws(self):
+        pd.show_frame_stats()
+        self._advance()
+        pd.show_frame_stats(False)
+        self.assertTrue(self._advance())
+        self.assertFalse(self._advance())
+
+    def test_invalidating_layer_redraws(self):
+        with pd.layer("background", static=True):
+            pd.point(0.5, 0.5)
+        pd.advance()
+        pd.invalidate_layer("background")
+        self.assertTrue(self._advance())
+
+
+# ---------------------------------------------------------------------------
+# Typed key tests
+# ---------------------------------------------------------------------------
+
+class TypedKeyTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        pd.set_framerate(1000)
+        core._ensure_window()
+
+    def _type(self, text):
+        core.window.dispatch_event("on_text", text)
+        # Events are queued until the window next handles its events.
+        core.window.dispatch_events()
+
+    def test_nothing_typed(self):
+        self.assertFalse(pd.has_next_key_typed())
+        with self.assertRaises(ValueError):
+            pd.next_key_typed()
+
+    def test_keys_come_out_in_order(self):
+        self._type("h")
+        self._type("I!")
+        self.assertEqual(
+            [pd.next_key_typed() for _ in range(3)], ["h", "I", "!"]
+        )
+        self.assertFalse(pd.has_next_key_typed())
+
+    def test_keys_released_before_reading_are_kept(self):
+        self._type("a")
+        pd.advance()
+        pd.advance()
+        self.assertTrue(pd.has_next_key_typed())
+        self.assertEqual(pd.next_key_typed(), "a")
+
+    def test_unprintable_characters_are_ignored(self):
+        self._type("\r")
+        self.assertFalse(pd.has_next_key_typed())
+
+    def test_queue_is_bounded(self):
+        self._type("x" * core.MAX_TYPED_KEYS + "yz")
+        self.assertEqual(len(core.TYPED_KEYS), core.MAX_TYPED_KEYS)
+        keys = [pd.next_key_typed() for _ in range(core.MAX_TYPED_KEYS)]
+        self.assertEqual(keys[-2:], ["y", "z"])
+
+    def test_queue_follows_max_typed_keys(self):
+        self._type("abc")
+        with mock.patch.object(core, "MAX_TYPED_KEYS", 2):
+            self._type("d")
+        self.assertEqual([pd.next_key_typed() for _ in range(2)], ["c", "d"])
+        self.assertFalse(pd.has_next_key_typed())
+
+    def test_frame_stats_report_latency(self):
+        self._type("a")
+        time.sleep(0.02)
+        pd.next_key_typed()
+        pd.advance()
+        self.assertGreaterEqual(pd.get_frame_stats().key_latency, 0.02)
+        pd.advance()
+        self.assertEqual(pd.get_frame_stats().key_latency, 0.0)
+
+
+# ---------------------------------------------------------------------------
+# Mouse event tests
+# ---------------------------------------------------------------------------
+
+class MouseEventTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        core._ensure_window()
+
+    def _send(self, *events):
+        for name, *args in events:
+            core.window.dispatch_event(name, *args)
+        # Events are queued until the window next handles its events.
+        core.window.dispatch_events()
+
+    def test_nothing_happened(self):
+        self.assertEqual(pd.mouse_events(), [])
+
+    def test_stroke_between_frames_is_recorded(self):
+        self._send(
+            ("on_mouse_motion", 0, 0, 0, 0),
+            ("on_mouse_press", 0, 0, pg.window.mouse.LEFT, 0),
+            ("on_mouse_drag", 128, 256, 128, 256, pg.window.mouse.LEFT, 0),
+            ("on_mouse_drag", 256, 256, 128, 0, pg.window.mouse.LEFT, 0),
+            ("on_mouse_release", 256, 256, pg.window.mouse.LEFT, 0),
+        )
+        events = pd.mouse_events()
+        self.assertEqual(
+            [(e.kind, e.x, e.y, e.pressed) for e in events],
+            [("move", 0, 0, False), ("press", 0, 0, True),
+             ("move", 0.25, 0.5, True), ("move", 0.5, 0.5, True),
+             ("release", 0.5, 0.5, False)],
+        )
+        self.assertEqual([e.time for e in events], sorted(e.time for e in events))
+        # The position is still available the usual way.
+        self.assertEqual((pd.mouse_x(), pd.mouse_y()), (0.5, 0.5))
+
+    def test_events_are_returned_once(self):
+        self._send(("on_mouse_motion", 10, 10, 0, 0))
+        self.assertEqual(len(pd.mouse_events()), 1)
+        self.assertEqual(pd.mouse_events(), [])
+
+    def test_coalesces_moves_within_a_pixel(self):
+        self._send(
+            ("on_mouse_motion", 10, 10, 0, 0),
+            ("on_mouse_motion", 10, 10, 0, 0),
+            ("on_mouse_motion", 11, 10, 1, 0),
+            ("on_mouse_press", 11, 10, pg.window.mouse.LEFT, 0),
+            ("on_mouse_drag", 11, 10, 0, 0, pg.window.mouse.LEFT, 0),
+        )
+        self.assertEqual(
+            [e.kind for e in pd.mouse_events()], ["move", "move", "press", "move"]
+        )
+
+    def test_coalescing_can_be_turned_off(self):
+        self._send(*[("on_mouse_motion", 10, 10, 0, 0)] * 3)
+        self.assertEqual(len(pd.mouse_events(coalesce=False)), 3)
+
+    def test_other_buttons_are_ignored(self):
+        self._send(("on_mouse_press", 10, 10, pg.window.mouse.RIGHT, 0))
+        self.assertEqual(pd.mouse_events(), [])
+
+    def test_history_is_bounded(self):
+        self._send(*[("on_mouse_motion", i, 0, 1, 0)
+                     for i in range(core.MAX_MOUSE_EVENTS + 10)])
+        events = pd.mouse_events()
+        self.assertEqual(len(events), core.MAX_MOUSE_EVENTS)
+        self.assertEqual(events[0].x, pd._user_x(10))
+
+
+# ---------------------------------------------------------------------------
+# Polygon triangulation tests
+# ---------------------------------------------------------------------------
+
+# An arrowhead pointing up, with its notch at (0.5, 0.4).
+ARROWHEAD = ((0.1, 0.1), (0.5, 0.9), (0.9, 0.1), (0.5, 0.4))
+
+
+def _polygon_area(points):
+    x, y = np.array(points).T
+    return abs(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y)) / 2
+
+
+def _triangles_area(triangles):
+    """Total area of an (n, 3, 2) array of triangles."""
+    (ab_x, ab_y), (ac_x, ac_y) = (
+        (triangles[:, k] - triangles[:, 0]).T for k in (1, 2)
+    )
+    return np.sum(np.abs(ab_x * ac_y - ab_y * ac_x)) / 2
+
+
+class TriangulationTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        bulk_shapes.triangulate.cache_clear()
+
+    def test_convex_polygons_are_fanned(self):
+        square = ((0, 0), (1, 0), (1, 1), (0, 1))
+        self.assertTrue(bulk_shapes.is_convex(square))
+        self.assertEqual(bulk_shapes.triangulate(square).tolist(), [0, 1, 2, 0, 2, 3])
+
+    def test_concave_polygon_is_covered_exactly(self):
+        self.assertFalse(bulk_shapes.is_convex(ARROWHEAD))
+        for points in (ARROWHEAD, ARROWHEAD[::-1]):
+            indices = bulk_shapes.triangulate(points)
+            self.assertEqual(len(indices), 3 * (len(points) - 2))
+            triangles = np.array(points)[indices.reshape(-1, 3)]
+            self.assertAlmostEqual(_triangles_area(triangles), _polygon_area(points))
+
+    def test_star_with_many_points(self):
+        angles = np.arange(400) * (2 * np.pi / 400)
+        radii = np.where(np.arange(400) % 2, 1.0, 0.3)
+        points = tuple(zip((radii * np.cos(angles)).tolist(), (radii * np.sin(angles)).tolist()))
+        indices = bulk_shapes.triangulate(points)
+        self.assertEqual(len(indices), 3 * 398)
+        triangles = np.array(points)[indices.reshape(-1, 3)]
+        self.assertAlmostEqual(_triangles_area(triangles), _polygon_area(points))
+
+    def test_self_intersecting_polygon_still_gets_all_triangles(self):
+        bowtie = ((0, 0), (1, 1), (1, 0), (0.5, 0.6), (0, 1))
+        self.assertEqual(len(bulk_shapes.triangulate(bowtie)), 9)
+
+    def test_filled_polygon_covers_concave_shape(self):
+        pd.filled_polygon(*[c for point in ARROWHEAD for c in point])
+        shape = core.VERTICES[0]
+        self.assertIsInstance(shape, bulk_shapes.FilledPolygon)
+        triangles = np.array(shape._vertex_list.position[:]).reshape(-1, 3, 2)
+        self.assertAlmostEqual(
+            _triangles_area(triangles), _polygon_area(ARROWHEAD) * 512 * 512, delta=1
+        )
+
+    def test_redrawn_polygon_is_triangulated_once(self):
+        for _ in range(5):
+            pd.clear()
+            pd.filled_polygon(*[c for point in ARROWHEAD for c in point])
+            pd.advance()
+        info = bulk_shapes.triangulate.cache_info()
+        self.assertEqual(info.misses, 1)
+
+
+# ---------------------------------------------------------------------------
+# Stroke tests
+# ---------------------------------------------------------------------------
+
+class StrokeTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        core._ensure_window()
+
+    def _assert_same_as_multiline(self, points, closed=False, thickness=3.5):
+        expected = pg.shapes.MultiLine(*points, thickness=thickness, closed=closed)
+        actual = bulk_shapes.Stroke(*points, thickness=thickness, closed=closed)
+        np.testing.assert_allclose(
+            actual._vertex_list.position[:], expected._vertex_list.position[:], atol=1e-3
+        )
+        self.assertEqual(actual._vertex_list.colors[:], expected._vertex_list.colors[:])
+        self.assertEqual(
+            actual._vertex_list.translation[:], expected._vertex_list.translation[:]
+        )
+
+    def test_matches_multiline(self):
+        rng = np.random.default_rng(110)
+        points = [tuple(p) for p in (rng.random((40, 2)) * 500).tolist()]
+        self._assert_same_as_multiline(points)
+        self._assert_same_as_multiline(points, closed=True)
+        self._assert_same_as_multiline(points[:2], thickness=10)
+
+    def test_matches_multiline_at_degenerate_joints(self):
+        # A repeated point, a straight joint and a complete reversal.
+        self._assert_same_as_multiline(
+            [(10, 10), (10, 10), (50, 10), (90, 10), (50, 10), (50, 60)]
+        )
+
+    def test_closed_stroke_joins_its_first_point(self):
+        square = np.array(((0, 0), (10, 0), (10, 10), (0, 10)), dtype=float)
+        vertices = bulk_shapes.stroke_vertices(square, 2, closed=True)
+        self.assertEqual(vertices.shape, (4 * 6, 2))
+        # Every corner, the first included, is mitered out to sqrt(2) away.
+        distances = np.hypot(*(vertices[:, None] - square[None]).transpose(2, 0, 1))
+        np.testing.assert_allclose(distances.min(axis=1), math.sqrt(2), rtol=1e-6)
+        open_path = bulk_shapes.stroke_vertices(np.vstack((square, square[:1])), 2)
+        np.testing.assert_allclose(vertices[6:-6], open_path[6:-6])
+
+    def test_long_outlines_use_stroke(self):
+        pd.polyline(0.1, 0.1, 0.9, 0.9, 0.1, 0.9)
+        self.assertIs(type(core.VERTICES[-1]), pg.shapes.MultiLine)
+        pd.polyline(*np.linspace(0, 1, 2 * core.MIN_STROKE_POINTS).tolist())
+        self.assertIs(type(core.VERTICES[-1]), bulk_shapes.Stroke)
+        pd.circle(0.5, 0.5, 0.4)
+        self.assertIs(type(core.VERTICES[-1]), bulk_shapes.Stroke)
+
+    def test_recycled_stroke_is_rebuilt(self):
+        xs = np.linspace(0.1, 0.9, 50)
+        pd.polyline(*np.column_stack((xs, xs)).ravel().tolist())
+        first = core.VERTICES[0]
+        pd.clear()
+        pd.set_pen_color(pd.RED)
+        pd.polyline(*np.column_stack((xs, xs[::-1])).ravel().tolist())
+        self.assertIs(core.VERTICES[0], first)
+        self.assertEqual(first.color, pd.RED)
+        expected = bulk_shapes.stroke_vertices(
+            np.array(first._coordinates) - first._coordinates[0], first.thickness
+        )
+        np.testing.assert_allclose(first._vertex_list.position[:], expected.ravel())
+
+
+# ---------------------------------------------------------------------------
+# Line buffer tests
+# ---------------------------------------------------------------------------
+
+class LineBufferTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_matches_pyglet_line(self):
+        pd.set_pen_radius(0.01)
+        pd.set_pen_color(pd.RED)
+        pd.line(0.1, 0.2, 0.7, 0.9)
+        pd.set_pen_color(0, 0, 255, 100)
+        pd.line(0.9, 0.1, 0.1, 0.1)
+        lines = core.VERTICES[0]
+        lines.upload()
+        for i, (x1, y1, x2, y2, rgba) in enumerate((
+            (0.1, 0.2, 0.7, 0.9, pd.RED), (0.9, 0.1, 0.1, 0.1, (0, 0, 255, 100)),
+        )):
+            expected = pg.shapes.Line(
+                pd._scale_x(x1), pd._scale_y(y1), pd._scale_x(x2), pd._scale_y(y2),
+                width=core._scaled_pen_radius(), color=rgba,
+            )
+            for name in ("position", "translation", "colors"):
+                actual = getattr(lines._vertex_list, name)[:]
+                per_line = len(actual) // 2
+                self.assertEqual(
+                    actual[i * per_line:(i + 1) * per_line],
+                    getattr(expected._vertex_list, name)[:],
+                )
+
+    def test_other_shapes_start_a_new_buffer(self):
+        pd.line(0, 0, 1, 1)
+        pd.filled_square(0.5, 0.5, 0.1)
+        pd.line(0, 1, 1, 0)
+        pd.line(0.5, 0, 0.5, 1)
+        self.assertEqual([len(shape) for shape in core.VERTICES[::2]], [1, 2])
+
+    def test_counts_one_shape_per_line(self):
+        pd.set_framerate(1000)
+        for i in range(10):
+            pd.line(0, 0, 1, i / 10)
+        pd.advance()
+        self.assertEqual(pd.get_frame_stats().shapes, 10)
+
+    def test_buffer_is_reused_after_clear(self):
+        for i in range(100):
+            pd.line(0, 0, 1, i / 100)
+        core.on_draw()
+        lines = core.VERTICES[0]
+        vertex_list = lines._vertex_list
+        pd.clear()
+        for i in range(50):
+            pd.line(0, 1, 1, i / 50)
+        core.on_draw()
+        self.assertIs(core.VERTICES[0], lines)
+        self.assertIs(lines._vertex_list, vertex_list)
+        # The 50 lines left over from the last frame are zeroed.
+        self.assertEqual(set(lines._vertex_list.position[50 * 12:]), {0.0})
+
+    def test_grows_to_fit_more_lines(self):
+        pd.line(0, 0, 1, 1)
+        core.line_run.upload()
+        for i in range(100):
+            pd.line(0, 0, 1, i / 100)
+        core.on_draw()
+        lines = core.VERTICES[0]
+        self.assertEqual(len(lines), 101)
+        self.assertGreaterEqual(lines._num_verts, 101 * 6)
+        # Including the line uploaded before it grew.
+        self.assertEqual(lines._vertex_list.position[:101 * 12], lines._positions.tolist())
+
+    def test_lines_drawn_last_are_stored_last(self):
+        # A frame's leftover shapes are freed just before it's drawn, which
+        # leaves gaps that the lines' first upload mustn't fill.
+        for i in range(20):
+            pd.filled_rectangle(i / 20, 0.5, 0.02, 0.02)
+        core.on_draw()
+        pd.clear()
+        pd.filled_circle(0.5, 0.5, 0.1)
+        pd.line(0, 0.5, 1, 0.5)
+        lines = core.line_run
+        core.on_draw()
+        circle = core.VERTICES[0]._vertex_list
+        self.assertIs(lines._vertex_list.domain, circle.domain)
+        self.assertGreaterEqual(lines._vertex_list.start, circle.start + circle.count)
+
+    def test_grows_past_a_shape_allocated_after_it(self):
+        pd.set_framerate(1000)
+        for i in range(3):
+            pd.line(0, 0, 1, i / 3)
+        pd.filled_circle(0.5, 0.5, 0.1)
+        pd.advance()
+        lines = core.VERTICES[0]
+        pd.clear()
+        for i in range(50):
+            pd.line(0, 1, 1, i / 50)
+        pd.filled_circle(0.5, 0.5, 0.1)
+        pd.advance()
+        self.assertIs(core.VERTICES[0], lines)
+        self.assertGreaterEqual(lines._num_verts, 50 * 6)
+        self.assertEqual(lines._vertex_list.position[:12],
+                         lines._positions[:12].tolist())
+
+    def test_lines_in_static_layer_are_kept(self):
+        with pd.layer("grid", static=True):
+            pd.line(0, 0, 1, 1)
+        with pd.layer("grid", static=True):
+            pd.line(0, 1, 1, 0)
+        self.assertEqual(core.VERTICES, [])
+        self.assertIsNone(core.line_run)
+
+
+# ---------------------------------------------------------------------------
+# Immediate mode tests
+# ---------------------------------------------------------------------------
+
+class ImmediateModeTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        pd.set_render_mode("immediate")
+
+    def test_invalid_render_mode_raises(self):
+        with self.assertRaises(ValueError):
+            pd.set_render_mode("fast")
+
+    def test_shapes_are_written_to_the_arena(self):
+        pd.line(0, 0, 1, 1)
+        pd.filled_circle(0.5, 0.5, 0.1)
+        pd.filled_rectangle(0.5, 0.5, 0.1, 0.2, 30)
+        pd.circle(0.5, 0.5, 0.2)
+        self.assertEqual(core.VERTICES, [])
+        self.assertGreater(len(core.ARENA), 12)
+
+    def test_counts_shapes_and_vertices(self):
+        pd.set_framerate(1000)
+        for i in range(10):
+            pd.line(0, 0, 1, i / 10)
+        pd.advance()
+        stats = pd.get_frame_stats()
+        self.assertEqual(stats.shapes, 10)
+        self.assertEqual(stats.vertices, 60)
+
+    def test_matches_retained_ellipse(self):
+        pd.set_pen_color(pd.RED)
+        pd.filled_ellipse(0.4, 0.6, 0.2, 0.1, 30)
+        immediate = core.ARENA._positions[:len(core.ARENA)]
+        pd._reset()
+        pd.filled_ellipse(0.4, 0.6, 0.2, 0.1, 30)
+        ellipse = core.VERTICES[0]
+        # The shader turns the retained ellipse clockwise about its center.
+        r = math.radians(-ellipse.rotation)
+        c, s = math.cos(r), math.sin(r)
+        local = np.array(ellipse._vertex_list.position[:]).reshape(-1, 2)
+        expected = local @ np.array(((c, s), (-s, c))) + (ellipse.x, ellipse.y)
+        np.testing.assert_allclose(immediate, expected, atol=1e-3)
+
+    def test_one_point_polyline_draws_nothing(self):
+        pd.point(0.5, 0.5)
+        per_point = len(core.ARENA)
+        pd.polyline(0.5, 0.5)
+        core.on_draw()
+        self.assertEqual(len(core.ARENA), per_point)
+
+    def test_clear_empties_the_arena(self):
+        pd.point(0.5, 0.5)
+        per_point = len(core.ARENA)
+        for i in range(99):
+            pd.point(i / 100, 0.5)
+        core.on_draw()
+        pd.clear()
+        pd.point(0.5, 0.5)
+        core.on_draw()
+        self.assertEqual(len(core.ARENA), per_point)
+        # The points left over from the last frame are zeroed.
+        positions = core.ARENA._vertex_list.position[2 * per_point:200 * per_point]
+        self.assertEqual(set(positions), {0.0})
+
+    def test_shapes_in_layers_stay_retained(self):
+        with pd.layer("background"):
+            pd.filled_square(0.5, 0.5, 0.1)
+        self.assertIsNone(core.ARENA)
+
+    def test_reset_returns_to_retained_mode(self):
+        pd.filled_square(0.5, 0.5, 0.1)
+        pd._reset()
+        self.assertEqual(core.render_mode, "retained")
+        self.assertIsNone(core.ARENA)
+
+
+# ---------------------------------------------------------------------------
+# Shape handle tests
+# ---------------------------------------------------------------------------
+
+class ShapeHandleTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_drawing_functions_return_handles(self):
+        for handle in (
+            pd.point(0.5, 0.5), pd.line(0, 0, 1, 1), pd.circle(0.5, 0.5, 0.1),
+            pd.filled_rectangle(0.5, 0.5, 0.1, 0.2), pd.pie(0.5, 0.5, 0.1, 0, 90),
+            pd.polyline(0, 0, 0.5, 1, 1, 0), pd.text(0.5, 0.5, "hi"),
+            pd.filled_circles([0.2, 0.4], [0.5, 0.5], 0.05),
+        ):
+            self.assertIsInstance(handle, pd.ShapeHandle)
+
+    def test_no_handle_in_layers_or_immediate_mode(self):
+        with pd.layer("background"):
+            self.assertIsNone(pd.filled_circle(0.5, 0.5, 0.1))
+            self.assertIsNone(pd.line(0, 0, 1, 1))
+        pd.set_render_mode("immediate")
+        self.assertIsNone(pd.filled_circle(0.5, 0.5, 0.1))
+        self.assertIsNone(pd.pie(0.5, 0.5, 0.1, 0, 90))
+        # Text is still a shape of its own.
+        self.assertIsInstance(pd.text(0.5, 0.5, "hi"), pd.ShapeHandle)
+
+    def test_move_to_moves_the_point_drawn_at(self):
+        shapes = [pd.filled_circle(0.2, 0.3, 0.1), pd.circle(0.2, 0.3, 0.1),
+                  pd.square(0.2, 0.3, 0.1, 45), pd.arc(0.2, 0.3, 0.1, 0, 90)]
+        for handle in shapes:
+            handle.move_to(0.7, 0.6)
+        for shape in core.VERTICES:
+            self.assertEqual(shape.position, (pd._scale_x(0.7), pd._scale_y(0.6)))
+
+    def test_move_to_moves_every_shape_of_a_bulk_call(self):
+        handle = pd.filled_circles([0.2, 0.4], [0.5, 0.5], 0.05)
+        handle.move_to(0.3, 0.6)
+        mesh = core.VERTICES[0]
+        x = np.array(mesh._vertex_list.position[:]).reshape(-1, 2)[:, 0]
+        translation = np.array(mesh._vertex_list.translation[:]).reshape(-1, 2)
+        centers = x + translation[:, 0]
+        self.assertAlmostEqual(centers.min(), pd._scale_x(0.25), delta=1)
+        self.assertAlmostEqual(centers.max(), pd._scale_x(0.55), delta=1)
+
+    def test_line_is_changed_in_place(self):
+        pd.line(0, 0, 1, 1)
+        handle = pd.line(0, 1, 1, 0)
+        core.on_draw()
+        lines = core.VERTICES[0]
+        handle.move_to(0.5, 0.5)
+        handle.set_color(pd.RED)
+        handle.set_rotation(90)
+        vertex_list = lines._vertex_list
+        self.assertEqual(vertex_list.translation[12:24], [pd._scale_x(0.5), pd._scale_y(0.5)] * 6)
+        self.assertEqual(tuple(vertex_list.colors[24:48]), pd.RED * 6)
+        self.assertEqual(vertex_list.rotation[6:12], [-90.0] * 6)
+        # The first line is untouched.
+        self.assertEqual(vertex_list.translation[:12], [0.0, pd._scale_y(0)] * 6)
+        self.assertEqual(set(vertex_list.rotation[:6]), {0.0})
+
+    def test_set_rotation_is_relative_to_how_it_was_drawn(self):
+        handle = pd.filled_rectangle(0.5, 0.5, 0.1, 0.2, 30)
+        handle.set_rotation(10)
+        self.assertEqual(core.VERTICES[0].rotation, 20)
+        handle.set_rotation(0)
+        self.assertEqual(core.VERTICES[0].rotation, 30)
+
+    def test_set_color(self):
+        handle = pd.text(0.5, 0.5, "hi")
+        handle.set_color(0, 0, 255, 100)
+        self.assertEqual(core.VERTICES[0].color, (0, 0, 255, 100))
+        with self.assertRaises(ValueError):
+            handle.set_color(300, 0, 0)
+
+    def test_hide_and_show_line(self):
+        handle = pd.line(0, 0, 1, 1)
+        core.on_draw()
+        lines = core.VERTICES[0]
+        drawn = lines._vertex_list.position[:12]
+        handle.hide()
+        self.assertEqual(set(lines._vertex_list.position[:12]), {0.0})
+        handle.show()
+        self.assertEqual(lines._vertex_list.position[:12], drawn)
+
+    def test_hidden_shape_is_visible_when_recycled(self):
+        pd.filled_square(0.5, 0.5, 0.1).hide()
+        square = core.VERTICES[0]
+        pd.clear()
+        pd.filled_square(0.5, 0.5, 0.1)
+        self.assertIs(core.VERTICES[0], square)
+        self.assertTrue(square.visible)
+
+    def test_delete_removes_the_shape(self):
+        keep = pd.filled_square(0.2, 0.2, 0.1)
+        handle = pd.filled_square(0.5, 0.5, 0.1)
+        kept = core.VERTICES[0]
+        handle.delete()
+        self.assertEqual([shape for shape in core.VERTICES if shape is not None], [kept])
+        with self.assertRaises(ValueError):
+            handle.move_to(0, 0)
+        keep.move_to(0.3, 0.3)
+
+    def test_delete_leaves_other_shapes_in_place(self):
+        handles = [pd.filled_circle(0.1 * i, 0.5, 0.05) for i in range(5)]
+        shapes = list(core.VERTICES)
+        handles[1].delete()
+        handles[3].delete()
+        self.assertEqual(core.VERTICES, [shapes[0], None, shapes[2], None, shapes[4]])
+        # Deleted shapes aren't recycled.
+        pd.clear()
+        pd.filled_circle(0.5, 0.5, 0.05)
+        self.assertNotIn(core.VERTICES[0], (shapes[1], shapes[3]))
+        pd.advance()
+
+    def test_recycled_mesh_reports_its_new_color(self):
+        pd.set_pen_color(pd.RED)
+        pd.filled_circles([0.2, 0.4], [0.5, 0.5], 0.05)
+        pd.clear()
+        pd.set_pen_color(pd.BLUE)
+        handle = pd.filled_circles([0.2, 0.4], [0.5, 0.5], 0.05)
+        mesh = core.VERTICES[0]
+        self.assertEqual(core.shapes_recycled, 1)
+        self.assertEqual(mesh.color, pd.BLUE)
+        handle.set_color(pd.GREEN)
+        self.assertEqual(mesh.color, pd.GREEN)
+
+    def test_handles_stop_working_after_clear(self):
+        handle = pd.filled_circle(0.5, 0.5, 0.1)
+        pd.clear()
+        pd.filled_circle(0.2, 0.2, 0.1)
+        with self.assertRaises(ValueError):
+            handle.move_to(0.8, 0.8)
+        self.assertEqual(core.VERTICES[0].position, (pd._scale_x(0.2), pd._scale_y(0.2)))
+
+    def test_changes_redraw_the_frame(self):
+        pd.set_framerate(1000)
+        handle = pd.filled_circle(0.5, 0.5, 0.1)
+        pd.advance()
+        pd.advance()
+        self.assertTrue(pd.get_frame_stats().skipped)
+        handle.move_to(0.2, 0.2)
+        pd.advance()
+        self.assertFalse(pd.get_frame_stats().skipped)
+
+
+# ---------------------------------------------------------------------------
+# Transform tests
+# ---------------------------------------------------------------------------
+
+class TransformTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def _line_ends(self):
+        """Both ends of the last line drawn, in pixels."""
+        lines = core.VERTICES[-1]
+        x1, y1 = lines._translations[-2:]
+        bx, by = lines._positions[-10:-8]
+        return x1, y1, x1 + bx, y1 + by
+
+    def test_translate(self):
+        pd.translate(0.2, 0.1)
+        pd.line(0, 0, 0.5, 0)
+        expected = (pd._scale_x(0.2), pd._scale_y(0.1), pd._scale_x(0.7), pd._scale_y(0.1))
+        for actual, wanted in zip(self._line_ends(), expected):
+            self.assertAlmostEqual(actual, wanted, places=3)
+
+    def test_rotate_turns_counter_clockwise(self):
+        pd.translate(0.5, 0.5)
+        pd.rotate(90)
+        pd.line(0, 0, 0.25, 0)
+        expected = (pd._scale_x(0.5), pd._scale_y(0.5), pd._scale_x(0.5), pd._scale_y(0.75))
+        for actual, wanted in zip(self._line_ends(), expected):
+            self.assertAlmostEqual(actual, wanted, places=3)
+
+    def test_transforms_apply_innermost_first(self):
+        pd.rotate(90)
+        pd.translate(0.25, 0)
+        pd.line(0, 0, 0, 0)
+        x1, y1, _, _ = self._line_ends()
+        self.assertAlmostEqual(x1, pd._scale_x(0), places=3)
+        self.assertAlmostEqual(y1, pd._scale_y(0.25), places=3)
+
+    def test_scale_stretches_shapes_and_lines(self):
+        pd.scale(2, 1)
+        pd.filled_circle(0.25, 0.5, 0.1)
+        pd.line(0, 0, 0.5, 0)
+        circle = core.VERTICES[0]
+        self.assertIsInstance(circle, bulk_shapes.TriangleMesh)
+        x = np.array(circle._vertex_list.position[:]).reshape(-1, 2)[:, 0]
+        self.assertAlmostEqual(x.max() - x.min(), 2 * 2 * pd._factor_x(0.1), delta=1)
+        # The line is sqrt(2) times as thick, the square root of the
+        # change in area.
+        self.assertAlmostEqual(core.VERTICES[1]._positions[-1],
+                               math.sqrt(2) * core._scaled_pen_radius(), places=3)
+
+    def test_invalid_scale_raises(self):
+        with self.assertRaises(ValueError):
+            pd.scale(0)
+        with self.assertRaises(ValueError):
+            pd.scale(1, 0)
+
+    def test_pop_restores_pushed_transform(self):
+        pd.translate(0.1, 0)
+        pd.push()
+        pd.rotate(45)
+        pd.scale(3)
+        pd.pop()
+        self.assertEqual(core.transform, (1, 0, 0, 1, 0.1, 0))
+        with self.assertRaises(ValueError):
+            pd.pop()
+
+    def test_follows_changes_of_scale(self):
+        pd.translate(0.5, 0)
+        pd.line(0, 0, 0, 1)
+        pd.set_scale(0, 2)
+        pd.line(0, 0, 0, 1)
+        self.assertAlmostEqual(self._line_ends()[0], pd._scale_x(0.5), places=3)
+
+    def test_set_x_and_y_scale(self):
+        pd.set_x_scale(0, 2)
+        self.assertAlmostEqual(pd._scale_x(2), pd._scale_y(1))
+        pd.set_y_scale(-1, 1)
+        self.assertAlmostEqual(pd._scale_y(0), core.height / 2)
+        self.assertAlmostEqual(pd._scale_x(1), core.width / 2)
+
+    def test_canvas_size_keeps_both_scales(self):
+        pd.set_x_scale(0, 2)
+        pd.set_y_scale(-1, 1)
+        pd.set_canvas_size(300, 200)
+        self.assertAlmostEqual(pd._scale_x(2), 300)
+        self.assertAlmostEqual(pd._scale_y(0), 100)
+        self.assertAlmostEqual(pd._scale_y(1), 200)
+
+    def test_text_is_moved_and_turned(self):
+        pd.translate(0.25, 0.5)
+        pd.rotate(90)
+        pd.text(0.1, 0, "hi")
+        label = core.VERTICES[0]
+        self.assertAlmostEqual(label.x, pd._scale_x(0.25), places=3)
+        self.assertAlmostEqual(label.y, pd._scale_y(0.6), places=3)
+        self.assertAlmostEqual(label.rotation, -90)
+
+    def test_move_to_goes_through_transform(self):
+        handle = pd.filled_square(0, 0, 0.1)
+        pd.translate(0.5, 0.5)
+        handle.move_to(0.1, 0)
+        self.assertEqual(core.VERTICES[0].position, (pd._scale_x(0.6), pd._scale_y(0.5)))
+
+    def test_one_point_polyline_draws_nothing(self):
+        pd.translate(0.1, 0.1)
+        pd.polyline(0.5, 0.5)
+        core.on_draw()
+        self.assertEqual(core.VERTICES, [])
+        pd.set_render_mode("immediate")
+        pd.point(0.5, 0.5)
+        per_point = len(core.ARENA)
+        pd.polyline(0.5, 0.5)
+        core.on_draw()
+        self.assertEqual(len(core.ARENA), per_point)
+
+    def test_reset_clears_transforms(self):
+        pd.push()
+        pd.rotate(10)
+        pd._reset()
+        self.assertIsNone(core.transform)
+        self.assertEqual(core.TRANSFORMS, [])
+
+
+# ---------------------------------------------------------------------------
+# Lazy window tests
+# ---------------------------------------------------------------------------
+
+LAZY_WINDOW_SCRIPT = """
+import penndraw as pd
+import penndraw.penndraw as core
+pd.set_canvas_size(300, 200)
+pd.set_pen_color(pd.RED)
+print(core.window is None)
+pd.filled_circle(0.5, 0.5, 0.25)
+print(core.window.get_size())
+"""
+
+
+class LazyWindowTests(unittest.TestCase):
+    """The window opens on first use, so these run in fresh interpreters."""
+
+    def _run(self, script, **env):
+        env = {**os.environ, **env}
+        env.pop("DISPLAY", None)
+        return subprocess.run(
+            [sys.executable, "-c", script], env=env,
+            capture_output=True, text=True, timeout=60,
+        )
+
+    def test_import_and_setup_need_no_display(self):
+        script = LAZY_WINDOW_SCRIPT.split("pd.filled_circle")[0]
+        result = self._run(script, PENNDRAW_HEADLESS="")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ["True"])
+
+    def test_import_leaves_pyglet_options_alone(self):
+        script = ("import pyglet; import penndraw.penndraw; "
+                  "print(pyglet.options['shadow_window'])")
+        result = self._run(script, PENNDRAW_HEADLESS="")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ["True"])
+
+    def test_window_opens_at_configured_size_on_first_draw(self):
+        result = self._run(LAZY_WINDOW_SCRIPT, PENNDRAW_HEADLESS="1")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.splitlines(), ["True", "(300, 200)"])
+
+
+# ---------------------------------------------------------------------------
+# Layer tests
+# ---------------------------------------------------------------------------
+
+class LayerTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_static_layer_draws_once(self):
+        for _ in range(3):
+            pd.clear()
+            with pd.layer("grid", static=True):
+                for i in range(10):
+                    pd.line(i / 10, 0, i / 10, 1)
+        self.assertEqual(core.shapes_drawn, 10)
+        self.assertEqual(core.VERTICES, [])
+
+    def test_as_value_says_whether_shapes_are_drawn(self):
+        drawing = []
+        for static in (True, True, False, False):
+            with pd.layer(f"layer {static}", static=static) as d:
+                drawing.append(d)
+        self.assertEqual(drawing, [True, False, True, True])
+
+    def test_layer_shapes_stay_off_the_canvas(self):
+        pd.line(0, 0, 1, 1)
+        canvas = core.BATCH
+        with pd.layer("shapes"):
+            self.assertIsNot(core.BATCH, canvas)
+            pd.filled_circle(0.5, 0.5, 0.25)
+        self.assertIs(core.BATCH, canvas)
+        self.assertEqual(len(core.VERTICES), 1)
+
+    def test_layers_do_not_take_recycled_shapes(self):
+        pd.filled_circle(0.5, 0.5, 0.25)
+        pd.clear()
+        with pd.layer("shapes"):
+            pd.filled_circle(0.5, 0.5, 0.25)
+        self.assertEqual(core.shapes_recycled, 0)
+
+    def test_error_in_block_restores_canvas(self):
+        canvas = core.BATCH
+        with self.assertRaises(ZeroDivisionError):
+            with pd.layer("broken"):
+                1 / 0
+        self.assertIs(core.BATCH, canvas)
+        self.assertIsNone(core.current_layer)
+        self.assertFalse(core.LAYERS["broken"].rendered)
+
+    def test_nested_layers_raise(self):
+        with pd.layer("outer"):
+            with self.assertRaises(ValueError):
+                with pd.layer("inner"):
+                    pass
+
+    def test_invalidate_unknown_layer_raises(self):
+        with self.assertRaises(ValueError):
+            pd.invalidate_layer("missing")
+
+    def test_resizing_invalidates_layers(self):
+        with pd.layer("background", static=True):
+            pd.point(0.5, 0.5)
+        pd.set_canvas_size(200, 100)
+        self.assertFalse(core.LAYERS["background"].rendered)
+        with pd.layer("background", static=True):
+            pd.point(0.5, 0.5)
+        self.assertEqual(
+            (core.LAYERS["background"].texture.width, core.LAYERS["background"].texture.height),
+            core.window.get_framebuffer_size(),
+        )
+
+
+# ---------------------------------------------------------------------------
+# Lazy import tests
+# ---------------------------------------------------------------------------
+
+LAZY_IMPORT_SCRIPT = """
+import sys
+import penndraw as pd
+print(sorted(m for m in ("penndraw.penndraw", "numpy") if m in sys.modules))
+pd.set_pen_color(pd.RED)
+pd.line(0, 0, 1, 1)
+print(type(sys.modules["numpy"]).__name__ == "module")
+pd.filled_circle(0.5, 0.5, 0.25)
+print(type(sys.modules["numpy"]).__name__ == "module")
+"""
+
+# Run with "save" or "record": either starts a worker thread, and NumPy must
+# have been loaded before it is.
+WORKER_IMPORT_SCRIPT = """
+import sys
+import tempfile
+import penndraw as pd
+with tempfile.TemporaryDirectory() as folder:
+    if sys.argv[1] == "save":
+        pd.save(folder + "/drawing.png")
+        pd.flush_saves()
+    else:
+        pd.start_recording(folder + "/frames")
+        pd.stop_recording()
+    print(type(sys.modules["numpy"]).__name__ == "module")
+"""
+
+
+class LazyImportTests(unittest.TestCase):
+
+    def test_exports_match_drawing_module(self):
+        functions = {
+            name for name, obj in vars(core).items()
+            if not name.startswith("_") and isinstance(obj, type(core._reset))
+            and obj.__module__ == core.__name__
+        }
+        self.assertEqual(set(pd.FUNCTIONS), functions)
+        self.assertTrue(all(isinstance(getattr(core, name), type) for name in pd.CLASSES))
+        for name in pd.__all__:
+            self.assertIs(getattr(pd, name), getattr(core, name, pd.__version__))
+
+    def test_private_helpers_are_reachable(self):
+        self.assertIs(pd._reset, core._reset)
+        with self.assertRaises(AttributeError):
+            pd.not_a_function
+
+    def test_heavy_modules_load_on_first_use(self):
+        result = subprocess.run(
+            [sys.executable, "-c", LAZY_IMPORT_SCRIPT],
+            env={**os.environ, "PENNDRAW_HEADLESS": "1"},
+            capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.splitlines(), ["[]", "False", "True"])
+
+    def test_numpy_loads_before_worker_threads_start(self):
+        for command in ("save", "record"):
+            result = subprocess.run(
+                [sys.executable, "-c", WORKER_IMPORT_SCRIPT, command],
+                env={**os.environ, "PENNDRAW_HEADLESS": "1"},
+                capture_output=True, text=True, timeout=60,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertEqual(result.stdout.splitlines(), ["True"], command)
+
+
+
+# ---------------------------------------------------------------------------
+# pyglet internals tests
+# ---------------------------------------------------------------------------
+
+class PygletInternalsTests(unittest.TestCase):
+    """Where penndraw reaches into pyglet's private attributes, a pyglet
+    without them falls back to its public API."""
+
+    def setUp(self):
+        pd._reset()
+
+    def test_pinned_pyglet_has_them(self):
+        pd.filled_circle(0.5, 0.5, 0.1)
+        domain = core.VERTICES[0]._vertex_list.domain
+        self.assertTrue(hasattr(domain.allocator, "starts"))
+        self.assertTrue(hasattr(domain.allocator, "sizes"))
+        self.assertTrue(hasattr(pg.graphics.vertexdomain, "_nearest_pow2"))
+        self.assertTrue(hasattr(core.BATCH, "_draw_list"))
+        if core.HEADLESS:
+            self.assertTrue(hasattr(core.window, "_egl_surface"))
+
+    def test_vertex_list_is_migrated_without_an_allocator(self):
+        vertex_list = mock.Mock(domain=object())
+        core._move_to_end(vertex_list)
+        vertex_list.migrate.assert_called_once_with(vertex_list.domain)
+
+    def test_layer_is_drawn_as_usual_without_a_draw_list(self):
+        batch = mock.Mock(spec=["draw"])
+        core._draw_premultiplied(batch)
+        batch.draw.assert_called_once_with()
+
+    def test_window_is_resized_as_usual_without_a_pbuffer(self):
+        window = mock.Mock(spec=["set_size", "get_size"])
+        with mock.patch.object(core, "window", window):
+            core._resize_window(300, 200)
+        window.set_size.assert_called_once_with(300, 200)
+
+
 if __name__ == '__main__':
     unittest.main()
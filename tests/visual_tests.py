@@ -1,22 +1,30 @@
 """Visual tests for penndraw.
 
 These tests render shapes and sample the resulting pixel data to verify
-correctness. They require a display (macOS or X11) and are intended to
-be run locally rather than in headless CI.
+correctness. They require a display (macOS or X11), or can be run without
+one by setting PENNDRAW_HEADLESS=1 to render into an offscreen EGL surface.
 
 Rendering constraint: without a running pyglet event loop, only
 pg.shapes.MultiLine reliably commits its pixels to the framebuffer in time
 for glReadPixels. pg.shapes.Line, pg.shapes.Ellipse and pg.shapes.Arc (for
 partial angles) do not. Tests that need a line use polyline() (two-point
-MultiLine) rather than line() (pg.shapes.Line). The arc/circle consistency
-tests work because circle() uses MultiLine for its outline.
+MultiLine), or line(), which is drawn from a LineBuffer uploaded by
+on_draw(). The arc/circle consistency tests work because circle() uses
+MultiLine for its outline.
 
 """
 
+import os
+import subprocess
+import sys
+import tempfile
 import unittest
-import pyglet.gl as gl
+# penndraw must be imported before pyglet.gl so PENNDRAW_HEADLESS can take
+# effect; importing pyglet.gl picks pyglet's platform backend.
 import penndraw as pd
 import penndraw.penndraw as core
+import pyglet as pg
+import pyglet.gl as gl
 
 
 # ---------------------------------------------------------------------------
@@ -29,7 +37,7 @@ def _capture():
     pixels is a bytearray in RGBA format with OpenGL's bottom-left origin.
     """
     w, h = core.width, core.height
-    core.window.switch_to()
+    core._ensure_window().switch_to()
     core.on_draw()
     gl.glFinish()
     core.window.flip()
@@ -130,6 +138,169 @@ class BasicRenderingTests(unittest.TestCase):
         self.assertGreater(blue_count, 5)
 
 
+class ClearRenderingTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_clear_paints_background_color(self):
+        pd.clear(pd.BLUE)
+        data, w, h = _capture()
+        self.assertEqual(_pixel(data, w // 2, h // 2, w, h)[:3], (0, 0, 255))
+
+    def test_clear_erases_shapes(self):
+        pd.set_pen_color(pd.RED)
+        pd.set_pen_radius(0.01)
+        pd.circle(0.5, 0.5, 0.25)
+        pd.clear()
+        data, w, h = _capture()
+        self.assertEqual(_count_matching(data, 255, 0, 0), 0)
+
+    def test_translucent_clear_blends_over_white(self):
+        pd.clear(0, 0, 0, 128)
+        data, w, h = _capture()
+        r, g, b, _ = _pixel(data, 10, 10, w, h)
+        # wide tolerance: some framebuffers only have 5 or 6 bits per channel
+        self.assertAlmostEqual(r, 127, delta=8)
+        self.assertAlmostEqual(b, 127, delta=8)
+
+    def test_shapes_drawn_after_clear_appear(self):
+        pd.clear(pd.BLACK)
+        pd.set_pen_color(pd.RED)
+        pd.set_pen_radius(0.01)
+        pd.circle(0.5, 0.5, 0.25)
+        data, w, h = _capture()
+        self.assertGreater(_count_matching(data, 255, 0, 0), 10)
+        self.assertEqual(_pixel(data, 5, 5, w, h)[:3], (0, 0, 0))
+
+    def test_recycled_shapes_keep_drawing_order(self):
+        def frame(*shapes):
+            pd.clear()
+            for draw, rgb in shapes:
+                pd.set_pen_color(*rgb)
+                draw()
+            data, w, h = _capture()
+            return _pixel(data, w // 2, h // 2, w, h)[:3]
+
+        circle = lambda: pd.filled_circle(0.5, 0.5, 0.2), (255, 0, 0)
+        square = lambda: pd.filled_square(0.5, 0.5, 0.1), (0, 0, 255)
+        self.assertEqual(frame(circle, square), (0, 0, 255))
+        self.assertEqual(frame(square, circle), (255, 0, 0))
+        self.assertEqual(frame(circle, square), (0, 0, 255))
+
+    def test_lines_drawn_over_recycled_shapes(self):
+        pd.set_pen_radius(0.02)
+        for i in range(20):
+            pd.filled_rectangle(i / 20, 0.9, 0.02, 0.02)
+        _capture()
+        pd.clear()
+        pd.set_pen_color(pd.RED)
+        pd.filled_circle(0.5, 0.5, 0.1)
+        pd.set_pen_color(pd.BLUE)
+        pd.line(0, 0.5, 1, 0.5)
+        data, w, h = _capture()
+        # Pen-radius-wide lines lie just above their y coordinate.
+        self.assertEqual(_pixel(data, w // 2, int(h * 0.49), w, h)[:3], (0, 0, 255))
+
+    def test_shape_recycled_after_a_new_one_is_drawn_over_it(self):
+        # A ball, and then a background drawn beneath it.
+        ball = lambda: pd.filled_circle(0.5, 0.5, 0.1), (255, 0, 0)
+        background = lambda: pd.filled_square(0.5, 0.5, 0.5), (0, 0, 255)
+        for shapes in ((ball,), (background, ball), (background, ball)):
+            pd.clear()
+            for draw, rgb in shapes:
+                pd.set_pen_color(*rgb)
+                draw()
+            data, w, h = _capture()
+            self.assertEqual(_pixel(data, w // 2, h // 2, w, h)[:3], (255, 0, 0))
+            self.assertEqual(_pixel(data, 5, 5, w, h)[:3],
+                             (0, 0, 255) if len(shapes) == 2 else (255, 255, 255))
+
+
+# ---------------------------------------------------------------------------
+# Saving tests
+# ---------------------------------------------------------------------------
+
+class SaveTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def _load(self, filename):
+        """Return (pixels, width, height) of an image file, RGB, bottom row first."""
+        image = pg.image.load(filename).get_image_data()
+        return image.get_data("RGB", image.width * 3), image.width, image.height
+
+    def test_saved_png_matches_drawing(self):
+        pd.set_canvas_size(300, 200)
+        pd.clear(pd.BLUE)
+        pd.set_pen_color(pd.RED)
+        pd.set_pen_radius(0.01)
+        pd.polyline(0.0, 0.9, 1.0, 0.9)
+        filename = os.path.join(self.dir.name, "drawing.png")
+        pd.save(filename)
+        pd.flush_saves()
+        data, w, h = self._load(filename)
+        self.assertEqual((w, h), (300, 200))
+        # The red line is near the top of the image, the rest is blue.
+        top = ((h - 1 - 20) * w + w // 2) * 3
+        self.assertEqual(tuple(data[top:top + 3]), (255, 0, 0))
+        middle = (h // 2 * w + w // 2) * 3
+        self.assertEqual(tuple(data[middle:middle + 3]), (0, 0, 255))
+
+    def test_save_captures_the_frame_at_call_time(self):
+        pd.clear(pd.BLUE)
+        filename = os.path.join(self.dir.name, "drawing.png")
+        pd.save(filename)
+        pd.clear(pd.RED)
+        pd.flush_saves()
+        data, w, h = self._load(filename)
+        self.assertEqual(tuple(data[:3]), (0, 0, 255))
+
+    def test_unsupported_extension_raises(self):
+        with self.assertRaises(ValueError):
+            pd.save(os.path.join(self.dir.name, "drawing.xyz"))
+
+    def test_flush_saves_raises_write_errors(self):
+        pd.save(os.path.join(self.dir.name, "missing", "drawing.png"))
+        with self.assertRaises(OSError):
+            pd.flush_saves()
+        # The failed save is reported once, not on every later flush.
+        pd.flush_saves()
+
+
+# ---------------------------------------------------------------------------
+# Headless mode tests
+# ---------------------------------------------------------------------------
+
+HEADLESS_SCRIPT = """
+import penndraw as pd
+import penndraw.penndraw as core
+pd.set_canvas_size(300, 200)
+pd.filled_circle(0.5, 0.5, 0.25)
+pd.run()
+print(core.HEADLESS, type(core.window).__name__, core.window.width)
+"""
+
+
+class HeadlessTests(unittest.TestCase):
+
+    def run_script(self, env):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(
+            [sys.executable, "-c", HEADLESS_SCRIPT], cwd=root,
+            env={**os.environ, **env}, capture_output=True, text=True,
+            timeout=60,
+        )
+
+    def test_env_var_selects_offscreen_window_and_run_returns(self):
+        result = self.run_script({"PENNDRAW_HEADLESS": "1"})
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.split(), ["True", "HeadlessWindow", "300"])
+
+
 # ---------------------------------------------------------------------------
 # Arc/ellipse consistency tests
 # ---------------------------------------------------------------------------
@@ -194,5 +365,259 @@ class ArcEllipseConsistencyTests(unittest.TestCase):
                 f"(ratio {ratio:.2f}) — should be ~1.0 on any canvas")
 
 
+# ---------------------------------------------------------------------------
+# Layer tests
+# ---------------------------------------------------------------------------
+
+class LayerRenderingTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_static_layer_survives_clear(self):
+        pd.set_pen_color(pd.RED)
+        with pd.layer("background", static=True):
+            pd.filled_rectangle(0.25, 0.5, 0.25, 0.5)
+        pd.clear()
+        with pd.layer("background", static=True):
+            pd.filled_rectangle(0.75, 0.5, 0.25, 0.5)
+        data, w, h = _capture()
+        self.assertEqual(_pixel(data, w // 4, h // 2, w, h)[:3], (255, 0, 0))
+        self.assertEqual(_pixel(data, 3 * w // 4, h // 2, w, h)[:3], (255, 255, 255))
+
+    def test_invalidated_layer_is_redrawn(self):
+        pd.set_pen_color(pd.RED)
+        with pd.layer("background", static=True):
+            pd.filled_rectangle(0.25, 0.5, 0.25, 0.5)
+        pd.invalidate_layer("background")
+        with pd.layer("background", static=True):
+            pd.filled_rectangle(0.75, 0.5, 0.25, 0.5)
+        data, w, h = _capture()
+        self.assertEqual(_pixel(data, w // 4, h // 2, w, h)[:3], (255, 255, 255))
+        self.assertEqual(_pixel(data, 3 * w // 4, h // 2, w, h)[:3], (255, 0, 0))
+
+    def test_layers_are_drawn_in_z_order_around_the_canvas(self):
+        pd.set_pen_color(pd.BLUE)
+        pd.filled_rectangle(0.5, 0.5, 0.25, 0.25)
+        pd.set_pen_color(pd.RED)
+        with pd.layer("under"):
+            pd.filled_rectangle(0.5, 0.5, 0.5, 0.5)
+        pd.set_pen_color(pd.GREEN)
+        with pd.layer("over", z=1):
+            pd.filled_rectangle(0.5, 0.5, 0.1, 0.1)
+        data, w, h = _capture()
+        self.assertEqual(_pixel(data, w // 2, h // 2, w, h)[:3], (0, 255, 0))
+        self.assertEqual(_pixel(data, 3 * w // 8, h // 2, w, h)[:3], (0, 0, 255))
+        self.assertEqual(_pixel(data, 5, 5, w, h)[:3], (255, 0, 0))
+
+    def test_clear_hides_dynamic_layer(self):
+        pd.set_pen_color(pd.RED)
+        with pd.layer("shapes"):
+            pd.filled_circle(0.5, 0.5, 0.25)
+        pd.clear()
+        data, w, h = _capture()
+        self.assertEqual(_count_matching(data, 255, 0, 0), 0)
+
+    def test_translucent_layer_keeps_its_color(self):
+        pd.set_pen_color(0, 0, 255, 255)
+        with pd.layer("background"):
+            pd.filled_rectangle(0.5, 0.5, 0.5, 0.5)
+        data, w, h = _capture()
+        self.assertEqual(_pixel(data, w // 2, h // 2, w, h)[:3], (0, 0, 255))
+        pd.clear()
+        pd.set_pen_color(0, 0, 0, 128)
+        with pd.layer("background"):
+            pd.filled_rectangle(0.5, 0.5, 0.5, 0.5)
+        data, w, h = _capture()
+        layered = _pixel(data, w // 2, h // 2, w, h)[:3]
+        pd.clear()
+        pd.filled_rectangle(0.5, 0.5, 0.5, 0.5)
+        data, w, h = _capture()
+        direct = _pixel(data, w // 2, h // 2, w, h)[:3]
+        for a, b in zip(layered, direct):
+            self.assertAlmostEqual(a, b, delta=1)
+
+    def test_overlapping_translucent_layer_matches_drawing_directly(self):
+        def scene():
+            pd.set_pen_color(255, 0, 0, 100)
+            pd.filled_rectangle(0.4, 0.5, 0.3, 0.3)
+            pd.set_pen_color(0, 0, 255, 150)
+            pd.filled_circle(0.6, 0.5, 0.3)
+
+        def background():
+            pd.set_pen_color(0, 255, 0, 255)
+            pd.filled_square(0.3, 0.5, 0.2)
+
+        background()
+        scene()
+        data, w, h = _capture()
+        direct = [_pixel(data, int(w * x), h // 2, w, h)[:3] for x in (0.2, 0.5, 0.8)]
+        pd.clear()
+        background()
+        with pd.layer("shapes", z=1):
+            scene()
+        data, w, h = _capture()
+        layered = [_pixel(data, int(w * x), h // 2, w, h)[:3] for x in (0.2, 0.5, 0.8)]
+        # wide tolerance: some framebuffers only have 5 or 6 bits per
+        # channel, which rounds each blend drawn directly but not the layer's
+        for expected, actual in zip(direct, layered):
+            for a, b in zip(expected, actual):
+                self.assertAlmostEqual(a, b, delta=8)
+
+
+# ---------------------------------------------------------------------------
+# Concave polygon tests
+# ---------------------------------------------------------------------------
+
+class ConcavePolygonTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_notch_of_concave_polygon_is_empty(self):
+        # An arrowhead pointing up with its notch at (0.5, 0.4). A fan from
+        # the first point would fill the notch in.
+        pd.set_pen_color(pd.RED)
+        pd.filled_polygon(0.5, 0.4, 0.1, 0.1, 0.5, 0.9, 0.9, 0.1)
+        data, w, h = _capture()
+        # (0.5, 0.25) is inside the notch; (0.5, 0.6) is inside the arrow.
+        self.assertEqual(_pixel(data, w // 2, int(h * 0.75), w, h)[:3], (255, 255, 255))
+        self.assertEqual(_pixel(data, w // 2, int(h * 0.4), w, h)[:3], (255, 0, 0))
+
+
+
+# ---------------------------------------------------------------------------
+# Line buffer tests
+# ---------------------------------------------------------------------------
+
+class LineBufferRenderingTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_shapes_between_lines_keep_their_order(self):
+        # A red line under a blue square under a green line.
+        pd.set_pen_radius(0.02)
+        pd.set_pen_color(pd.RED)
+        pd.line(0.1, 0.3, 0.9, 0.3)
+        pd.set_pen_color(pd.BLUE)
+        pd.filled_square(0.5, 0.5, 0.3)
+        pd.set_pen_color(pd.GREEN)
+        pd.line(0.1, 0.7, 0.9, 0.7)
+        data, w, h = _capture()
+        # Pen-radius-wide lines lie just above their y coordinate.
+        self.assertEqual(_pixel(data, w // 2, int(h * 0.69), w, h)[:3], (0, 0, 255))
+        self.assertEqual(_pixel(data, w // 2, int(h * 0.29), w, h)[:3], (0, 255, 0))
+        self.assertEqual(_pixel(data, int(w * 0.15), int(h * 0.69), w, h)[:3], (255, 0, 0))
+
+# ---------------------------------------------------------------------------
+# Immediate mode tests
+# ---------------------------------------------------------------------------
+
+class ImmediateModeRenderingTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def _scene(self):
+        pd.set_pen_radius(0.004)
+        pd.set_pen_color(pd.RED)
+        pd.line(0.1, 0.1, 0.9, 0.8)
+        pd.set_pen_color(0, 0, 255, 128)
+        pd.filled_rectangle(0.3, 0.3, 0.1, 0.05, 30)
+        pd.rectangle(0.6, 0.3, 0.1, 0.05, 30)
+        pd.set_pen_color(pd.GREEN)
+        pd.filled_ellipse(0.7, 0.7, 0.1, 0.05, 30)
+        pd.circle(0.5, 0.5, 0.2)
+        pd.set_pen_color(pd.ORANGE)
+        pd.filled_pie(0.2, 0.5, 0.1, 30, 200)
+        pd.arc(0.5, 0.2, 0.1, 10, 170)
+        pd.filled_polygon(0.5, 0.4, 0.1, 0.1, 0.5, 0.9, 0.9, 0.1)
+        pd.set_pen_radius(0.01)
+        pd.point(0.9, 0.95)
+        pd.filled_circles([0.4, 0.5], [0.97, 0.97], 0.01)
+
+    def test_matches_retained_mode(self):
+        self._scene()
+        retained = _capture()[0]
+        pd._reset()
+        pd.set_render_mode("immediate")
+        self._scene()
+        self.assertEqual(core.VERTICES, [])
+        self.assertEqual(_capture()[0], retained)
+
+
+# ---------------------------------------------------------------------------
+# Shape handle tests
+# ---------------------------------------------------------------------------
+
+class ShapeHandleRenderingTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def test_moved_and_hidden_shapes(self):
+        pd.set_pen_color(pd.RED)
+        circle = pd.filled_circle(0.2, 0.2, 0.1)
+        pd.set_pen_radius(0.02)
+        pd.set_pen_color(pd.BLUE)
+        line = pd.line(0.1, 0.5, 0.9, 0.5)
+        _capture()
+        circle.move_to(0.8, 0.8)
+        line.hide()
+        data, w, h = _capture()
+        self.assertEqual(_pixel(data, int(w * 0.8), int(h * 0.2), w, h)[:3], (255, 0, 0))
+        self.assertEqual(_pixel(data, int(w * 0.2), int(h * 0.8), w, h)[:3], (255, 255, 255))
+        self.assertEqual(_pixel(data, w // 2, int(h * 0.49), w, h)[:3], (255, 255, 255))
+        line.show()
+        line.set_color(pd.GREEN)
+        data, w, h = _capture()
+        self.assertEqual(_pixel(data, w // 2, int(h * 0.49), w, h)[:3], (0, 255, 0))
+
+
+# ---------------------------------------------------------------------------
+# Transform tests
+# ---------------------------------------------------------------------------
+
+class TransformRenderingTests(unittest.TestCase):
+
+    def setUp(self):
+        pd._reset()
+
+    def _draw(self, transformed):
+        pd.set_pen_color(pd.RED)
+        if transformed:
+            pd.translate(0.3, 0.2)
+            pd.filled_circle(0, 0, 0.1)
+            pd.push()
+            pd.translate(0.3, 0.4)
+            pd.rotate(30)
+            pd.filled_rectangle(0, 0, 0.1, 0.05)
+            pd.pop()
+            pd.translate(0.2, 0.3)
+            pd.set_pen_color(pd.BLUE)
+            pd.circle(0, 0, 0.2)
+            pd.line(-0.4, 0.4, 0.4, 0.3)
+        else:
+            pd.filled_circle(0.3, 0.2, 0.1)
+            # filled_rectangle() turns its angle clockwise.
+            pd.filled_rectangle(0.6, 0.6, 0.1, 0.05, -30)
+            pd.set_pen_color(pd.BLUE)
+            pd.circle(0.5, 0.5, 0.2)
+            pd.line(0.1, 0.9, 0.9, 0.8)
+
+    def test_matches_drawing_without_transform(self):
+        for mode in ("retained", "immediate"):
+            with self.subTest(mode=mode):
+                pd._reset()
+                pd.set_render_mode(mode)
+                self._draw(transformed=False)
+                expected = _capture()[0]
+                pd._reset()
+                pd.set_render_mode(mode)
+                self._draw(transformed=True)
+                self.assertEqual(_capture()[0], expected)
+
+
 if __name__ == '__main__':
     unittest.main()